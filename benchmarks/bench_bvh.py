@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+'''Times the main BVH code paths on synthetic files and writes the results
+as JSON so runs from different commits can be compared.
+
+    python -m benchmarks.bench_bvh --joints 20 70 --frames 1000 10000 -o after.json
+    python -m benchmarks.bench_bvh --compare before.json after.json'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import itertools
+import subprocess
+import tempfile
+import tracemalloc
+from tools.bvh import BVH
+from tools.bvh_write import bvh_write
+from tools.motion import Motion
+from benchmarks.synthetic import write_synthetic_bvh, LAYOUTS
+
+def _loaded(path):
+    '''A fully loaded skeleton, as the CLIs see it'''
+    return BVH( path ).skeleton
+
+def _parsed(path):
+    '''A BVH that has read the file but not run the post-load steps'''
+    bvh = BVH()
+    bvh.read_file( path )
+    return bvh.skeleton
+
+def _post_load(skel):
+    '''End positions, world positions and resting pose extraction'''
+    skel.fix_end_positions()
+    skel.init_world_positions()
+    skel.handle_resting_pose()
+
+def _viewer(path):
+    '''A Plot of the file, ready to animate but without a window.'''
+    from tools.glplot import Plot   #OpenGL is only needed for this case.
+    skel = _loaded( path )
+    skel.set_unit_scale_factor()
+    plot = Plot( skel, 'benchmark' )
+    plot.animating = True
+    return plot
+
+def _viewer_update(plot):
+    '''Every frame of the viewer's per-draw update.'''
+    for frame in range( plot.clock.num_frames ):
+        plot.clock.seek( frame )
+        plot._update_vertices()
+
+CASES = {
+    'read_file'      : ( lambda path, out: path, lambda path: BVH().read_file( path ) ),
+    'post_load'      : ( lambda path, out: _parsed( path ), _post_load ),
+    'fk'             : ( lambda path, out: _loaded( path ),
+                         lambda skel: Motion.from_skeleton( skel ).world_positions() ),
+    'bvh_write'      : ( lambda path, out: ( _loaded( path ), out ),
+                         lambda state: bvh_write( *state ) ),
+    'viewer_update'  : ( lambda path, out: _viewer( path ), _viewer_update ),
+}
+'''name : ( setup(path, scratch) -> state, run(state) ).  Setup is not timed.'''
+
+def measure(setup, run, repeat:int, memory:bool) -> dict:
+    '''Best wall time over repeat runs plus, optionally, the peak traced
+       allocation of one more run.'''
+
+    best = None
+    for _ in range( repeat ):
+        state = setup()
+        start = time.perf_counter()
+        run( state )
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min( best, elapsed )
+
+    result = { 'seconds' : best }
+    if memory:
+        state = setup()
+        tracemalloc.start()
+        run( state )
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+def _git_revision() -> str:
+    '''The commit being benchmarked, if this is a git checkout'''
+    try:
+        return subprocess.run( [ 'git', 'rev-parse', 'HEAD' ], capture_output=True, text=True,
+                               check=True, cwd=os.path.dirname( __file__ ) ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(args) -> dict:
+    '''Runs every selected case on every combination of the size options.'''
+
+    report = { 'revision' : _git_revision(),
+               'python' : platform.python_version(),
+               'machine' : platform.machine(),
+               'runs' : [] }
+
+    with tempfile.TemporaryDirectory() as scratch:
+        sizes = itertools.product( args.joints, args.depth, args.frames, args.layout, args.resting )
+        for joints, depth, frames, layout, resting in sizes:
+            params = { 'joints' : joints, 'depth' : depth, 'frames' : frames,
+                       'layout' : layout, 'resting' : bool(resting) }
+            path = os.path.join( scratch, 'synthetic.bvh' )
+            out = os.path.join( scratch, 'written.bvh' )
+            write_synthetic_bvh( path, joints, depth, frames, layout, bool(resting) )
+            params['bytes'] = os.path.getsize( path )
+
+            for name in args.cases:
+                setup, run = CASES[name]
+                try:
+                    result = measure( lambda: setup( path, out ), run, args.repeat, not args.no_memory )
+                except ImportError as err:
+                    result = { 'skipped' : str(err) }
+                if 'seconds' in result and result['seconds'] > 0.0:
+                    result['frames_per_second'] = frames / result['seconds']
+                    result['bytes_per_second'] = params['bytes'] / result['seconds']
+                report['runs'].append( { 'case' : name, 'params' : params, **result } )
+                print( f"{name:14s} {joints:4d}j {frames:7d}f {layout:8s} "
+                       f"{result.get('seconds', float('nan')):9.4f}s", file=sys.stderr )
+    return report
+
+def compare(before:dict, after:dict):
+    '''Prints the time and memory ratio of each matching run.'''
+
+    def key(run):
+        return ( run['case'], json.dumps( run['params'], sort_keys=True ) )
+
+    previous = { key(run) : run for run in before['runs'] }
+    for run in after['runs']:
+        old = previous.get( key(run) )
+        if old is None or 'seconds' not in run or 'seconds' not in old:
+            continue
+        line = f"{run['case']:14s} {json.dumps(run['params'])} time x{run['seconds']/old['seconds']:.2f}"
+        if 'peak_bytes' in run and old.get('peak_bytes'):
+            line += f" memory x{run['peak_bytes']/old['peak_bytes']:.2f}"
+        print( line )
+
+def main(args):
+    '''Benchmark BVH loading, FK, writing and the viewer update'''
+    parser = argparse.ArgumentParser( prog='bench_bvh',
+                 description='Benchmark the BVH tools on synthetic files.')
+    parser.add_argument( '-j','--joints', type=int, nargs='+', default=[ 20, 70 ],
+                         help='Joint counts to generate.' )
+    parser.add_argument( '-d','--depth', type=int, nargs='+', default=[ 6 ],
+                         help='Maximum chain depths to generate.' )
+    parser.add_argument( '-f','--frames', type=int, nargs='+', default=[ 1000 ],
+                         help='Frame counts to generate.' )
+    parser.add_argument( '-l','--layout', nargs='+', choices=sorted(LAYOUTS), default=[ 'classic' ],
+                         help='Channel layouts to generate.' )
+    parser.add_argument( '--resting', type=int, nargs='+', choices=[ 0, 1 ], default=[ 0 ],
+                         help='1 to add a resting pose line.' )
+    parser.add_argument( '-c','--cases', nargs='+', choices=sorted(CASES), default=sorted(CASES),
+                         help='Which code paths to time.' )
+    parser.add_argument( '-r','--repeat', type=int, default=3, help='Runs per case, the best is kept.' )
+    parser.add_argument( '--no_memory', action='store_true', help='Skip the tracemalloc run.' )
+    parser.add_argument( '-o','--output', default=None, help='JSON file for the results.' )
+    parser.add_argument( '--compare', nargs=2, metavar=( 'BEFORE', 'AFTER' ), default=None,
+                         help='Compare two result files instead of running.' )
+
+    args = parser.parse_args( args[1:] )
+
+    if args.compare is not None:
+        with open( args.compare[0], encoding='utf-8' ) as before, \
+             open( args.compare[1], encoding='utf-8' ) as after:
+            compare( json.load( before ), json.load( after ) )
+        return
+
+    report = run_suite( args )
+    text = json.dumps( report, indent=1 )
+    if args.output is None:
+        print( text )
+    else:
+        with open( args.output, 'w', encoding='utf-8' ) as fptr:
+            fptr.write( text )
+
+if __name__ == "__main__":
+    main( sys.argv )
@@ -0,0 +1,79 @@
+'''Generates synthetic BVH files of any size for benchmarking.'''
+
+import numpy as np
+
+LAYOUTS = {
+    'classic' : ( 'Xposition Yposition Zposition Zrotation Xrotation Yrotation',
+                  'Zrotation Xrotation Yrotation' ),
+    'xyz'     : ( 'Xposition Yposition Zposition Xrotation Yrotation Zrotation',
+                  'Xrotation Yrotation Zrotation' ),
+    'full'    : ( 'Xposition Yposition Zposition Zrotation Xrotation Yrotation',
+                  'Xposition Yposition Zposition Zrotation Xrotation Yrotation' ),
+}
+'''Root and joint CHANNELS for each layout.  full gives every joint positions.'''
+
+def build_parents(joints:int, depth:int, rng) -> list:
+    '''Parent index for each joint.  Joints extend the most recent chain until
+       it reaches depth, then branch from a random shallower joint.  depth
+       counts the root, so anything past a lone root needs at least 2.'''
+
+    if joints < 1:
+        raise Exception( f'A skeleton needs at least 1 joint, not {joints}' )
+    if joints > 1 and depth < 2:
+        raise Exception( f'{joints} joints need a depth of at least 2, not {depth}' )
+    parents = [ -1 ]
+    depths = [ 0 ]
+    for i in range( 1, joints ):
+        if depths[i-1] < depth - 1:
+            parent = i - 1
+        else:
+            shallow = [ j for j in range( i ) if depths[j] < depth - 1 ]
+            parent = int( rng.choice( shallow ) )
+        parents.append( parent )
+        depths.append( depths[parent] + 1 )
+    return parents
+
+def _write_joint(lines, index, parents, offsets, channels, indent):
+    '''Appends the hierarchy text for a joint and its descendants.'''
+
+    tabs = '\t' * indent
+    tag = 'ROOT' if parents[index] < 0 else 'JOINT'
+    chans = channels[0] if parents[index] < 0 else channels[1]
+    lines.append( f'{tabs}{tag} j{index:03d}\n{tabs}{{\n' )
+    lines.append( f'{tabs}\tOFFSET {offsets[index][0]:.6f} {offsets[index][1]:.6f} {offsets[index][2]:.6f}\n' )
+    lines.append( f'{tabs}\tCHANNELS {len(chans.split())} {chans}\n' )
+
+    children = [ child for child, parent in enumerate( parents ) if parent == index ]
+    for child in children:
+        _write_joint( lines, child, parents, offsets, channels, indent + 1 )
+    if len(children) == 0:
+        lines.append( f'{tabs}\tEnd Site\n{tabs}\t{{\n{tabs}\t\tOFFSET 0.000000 1.000000 0.000000\n{tabs}\t}}\n' )
+    lines.append( f'{tabs}}}\n' )
+
+def write_synthetic_bvh(filename:str, joints:int=20, depth:int=5, frames:int=100,
+                        layout:str='classic', resting:bool=False, frame_time:float=1.0/120.0,
+                        seed:int=0) -> int:
+    '''Writes a BVH with `joints` joints in chains no deeper than `depth`,
+       `frames` frames of random motion and, if resting is set, an extra
+       resting pose line.  Returns the number of channels per frame.'''
+
+    rng = np.random.default_rng( seed )
+    parents = build_parents( joints, depth, rng )
+    offsets = rng.uniform( -1.0, 1.0, size=( joints, 3 ) )
+    offsets[0] = 0.0
+    channels = LAYOUTS[layout]
+
+    lines = [ 'HIERARCHY\n' ]
+    _write_joint( lines, 0, parents, offsets, channels, 0 )
+
+    num_channels = len( channels[0].split() ) + ( joints - 1 ) * len( channels[1].split() )
+    lines.append( f'MOTION\nFrames: {frames}\nFrame Time: {frame_time:.7f}\n' )
+
+    with open( filename, 'w', encoding='utf-8' ) as fptr:
+        fptr.write( ''.join( lines ) )
+        lines_to_write = frames + ( 1 if resting else 0 )
+        for start in range( 0, lines_to_write, 4096 ):
+            count = min( 4096, lines_to_write - start )
+            values = rng.uniform( -45.0, 45.0, size=( count, num_channels ) )
+            np.savetxt( fptr, values, fmt='%.6f' )
+    return num_channels
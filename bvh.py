@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+'''One entry point for the BVH tools.  Subcommands import what they need when
+they run, so --help and info never load glm, NumPy or OpenGL, and each
+subcommand takes many files so a shell loop pays for startup only once.
+
+    bvh.py info *.bvh
+    bvh.py copy take1.bvh take2.bvh -o cleaned/
+    bvh.py extract -j Hips *.bvh
+    bvh.py plot take1.bvh take2.bvh -l overlay
+    bvh.py serve'''
+
+import os
+import sys
+import argparse
+from tools.profiling import add_profile_arguments, profile_from_args
+
+def _load( filename:str, args, max_depth:int=None ):
+    '''Loads a file, printing the phase breakdown if profiling was asked for.'''
+    from tools.bvh import BVH
+
+    profile = profile_from_args( args )
+    bvh = BVH( filename, max_depth, profile=profile )
+    if profile is not None:
+        print( f'{filename}:\n{profile.report()}' )
+    return bvh.skeleton
+
+def _each_file( args, action ):
+    '''Runs action on every file, reporting failures without stopping.'''
+    for filename in args.bvh:
+        try:
+            action( filename )
+        except Exception as err:
+            print( f'Failed {filename}: {err}' )
+
+def info(args):
+    '''Print a summary of each file's header'''
+    from tools.bvh_info import read_info, format_info
+
+    _each_file( args, lambda filename: print( format_info( read_info( filename ) ) ) )
+
+def copy_files(args):
+    '''Rewrite each file with fixed channel orders, no resting pose and aliased names'''
+    from tools.bvh_write import bvh_write
+    from tools.files import output_paths
+
+    outputs = { args.bvh[0] : args.output }
+    if len(args.bvh) > 1:
+        os.makedirs( args.output, exist_ok=True )
+        outputs = dict( zip( args.bvh, output_paths( args.bvh, args.output, '.bvh' ) ) )
+
+    def write(filename):
+        bvh_write( _load( filename, args ), outputs[filename] )
+
+    _each_file( args, write )
+
+def extract(args):
+    '''Print a joint's offset, world position, resting rotation and first frame'''
+    from tools import putils
+
+    def show(filename):
+        skel = _load( filename, args )
+        skel.set_unit_scale_factor()
+        if args.joint not in skel.joints:
+            print(f'Joint {args.joint} not found in skeleton of {filename}')
+            return
+
+        joint = skel.joints[args.joint]
+        resting_str = 'Resting:     <NONE>   '
+        if joint.resting is not None:
+            euler = putils.degrees(putils.quat_to_euler(joint.resting.rotation))
+            resting_str = f'Resting: {putils.vec_to_str(euler)}'
+        euler = putils.degrees(putils.quat_to_euler(joint.frames[0].rotation))
+
+        print(f'{filename}: Pos: {putils.vec_to_str(joint.position)} '
+              f'WPos: {putils.vec_to_str(joint.w_position)} {resting_str} '
+              f'Frame1: {putils.vec_to_str(euler)}')
+
+    _each_file( args, show )
+
+def plot(args):
+    '''Display the files in one window and animate them'''
+    from tools.glplot import Plot
+
+    skeletons = []
+    for filename in args.bvh:
+        if args.follow:
+            from tools.follow import MotionFollower
+            follower = MotionFollower( filename )
+            follower.wait_ready()
+            follower.skeleton.set_unit_scale_factor()
+            skeletons.append( follower )
+            continue
+        skel = _load( filename, args, args.max_depth )
+        skel.set_unit_scale_factor()
+        skeletons.append( skel )
+
+    view = Plot( skeletons, ' '.join(args.bvh), use_buffers=args.buffers or len(skeletons) > 1,
+                 layout=args.layout )
+    view.activate()
+
+def serve(args):
+    '''Run a clip server until a client asks it to shut down'''
+    from tools.clip_server import ClipServer
+
+    address = args.address
+    if address is not None and ':' in address:
+        host, port = address.rsplit( ':', 1 )
+        address = ( host, int(port) )
+    server = ClipServer( address, int( args.budget * 1024 * 1024 ) )
+    print( f'Serving clips on {server.address}' )
+    server.serve_forever()
+
+def main(args):
+    '''Dispatch to a subcommand'''
+    parser = argparse.ArgumentParser( prog='bvh',
+                 description='Inspect, convert and display BVH files.')
+    commands = parser.add_subparsers( dest='command', required=True )
+
+    sub = commands.add_parser( 'info', help='Summarize file headers without loading the motion.' )
+    sub.add_argument( 'bvh', nargs='+', help='The BVH files to summarize' )
+    sub.set_defaults( run=info )
+
+    sub = commands.add_parser( 'copy', help='Write cleaned up copies of files.' )
+    sub.add_argument( 'bvh', nargs='+', help='The input BVH files' )
+    sub.add_argument( '-o','--output', required=True,
+                      help='The output file, or a directory when copying several files, which keeps their folders.' )
+    add_profile_arguments( sub )
+    sub.set_defaults( run=copy_files )
+
+    sub = commands.add_parser( 'extract', help='Print details of one joint from each file.' )
+    sub.add_argument( 'bvh', nargs='+', help='The BVH files to load' )
+    sub.add_argument( '-j','--joint', required=True, help='Joint to extract' )
+    add_profile_arguments( sub )
+    sub.set_defaults( run=extract )
+
+    sub = commands.add_parser( 'plot', help='Display and play files.' )
+    sub.add_argument( 'bvh', nargs='+', help='The BVH files to load' )
+    sub.add_argument( '-d','--max_depth', type=int, default=None,
+                      help='Max depth of child joints to load.' )
+    sub.add_argument( '-b','--buffers', action='store_true',
+                      help='Draw all bones from vertex buffers in a single call.' )
+    sub.add_argument( '-l','--layout', choices=['grid', 'overlay'], default='grid',
+                      help='How to arrange several files.' )
+    sub.add_argument( '-f','--follow', action='store_true',
+                      help='Show the newest frame of files that are still being written.' )
+    add_profile_arguments( sub )
+    sub.set_defaults( run=plot )
+
+    sub = commands.add_parser( 'serve', help='Keep parsed clips in shared memory for other tools.' )
+    sub.add_argument( '-a','--address', default=None,
+                      help='A Unix socket path or loopback host:port to listen on.  '
+                           'A socket in a per-user runtime directory if not given.' )
+    sub.add_argument( '--budget', type=float, default=512.0,
+                      help='Megabytes of keyframe data to keep cached.' )
+    sub.set_defaults( run=serve )
+
+    args = parser.parse_args( args[1:] )
+    args.run( args )
+
+if __name__ == "__main__":
+    main( sys.argv )
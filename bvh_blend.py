@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+'''Builds transitions and layers from BVH clips on compatible skeletons:
+   crossfades, partial body layers masked by a joint's subtree and additive
+   layers.  The result is written with bvh_write using the first file's
+   skeleton.'''
+
+import sys
+import argparse
+import numpy as np
+from tools import blend
+from tools.bvh_write import bvh_write
+from tools.motion import Motion
+
+def main(args):
+    '''Blend BVH files and write the result'''
+    parser = argparse.ArgumentParser( prog='bvh_blend',
+                 description='Crossfade or layer BVH clips.')
+    commands = parser.add_subparsers( dest='command', required=True )
+
+    sub = commands.add_parser( 'crossfade', help='Play one clip into another.' )
+    sub.add_argument( 'bvh', nargs=2, help='The first and second clips' )
+    sub.add_argument( '-n','--overlap', type=int, default=30, help='Frames the clips overlap.' )
+    sub.add_argument( '--keep_root', action='store_true',
+                      help="Don't move the second clip to continue from the first." )
+
+    for name, text in ( ( 'layer', 'Blend a clip over another.' ),
+                        ( 'additive', "Add a clip's change from its first frame to another." ) ):
+        sub = commands.add_parser( name, help=text )
+        sub.add_argument( 'bvh', nargs=2, help='The base clip and the layer' )
+        sub.add_argument( '-w','--weight', type=float, default=1.0, help='Amount of the layer.' )
+        sub.add_argument( '-j','--joint', default=None,
+                          help='Only blend this joint and its descendants, eg: the spine.' )
+        sub.add_argument( '--fade', type=int, default=0,
+                          help='Frames over which the layer fades in.' )
+
+    for sub in commands.choices.values():
+        sub.add_argument( '-o','--output', required=True, help='The BVH file to write' )
+        sub.add_argument( '-c','--curve', choices=blend.CURVES, default='linear',
+                          help='Shape of fades.' )
+        sub.add_argument( '-m','--method', choices=sorted( blend.METHODS ), default='slerp',
+                          help='Quaternion interpolation.' )
+
+    args = parser.parse_args( args[1:] )
+
+    first, bvh = Motion.read( args.bvh[0] )
+    second, other = Motion.read( args.bvh[1] )
+    if other.skeleton.frame_time != bvh.skeleton.frame_time:
+        parser.error( f'Frame time of {args.bvh[1]} ({other.skeleton.frame_time}) does not match '
+                      f'{args.bvh[0]} ({bvh.skeleton.frame_time})' )
+
+    if args.command == 'crossfade':
+        result = blend.crossfade( first, second, args.overlap, args.curve, args.method,
+                                  align_root=not args.keep_root )
+    else:
+        frames = min( first.num_frames, second.num_frames )
+        weight = args.weight * ( blend.ramp( frames, 0, args.fade, args.curve ) if args.fade > 0
+                                 else np.ones( frames ) )
+        mask = None if args.joint is None else blend.subtree_mask( first, args.joint )
+        if args.command == 'layer':
+            result = blend.layer( first, second, weight, mask, args.method )
+        else:
+            result = blend.additive( first, second, weight, mask )
+
+    bvh_write( result.to_skeleton( bvh.skeleton ), args.output )
+    print( f'Wrote {result.num_frames} frames to {args.output}' )
+
+if __name__ == "__main__":
+    main( sys.argv )
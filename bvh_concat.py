@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+'''Joins BVH files that share a hierarchy into a single file.  The motion
+   lines are copied as-is without being parsed.'''
+
+import sys
+import argparse
+from tools.bvh_cut import bvh_concat
+
+def main(args):
+    '''Concatenate BVH files'''
+    parser = argparse.ArgumentParser( prog='bvh_concat',
+                 description='Join BVH files with matching hierarchies into one.')
+    parser.add_argument( 'output', help='The Output BVH file name.' )
+    parser.add_argument( 'bvh', nargs='+', help='The Input BVH files in playback order' )
+
+    args = parser.parse_args()
+
+    num_frames = bvh_concat( args.bvh, args.output )
+    print(f'Wrote {num_frames} frames to {args.output}')
+
+if __name__ == "__main__":
+    main( sys.argv )
@@ -1,12 +1,13 @@
 #!/usr/bin/env python3
 '''Reads a BVH file and writes it back out.  The write process will
-   assert XYZ position and rotation order, elminate resting pose,
+   assert XYZ position and ZYX rotation order, elminate resting pose,
    and change joint names to their preferred alias.'''
 
 import sys
 import argparse
 import copy
 from tools.bvh import BVH
+from tools.profiling import add_profile_arguments, profile_from_args
 from tools.bvh_write import bvh_write
 
 def main(args):
@@ -15,10 +16,14 @@ def main(args):
                  description='Load, display, and play the passed BVH.')
     parser.add_argument( 'bvh', help='The Input BVH file to load' )
     parser.add_argument( 'output', help='The Output BVH file name.' )
+    add_profile_arguments( parser )
 
     args = parser.parse_args()
 
-    bvh = BVH( args.bvh, None )
+    profile = profile_from_args( args )
+    bvh = BVH( args.bvh, None, profile=profile )
+    if profile is not None:
+        print( profile.report() )
 
     skel = copy.deepcopy(bvh.skeleton)
     #skel.set_unit_scale_factor()
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+'''Cuts a range of frames out of a BVH file.  The motion lines are copied
+   as-is without being parsed so even very long takes are cut quickly.'''
+
+import sys
+import argparse
+from tools.bvh_cut import bvh_cut
+
+def main(args):
+    '''Cut a frame range out of a BVH file'''
+    parser = argparse.ArgumentParser( prog='bvh_cut',
+                 description='Copy a range of frames from a BVH into a new file.')
+    parser.add_argument( 'bvh', help='The Input BVH file to cut' )
+    parser.add_argument( 'output', help='The Output BVH file name.' )
+    parser.add_argument( 'start', type=int, help='First frame to keep.' )
+    parser.add_argument( 'stop', type=int, nargs='?', default=None,
+                         help='Frame to stop before.  Defaults to the end of the file.' )
+
+    args = parser.parse_args()
+
+    num_frames = bvh_cut( args.bvh, args.output, args.start, args.stop )
+    print(f'Wrote {num_frames} frames to {args.output}')
+
+if __name__ == "__main__":
+    main( sys.argv )
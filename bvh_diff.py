@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+'''Compares two BVH files joint by joint and frame by frame, within
+   tolerances.  Joints are paired by name and rotations are compared as
+   quaternions, so a converted file with a different channel order still
+   matches.  Exits with 1 if the files differ.'''
+
+import sys
+import argparse
+from tools.clip_diff import diff_clips, format_diff, write_diff
+
+def main(args):
+    '''Report the differences between two BVH files'''
+    parser = argparse.ArgumentParser( prog='bvh_diff',
+                 description='Per joint rotation and position differences between two BVH files.')
+    parser.add_argument( 'first', help='A BVH file' )
+    parser.add_argument( 'second', help='The BVH file to compare it to' )
+    parser.add_argument( '-r','--rotation_tolerance', type=float, default=0.01,
+                         help='Degrees of difference allowed.' )
+    parser.add_argument( '-p','--position_tolerance', type=float, default=1e-4,
+                         help='Position difference allowed, in file units.' )
+    parser.add_argument( '-w','--world', action='store_true',
+                         help='Also compare the world position of every joint.' )
+    parser.add_argument( '-a','--all', action='store_true',
+                         help='List every joint, not only those that differ.' )
+    parser.add_argument( '-o','--output', default=None,
+                         help='Also write the result to a .json file, or the joint rows to a .csv.' )
+
+    args = parser.parse_args( args[1:] )
+
+    result = diff_clips( args.first, args.second, rotation_tolerance=args.rotation_tolerance,
+                         position_tolerance=args.position_tolerance, world=args.world )
+    print( format_diff( result, args.all ) )
+    if args.output:
+        write_diff( result, args.output )
+    return 0 if result['summary']['equal'] else 1
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv ) )
@@ -1,43 +1,85 @@
 #!/usr/bin/env python3
 '''Loads a BVH file. Takes a parameter for joint outputs the parent and world positions
-for the joint, the resting rotation (if applicable) and the 1st frame'''
+for the joint, the resting rotation (if applicable) and the 1st frame.
+
+With --output, full trajectories of any number of joints are exported to CSV or
+.npy instead, computed with batched FK straight from the motion arrays.'''
 
 import sys
 import argparse
 import copy
 from tools.bvh import BVH
+from tools.profiling import add_profile_arguments, profile_from_args
 from tools  import putils
 
+def export(args):
+    '''Write trajectories of the requested joints and frames'''
+    from tools.motion import Motion
+    from tools.trajectories import export_trajectories
+
+    motion, _ = Motion.read( args.bvh )
+    joints = None if args.all else args.joint
+    written = export_trajectories( motion, args.output, joints, args.start, args.stop,
+                                   args.stride, args.values )
+    print( f'Wrote {written} frames of {len(joints or motion.names)} joints to {args.output}' )
+
+def _stride(text:str) -> int:
+    '''argparse type for --stride, which has to be at least 1'''
+    stride = int(text)
+    if stride < 1:
+        raise argparse.ArgumentTypeError( f'stride must be at least 1, not {stride}' )
+    return stride
+
 def main(args):
     '''Plot BVH files and animate them'''
     parser = argparse.ArgumentParser( prog='bvh_extract',
                  description='Load, display, and play the passed BVH.')
     parser.add_argument( 'bvh', help='The BVH file to load' )
-    parser.add_argument( 'joint', help='Joint to extract' )
+    parser.add_argument( 'joint', nargs='*', help='Joints to extract' )
+    parser.add_argument( '-a','--all', action='store_true', help='Export every joint.' )
+    parser.add_argument( '-o','--output', default=None,
+                         help='Export trajectories to this .csv or .npy file.' )
+    parser.add_argument( '--start', type=int, default=0, help='First frame to export.' )
+    parser.add_argument( '--stop', type=int, default=None, help='Frame to stop exporting before.' )
+    parser.add_argument( '--stride', type=_stride, default=1, help='Export every Nth frame.' )
+    parser.add_argument( '--values', nargs='+', default=[ 'world', 'rotation' ],
+                         choices=[ 'world', 'world_rotation', 'local', 'rotation', 'euler' ],
+                         help='What to export for each joint.' )
+    add_profile_arguments( parser )
 
     args = parser.parse_args()
 
-    bvh = BVH( args.bvh, None )
+    if args.output is not None:
+        if not args.joint and not args.all:
+            parser.error( 'name the joints to export or pass --all' )
+        export( args )
+        return
+    if not args.joint:
+        parser.error( 'a joint is needed unless exporting with --output' )
+
+    profile = profile_from_args( args )
+    bvh = BVH( args.bvh, None, profile=profile )
+    if profile is not None:
+        print( profile.report() )
 
     skel = copy.deepcopy(bvh.skeleton)
     skel.set_unit_scale_factor()
 
-    #Bail out if joint not found.
-    if args.joint not in skel.joints:
-        print(f'Joint {args.joint} not found in skeleton of {args.bvh}')
-        return
-
-    joint = skel.joints[args.joint]
-    resting_str = 'Resting:     <NONE>   '
-    if joint.resting is not None:
-        euler = putils.degrees(putils.quat_to_euler(joint.resting.rotation))
-        resting_str = f'Resting: {putils.vec_to_str(euler)}'
+    for name in args.joint:
+        #Skip joints that aren't found.
+        if name not in skel.joints:
+            print(f'Joint {name} not found in skeleton of {args.bvh}')
+            continue
 
-    euler = putils.degrees(putils.quat_to_euler(joint.frames[0].rotation))
+        joint = skel.joints[name]
+        resting_str = 'Resting:     <NONE>   '
+        if joint.resting is not None:
+            euler = putils.degrees(putils.quat_to_euler(joint.resting.rotation))
+            resting_str = f'Resting: {putils.vec_to_str(euler)}'
 
-    print(f'Pos: {putils.vec_to_str(joint.position)} WPos: {putils.vec_to_str(joint.w_position)} {resting_str} Frame1: {putils.vec_to_str(euler)}')
+        euler = putils.degrees(putils.quat_to_euler(joint.frames[0].rotation))
 
-    
+        print(f'Pos: {putils.vec_to_str(joint.position)} WPos: {putils.vec_to_str(joint.w_position)} {resting_str} Frame1: {putils.vec_to_str(euler)}')
 
 if __name__ == "__main__":
     main( sys.argv )
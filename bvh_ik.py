@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+'''Removes foot sliding from a BVH file.  Foot contacts are detected from
+   height and speed, then each planted foot is held at its contact's mean
+   position with two-bone IK solved over every frame at once.  Prints how
+   far each foot was from its target before and after.'''
+
+import sys
+import argparse
+from tools.ik import lock_feet_file
+from tools.mirror import AXES
+
+def main(args):
+    '''Lock the feet of a BVH file'''
+    parser = argparse.ArgumentParser( prog='bvh_ik',
+                 description='Clean up foot sliding with batched two-bone IK.')
+    parser.add_argument( 'bvh', help='The BVH file to fix' )
+    parser.add_argument( '-o','--output', required=True, help='The .bvh to write.' )
+    parser.add_argument( '-f','--feet', nargs='+', default=None,
+                         help='Names of the foot joints.  Joints named like a foot or ankle if not given.' )
+    parser.add_argument( '-u','--up', choices=sorted( AXES ), default='y', help='The vertical axis.' )
+    parser.add_argument( '--fade', type=int, default=0,
+                         help='Frames to blend the correction in and out around each contact.' )
+    parser.add_argument( '-t','--tolerance', type=float, default=1e-3,
+                         help='Distance from a target still counted as reached.' )
+    parser.add_argument( '-e','--errors', default=None,
+                         help='A .csv of every frame\'s distance to target before and after.' )
+
+    args = parser.parse_args( args[1:] )
+
+    results = lock_feet_file( args.bvh, args.output, args.feet, AXES[args.up], args.fade, args.errors )
+    for result in results:
+        summary = result.summary( args.tolerance )
+        print( f"{summary['joint']}: {summary['frames']} planted frames, "
+               f"max error {summary['max_before']:.4g} -> {summary['max_after']:.4g}, "
+               f"{summary['over_tolerance']} over tolerance" )
+
+if __name__ == "__main__":
+    main( sys.argv )
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+'''Builds a pose similarity index over a library of BVH files and searches it
+   for the windows most like a frame of a clip.
+
+    bvh_index.py build library.npz library/ --window 5 --stride 2
+    bvh_index.py query library.npz take.bvh 120 -k 10'''
+
+import sys
+import argparse
+from tools.files import find_bvh_files
+from tools.motion_index import MotionIndex
+
+def main(args):
+    '''Build or query a motion similarity index'''
+    parser = argparse.ArgumentParser( prog='bvh_index',
+                 description='Find clips with poses like a given frame.')
+    commands = parser.add_subparsers( dest='command', required=True )
+
+    sub = commands.add_parser( 'build', help='Index BVH files.' )
+    sub.add_argument( 'index', help='The .npz file to write' )
+    sub.add_argument( 'bvh', nargs='+', help='BVH files or directories of them' )
+    sub.add_argument( '-j','--joints', nargs='+', default=None,
+                      help='Joints to compare.  Defaults to all joints of the first file.' )
+    sub.add_argument( '--window', type=int, default=1, help='Frames per feature.' )
+    sub.add_argument( '--stride', type=int, default=1, help='Frames between windows.' )
+    sub.add_argument( '--dims', type=int, default=32, help='PCA dimensions kept.' )
+    sub.add_argument( '--clusters', type=int, default=None,
+                      help='Inverted file clusters.  Defaults to the square root of the windows.' )
+    sub.add_argument( '-w','--workers', type=int, default=None, help='Number of processes.' )
+
+    sub = commands.add_parser( 'query', help='Search an index.' )
+    sub.add_argument( 'index', help='The .npz file to search' )
+    sub.add_argument( 'bvh', help='The clip holding the pose to look for' )
+    sub.add_argument( 'frame', type=int, help='First frame of the window to look for' )
+    sub.add_argument( '-k', type=int, default=10, help='Number of matches.' )
+    sub.add_argument( '-p','--probes', type=int, default=8,
+                      help='Clusters searched.  More is slower but more exact.' )
+
+    args = parser.parse_args( args[1:] )
+
+    if args.command == 'build':
+        index = MotionIndex.build( find_bvh_files(args.bvh), args.joints, args.window, args.stride,
+                                   args.dims, args.clusters, args.workers )
+        index.save( args.index )
+        print( f'Indexed {len(index)} windows from {len(index.clips)} clips' )
+    else:
+        index = MotionIndex.load( args.index )
+        for filename, frame, distance in index.query_clip( args.bvh, args.frame, args.k,
+                                                           args.probes ):
+            print( f'{distance:10.4f} {frame:8d} {filename}' )
+
+if __name__ == "__main__":
+    main( sys.argv )
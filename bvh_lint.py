@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+'''Checks BVH files for structural problems without loading them: the
+   hierarchy, channel declarations, values per motion line, NaN and infinite
+   values and declared against actual frame counts.  Every problem is
+   reported with its line number.  Directories are searched for .bvh files
+   and the work is spread over a process pool.  Exits with 1 if any file has
+   errors.'''
+
+import sys
+import argparse
+from tools.lint import lint_library, write_diagnostics
+from tools.files import find_bvh_files
+
+def main(args):
+    '''Validate BVH files and report diagnostics'''
+    parser = argparse.ArgumentParser( prog='bvh_lint',
+                 description='Structural validation of BVH files.')
+    parser.add_argument( 'bvh', nargs='+', help='BVH files or directories of them' )
+    parser.add_argument( '-o','--output', default=None,
+                         help='A .json or .csv file.  Readable text to stdout if not given.' )
+    parser.add_argument( '-l','--limit', type=int, default=20,
+                         help='Most diagnostics of one kind reported per file.' )
+    parser.add_argument( '-w','--workers', type=int, default=None, help='Number of processes.' )
+
+    args = parser.parse_args( args[1:] )
+
+    results = lint_library( find_bvh_files(args.bvh), args.workers, args.limit )
+    write_diagnostics( results, args.output )
+    return 0 if all( result['ok'] for result in results ) else 1
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv ) )
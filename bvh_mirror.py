@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+'''Writes left/right mirror images of BVH files, pairing joints by name.
+   Directories are searched for .bvh files and the work is spread over a
+   process pool.'''
+
+import sys
+import argparse
+from tools.files import find_bvh_files
+from tools.mirror import AXES, mirror_file, mirror_library
+
+def main(args):
+    '''Mirror BVH files'''
+    parser = argparse.ArgumentParser( prog='bvh_mirror',
+                 description='Mirror BVH files left to right.')
+    parser.add_argument( 'bvh', nargs='+', help='BVH files or directories of them' )
+    parser.add_argument( '-o','--output', required=True,
+                         help='The output .bvh for a single file, otherwise a directory.' )
+    parser.add_argument( '-a','--axis', choices=sorted( AXES ), default='x',
+                         help='Normal of the mirror plane.' )
+    parser.add_argument( '-s','--suffix', default='_mirror',
+                         help='Added to the names of files written to a directory.' )
+    parser.add_argument( '-w','--workers', type=int, default=None, help='Number of processes.' )
+
+    args = parser.parse_args( args[1:] )
+
+    filenames = find_bvh_files( args.bvh )
+    if len(filenames) == 1 and args.output.lower().endswith( '.bvh' ):
+        paired = mirror_file( filenames[0], args.output, AXES[args.axis] )
+        print( f'{filenames[0]}: {paired} joints paired' )
+        return
+    results = mirror_library( filenames, args.output, AXES[args.axis], args.suffix, args.workers )
+    print( f'Mirrored {sum( result is not None for result in results )} of {len(filenames)} files' )
+
+if __name__ == "__main__":
+    main( sys.argv )
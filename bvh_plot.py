@@ -10,28 +10,53 @@ else done.'''
 
 import sys
 import argparse
-import copy
 import faulthandler
 from tools.bvh import BVH
+from tools.follow import MotionFollower
 from tools.glplot import Plot
+from tools.profiling import add_profile_arguments, profile_from_args
 
 def main(args):
     '''Plot BVH files and animate them'''
     parser = argparse.ArgumentParser( prog='bvh_plot',
                  description='Load, display, and play the passed BVH.')
-    parser.add_argument( 'bvh', help='The BVH file to load' )
+    parser.add_argument( 'bvh', nargs='+', help='The BVH files to load' )
     parser.add_argument( '-d','--max_depth',
                         type=int,
                         default=None,
                         help='Max depth of child joints to load.' )
+    parser.add_argument( '-b','--buffers',
+                        action='store_true',
+                        help='Draw all bones from vertex buffers in a single call.  '
+                             'Always on when plotting several files.' )
+    parser.add_argument( '-l','--layout',
+                        choices=['grid', 'overlay'],
+                        default='grid',
+                        help='How to arrange several files.' )
+    parser.add_argument( '-f','--follow',
+                        action='store_true',
+                        help='Show the newest frame of files that are still being written.' )
+    add_profile_arguments( parser )
 
     args = parser.parse_args()
 
-    bvh = BVH( args.bvh, args.max_depth )
+    skeletons = []
+    for filename in args.bvh:
+        if args.follow:
+            follower = MotionFollower( filename )
+            follower.wait_ready()
+            follower.skeleton.set_unit_scale_factor()
+            skeletons.append( follower )
+            continue
+        profile = profile_from_args( args )
+        skel = BVH( filename, args.max_depth, profile=profile ).skeleton
+        if profile is not None:
+            print( f'{filename}:\n{profile.report()}' )
+        skel.set_unit_scale_factor()
+        skeletons.append( skel )
 
-    skel = copy.deepcopy(bvh.skeleton)
-    skel.set_unit_scale_factor()
-    plot = Plot( skel, args.bvh )
+    plot = Plot( skeletons, ' '.join(args.bvh), use_buffers=args.buffers or len(skeletons) > 1,
+                 layout=args.layout )
     plot.activate()
 
 if __name__ == "__main__":
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+'''Groups BVH files by rig from their headers alone.  Rigs match when their
+   joint names, parents and channel layout are the same and every offset is
+   within a precision of the other rig's.  Directories are searched for .bvh files.'''
+
+import sys
+import json
+import argparse
+from tools.files import find_bvh_files
+from tools.rigs import RigRegistry
+
+def main(args):
+    '''Fingerprint the rigs of BVH files'''
+    parser = argparse.ArgumentParser( prog='bvh_rigs',
+                 description='Group BVH files by rig fingerprint.')
+    parser.add_argument( 'bvh', nargs='+', help='BVH files or directories of them' )
+    parser.add_argument( '-p','--precision', type=float, default=1e-4,
+                         help='Rigs whose offsets are all within this of each other are the same rig.' )
+    parser.add_argument( '-v','--verbose', action='store_true', help='List the files of each rig.' )
+    parser.add_argument( '-o','--output', default=None,
+                         help='A .json file of the rigs and their files.' )
+
+    args = parser.parse_args( args[1:] )
+
+    registry = RigRegistry( args.precision )
+    groups = registry.group( find_bvh_files(args.bvh) )
+
+    if args.output is not None:
+        rigs = { fingerprint : { 'joints' : list( registry[fingerprint].names ),
+                                 'parents' : registry[fingerprint].parents.tolist(),
+                                 'channels' : registry[fingerprint].width,
+                                 'files' : files }
+                 for fingerprint, files in groups.items() }
+        with open( args.output, 'w', encoding='utf-8' ) as fptr:
+            json.dump( rigs, fptr, indent=1 )
+
+    for fingerprint, files in groups.items():
+        topology = registry[fingerprint]
+        print( f'{fingerprint[:12]}: root {topology.names[0]}, {topology.num_joints} joints, '
+               f'{topology.width} channels, {len(files)} files' )
+        if args.verbose:
+            for filename in files:
+                print( f'    {filename}' )
+
+if __name__ == "__main__":
+    main( sys.argv )
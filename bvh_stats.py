@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+'''Per-joint, per-channel statistics and jump detection for BVH files, read in
+   one streaming pass without building keyframes.  Directories are searched
+   for .bvh files and the work is spread over a process pool.'''
+
+import sys
+import argparse
+from tools.channel_stats import library_stats, write_stats
+from tools.files import find_bvh_files
+
+def main(args):
+    '''Print or save channel statistics for BVH files'''
+    parser = argparse.ArgumentParser( prog='bvh_stats',
+                 description='Min, max, mean, variance and jumps of every channel.')
+    parser.add_argument( 'bvh', nargs='+', help='BVH files or directories of them' )
+    parser.add_argument( '-o','--output', default=None,
+                         help='A .csv or .json file.  CSV to stdout if not given.' )
+    parser.add_argument( '-s','--summary', action='store_true',
+                         help='One row per file instead of one per channel.' )
+    parser.add_argument( '--rotation_jump', type=float, default=30.0,
+                         help='Degrees between frames that count as a jump.' )
+    parser.add_argument( '--position_jump', type=float, default=None,
+                         help='Position change between frames, in file units, that counts as a jump.' )
+    parser.add_argument( '-w','--workers', type=int, default=None, help='Number of processes.' )
+
+    args = parser.parse_args( args[1:] )
+
+    results = library_stats( find_bvh_files(args.bvh), args.workers,
+                             rotation_jump=args.rotation_jump, position_jump=args.position_jump )
+    write_stats( results, args.output, args.summary )
+
+if __name__ == "__main__":
+    main( sys.argv )
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+'''Renders preview images for BVH files without a window.  Directories are
+   searched for .bvh files and the work is spread over a process pool.'''
+
+import sys
+import argparse
+from tools.camera import OrbitCamera
+from tools.files import find_bvh_files
+from tools.raster import render_library
+
+def main(args):
+    '''Render thumbnails or contact sheets for BVH files'''
+    parser = argparse.ArgumentParser( prog='bvh_thumbs',
+                 description='Render preview images of BVH files without a display.')
+    parser.add_argument( 'bvh', nargs='+', help='BVH files or directories of them' )
+    parser.add_argument( '-o','--output', default='thumbs', help='Directory for the images.' )
+    parser.add_argument( '-s','--size', type=int, default=256, help='Width and height of each tile.' )
+    parser.add_argument( '-f','--frames', type=int, default=1,
+                         help='Frames per image.  More than one makes a contact sheet.' )
+    parser.add_argument( '-c','--columns', type=int, default=None, help='Tiles per contact sheet row.' )
+    parser.add_argument( '-w','--workers', type=int, default=None, help='Number of processes.' )
+    parser.add_argument( '--format', choices=['png', 'ppm'], default='png', help='Image format.' )
+    parser.add_argument( '--rotate_y', type=float, default=180.0, help='Camera orbit in degrees.' )
+    parser.add_argument( '--rotate_x', type=float, default=0.0, help='Camera tilt in degrees.' )
+    parser.add_argument( '--scale', type=float, default=1.0, help='Camera zoom.' )
+    parser.add_argument( '--fit', action='store_true',
+                         help='Scale each clip by how far it reaches when animated, not its rest pose.' )
+
+    args = parser.parse_args()
+
+    camera = OrbitCamera( args.rotate_y, args.rotate_x, args.scale )
+    outputs = render_library( find_bvh_files(args.bvh), args.output, args.format, args.workers,
+                              frames=args.frames, columns=args.columns, size=args.size,
+                              camera=camera, fit=args.fit )
+    print(f'Rendered {sum(output is not None for output in outputs)} of {len(outputs)} files')
+
+if __name__ == "__main__":
+    main( sys.argv )
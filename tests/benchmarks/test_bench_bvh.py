@@ -0,0 +1,53 @@
+'''Tests for the synthetic files and the benchmark runner.'''
+
+import json
+
+import pytest
+
+from benchmarks import bench_bvh
+from benchmarks.synthetic import write_synthetic_bvh, build_parents
+from tools.bvh import BVH
+from tools.motion import Motion
+
+def chain_depth(parents) -> int:
+    '''Joints in the longest root to leaf chain'''
+    depths = []
+    for parent in parents:
+        depths.append( 0 if parent < 0 else depths[parent] + 1 )
+    return max( depths ) + 1
+
+@pytest.mark.parametrize( 'layout', [ 'classic', 'xyz', 'full' ] )
+def test_synthetic_reads_back(tmp_path, layout):
+    '''BVH reads back the requested joints, depth and frames.'''
+    path = str( tmp_path / 'synthetic.bvh' )
+    channels = write_synthetic_bvh( path, joints=12, depth=4, frames=30, layout=layout,
+                                    frame_time=0.01 )
+    bvh = BVH( path )
+    motion = Motion.from_skeleton( bvh.skeleton )
+    assert len(motion.names) == 12
+    assert chain_depth( motion.parents ) == 4
+    assert bvh.skeleton.num_frames == 30 and motion.num_frames == 30
+    assert bvh.skeleton.frame_time == pytest.approx( 0.01 )
+    assert channels == sum( len(chan.rotation) + len(chan.position) for chan in bvh.channels )
+
+def test_build_parents():
+    with pytest.raises( Exception ):
+        build_parents( 0, 3, None )
+    with pytest.raises( Exception ):
+        build_parents( 3, 1, None )
+    assert build_parents( 1, 1, None ) == [ -1 ]
+
+def test_bench_smoke(tmp_path, capsys):
+    '''One small case runs and its results can be compared.'''
+    out = str( tmp_path / 'after.json' )
+    bench_bvh.main( [ 'bench_bvh', '--joints', '5', '--depth', '3', '--frames', '10',
+                      '--cases', 'read_file', '--repeat', '1', '-o', out ] )
+    with open( out, encoding='utf-8' ) as fptr:
+        report = json.load( fptr )
+    assert len(report['runs']) == 1
+    run = report['runs'][0]
+    assert run['case'] == 'read_file' and run['params']['frames'] == 10
+    assert run['seconds'] > 0.0 and run['peak_bytes'] > 0
+
+    bench_bvh.main( [ 'bench_bvh', '--compare', out, out ] )
+    assert 'time x1.00' in capsys.readouterr().out
@@ -84,3 +84,52 @@ def skeleton_setup(joint_setup, request):
     skel.joints  = recursively_get_joint_names(root)
 
     return skel
+
+BVH_HIERARCHY = '''HIERARCHY
+ROOT hips
+{
+	OFFSET 0.0 0.0 0.0
+	CHANNELS 6 Xposition Yposition Zposition Zrotation Xrotation Yrotation
+	JOINT chest
+	{
+		OFFSET 0.0 1.0 0.0
+		CHANNELS 3 Zrotation Xrotation Yrotation
+		End Site
+		{
+			OFFSET 0.0 1.0 0.0
+		}
+	}
+	JOINT leftleg
+	{
+		OFFSET 0.5 -1.0 0.0
+		CHANNELS 3 Zrotation Xrotation Yrotation
+		End Site
+		{
+			OFFSET 0.0 -1.0 0.0
+		}
+	}
+}
+'''
+
+def make_bvh_text(num_frames, first=0, frame_time=0.033333):
+    '''Builds the text of a small BVH file.  Each frame's channel values are
+       derived from its frame number so slices can be identified.'''
+
+    lines = [ BVH_HIERARCHY, 'MOTION\n', f'Frames: {num_frames}\n',
+              f'Frame Time: {frame_time}\n' ]
+    for frame in range(first, first + num_frames):
+        values = [ frame, 0, 0, frame, 0, 0, 0, frame, 0, 0, 0, frame ]
+        lines.append( ' '.join( f'{value:.6f}' for value in values ) + '\n' )
+    return ''.join(lines)
+
+@pytest.fixture(scope='function')
+def bvh_file(tmp_path):
+    '''Writes a 10 frame BVH file with the hierarchy
+        hips
+            chest
+            leftleg
+    '''
+
+    path = tmp_path / 'fixture.bvh'
+    path.write_text( make_bvh_text(10), encoding='utf-8' )
+    return str(path)
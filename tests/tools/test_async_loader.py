@@ -0,0 +1,59 @@
+'''Tests for loading BVH files from asyncio.'''
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tools.async_loader import AsyncLoader
+from tools.bvh import BVH
+
+from tests.tools.fixtures import bvh_file
+
+def test_matches_sync_load(bvh_file):
+    '''The async path gives the same skeleton as BVH( filename ).'''
+
+    async def run():
+        async with AsyncLoader( max_workers=2 ) as loader:
+            return await loader.load( bvh_file )
+
+    skel = asyncio.run( run() )
+    expected = BVH( bvh_file ).skeleton
+
+    assert list(skel.joints) == list(expected.joints)
+    assert skel.num_frames == expected.num_frames
+    for name, joint in expected.joints.items():
+        frames = skel.joints[name].frames
+        assert len(frames) == len(joint.frames)
+        for ours, theirs in zip( frames, joint.frames ):
+            assert ours.rotation == theirs.rotation
+        assert skel.joints[name].w_position == joint.w_position
+
+def test_load_many(bvh_file, tmp_path):
+    '''Results come back in order, failures can be returned instead of raised.'''
+
+    missing = str( tmp_path / 'missing.bvh' )
+
+    async def run():
+        with ThreadPoolExecutor( 2 ) as pool:
+            loader = AsyncLoader( pool, max_concurrency=3 )
+            return await loader.load_many( [ bvh_file ] * 5 + [ missing ], return_exceptions=True )
+
+    results = asyncio.run( run() )
+    assert all( len(skel.get_root().frames) == 10 for skel in results[:5] )
+    assert isinstance( results[5], FileNotFoundError )
+
+def test_cancel_releases_slots(bvh_file):
+    '''Cancelled loads give their slots back so later loads still run.'''
+
+    async def run():
+        with ThreadPoolExecutor( 1 ) as pool:
+            loader = AsyncLoader( pool, max_concurrency=1 )
+            task = asyncio.ensure_future( loader.load_many( [ bvh_file ] * 20 ) )
+            await asyncio.sleep( 0 )
+            task.cancel()
+            with pytest.raises( asyncio.CancelledError ):
+                await task
+            return await asyncio.wait_for( loader.load( bvh_file ), 10.0 )
+
+    assert len( asyncio.run( run() ).get_root().frames ) == 10
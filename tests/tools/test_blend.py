@@ -0,0 +1,117 @@
+'''Tests for blending, layering and crossfading.'''
+
+import numpy as np
+import pytest
+
+import bvh_blend
+from tools import blend, nputils
+from tools.clip_diff import rotation_errors
+from tools.motion import Motion
+
+from tests.tools.fixtures import make_bvh_text
+
+@pytest.fixture
+def clips(tmp_path):
+    '''A 10 frame clip counting up from 0 and an 8 frame one from 40'''
+    names = []
+    for frames, first in ( ( 10, 0 ), ( 8, 40 ) ):
+        path = tmp_path / f'clip{first}.bvh'
+        path.write_text( make_bvh_text( frames, first ), encoding='utf-8' )
+        names.append( str(path) )
+    return names
+
+def angles(motion, joint):
+    '''Degrees of the fixture's single axis rotation of a joint'''
+    return np.degrees( 2.0 * np.arctan2( np.linalg.norm( motion.rotations[:,joint,1:], axis=-1 ),
+                                         motion.rotations[:,joint,0] ) )
+
+def test_subtree_mask_and_ramp(clips):
+    motion, _ = Motion.read( clips[0] )
+    assert blend.subtree_mask( motion, 'chest' ).tolist() == [ 0, 1, 0 ]
+    assert blend.subtree_mask( motion, 'hips', 0.5 ).tolist() == [ 0.5, 0.5, 0.5 ]
+    with pytest.raises( Exception ):
+        blend.subtree_mask( motion, 'head' )
+
+    assert blend.ramp( 6, 1, 3 ).tolist() == [ 0, 0, 0.5, 1, 1, 1 ]
+    assert blend.ramp( 5, 0, 5, 'smooth' )[[0, 2, 4]] == pytest.approx( [ 0, 0.5, 1 ] )
+
+def test_blend(clips):
+    first, _ = Motion.read( clips[0] )
+    second, _ = Motion.read( clips[1] )
+
+    half = blend.blend( [ first, second ], [ 0.5, 0.5 ] )
+    assert half.num_frames == 8
+    assert angles( half, 1 ) == pytest.approx( np.arange( 8 ) + 20, abs=1e-6 )
+    assert half.root_positions[:,0] == pytest.approx( np.arange( 8 ) + 20 )
+
+    three = blend.blend( [ first, second, first ], [ 1, 1, 2 ] )
+    assert angles( three, 1 ) == pytest.approx( np.arange( 8 ) + 10, abs=1e-6 )
+
+    masked = blend.layer( first, second, 1.0, blend.subtree_mask( first, 'leftleg' ), method='nlerp' )
+    assert angles( masked, 2 ) == pytest.approx( np.arange( 8 ) + 40, abs=1e-6 )
+    assert angles( masked, 1 ) == pytest.approx( np.arange( 8 ), abs=1e-6 )
+    assert masked.root_positions[:,0] == pytest.approx( np.arange( 8 ) )
+
+def test_additive(clips):
+    first, _ = Motion.read( clips[0] )
+    second, _ = Motion.read( clips[1] )
+    added = blend.additive( first, second, 0.5 )
+    assert angles( added, 1 ) == pytest.approx( np.arange( 8 ) * 1.5, abs=1e-6 )
+    assert added.root_positions[:,0] == pytest.approx( np.arange( 8 ) * 1.5 )
+
+    still = second.take( np.full( 8, 5 ) )
+    none = blend.additive( first, still )
+    assert rotation_errors( none.rotations, first.rotations[:8] ) == pytest.approx( 0.0, abs=1e-4 )
+    assert none.root_positions == pytest.approx( first.root_positions[:8] )
+
+def test_crossfade(clips):
+    first, _ = Motion.read( clips[0] )
+    second, _ = Motion.read( clips[1] )
+    faded = blend.crossfade( first, second, 3 )
+
+    assert faded.num_frames == 10 + 8 - 3
+    hips = angles( faded, 0 )
+    assert hips[:8] == pytest.approx( np.arange( 8 ), abs=1e-6 )
+    assert hips[8] == pytest.approx( ( 8 + 41 ) / 2, abs=1e-6 )
+    assert hips[9:] == pytest.approx( np.arange( 42, 48 ), abs=1e-6 )
+    #The second clip continues from frame 7 of the first on the ground plane.
+    assert faded.root_positions[9:,0] == pytest.approx( np.arange( 9, 15 ) )
+    with pytest.raises( Exception ):
+        blend.crossfade( first, second, 9 )
+
+def test_renamed_joints(clips, tmp_path):
+    path = tmp_path / 'reordered.bvh'
+    path.write_text( make_bvh_text( 8, 40 ).replace( 'chest', 'spine' ), encoding='utf-8' )
+    first, _ = Motion.read( clips[0] )
+    with pytest.raises( Exception ):
+        blend.layer( first, Motion.read( str(path) )[0] )
+
+def test_cli_writes(clips, tmp_path):
+    out = str( tmp_path / 'out.bvh' )
+    bvh_blend.main( [ 'bvh_blend', 'crossfade', clips[0], clips[1], '-n', '3', '-o', out ] )
+    written, _ = Motion.read( out )
+    expected = blend.crossfade( Motion.read( clips[0] )[0], Motion.read( clips[1] )[0], 3 )
+    assert written.num_frames == 15
+    assert rotation_errors( written.rotations, expected.rotations ) == pytest.approx( 0.0, abs=1e-3 )
+    assert written.root_positions == pytest.approx( expected.root_positions, abs=1e-5 )
+
+    bvh_blend.main( [ 'bvh_blend', 'layer', clips[0], clips[1], '-j', 'chest', '--fade', '4',
+                      '-c', 'smooth', '-o', out ] )
+    assert Motion.read( out )[0].num_frames == 8
+
+def test_cli_frame_time(clips, tmp_path):
+    other = tmp_path / 'other.bvh'
+    other.write_text( make_bvh_text( 8, 40, frame_time=1/125 ), encoding='utf-8' )
+    with pytest.raises( SystemExit ):
+        bvh_blend.main( [ 'bvh_blend', 'crossfade', clips[0], str(other), '-o', str( tmp_path / 'out.bvh' ) ] )
+
+def test_cli_keeps_frame_time(tmp_path):
+    '''120 fps stays 120 fps rather than the whole milliseconds of frame_rate.'''
+    names = []
+    for first in ( 0, 40 ):
+        names.append( str( tmp_path / f'fast{first}.bvh' ) )
+        ( tmp_path / f'fast{first}.bvh' ).write_text( make_bvh_text( 8, first, frame_time=1/120 ),
+                                                      encoding='utf-8' )
+    out = str( tmp_path / 'out.bvh' )
+    bvh_blend.main( [ 'bvh_blend', 'layer', names[0], names[1], '-o', out ] )
+    assert Motion.read( out )[1].skeleton.frame_time == pytest.approx( 1/120, rel=1e-9 )
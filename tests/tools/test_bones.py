@@ -0,0 +1,65 @@
+'''Tests for the flat bone layout used for batched drawing.'''
+
+import glm
+import numpy as np
+
+from tools.bones import BoneBatch, BoneBuffer, grid_placements, joint_color, rig_key, \
+                        LEFT_COLOR, RIGHT_COLOR, CENTER_COLOR
+
+from tests.tools.fixtures import joint_setup, skeleton_setup
+
+def test_joint_color():
+    '''Left/right is guessed from the joint name.'''
+    assert joint_color('LeftArm') == LEFT_COLOR
+    assert joint_color('rShin') == RIGHT_COLOR
+    assert joint_color('hips') == CENTER_COLOR
+
+def test_ordered_joints(skeleton_setup):
+    '''Parents always come before their children.'''
+    names = [ joint.alias for joint in skeleton_setup.ordered_joints() ]
+    assert names == [ 'root', 'child1', 'grandchild', 'child2' ]
+
+def test_bone_buffer(skeleton_setup):
+    '''One index pair per bone and root relative, scaled vertices.'''
+
+    skel = skeleton_setup
+    skel.init_world_positions()
+    skel.scale_factor = 2.0
+
+    bones = BoneBuffer( skel )
+    assert bones.num_bones == 3
+    assert list(bones.parents) == [ -1, 0, 1, 0 ]
+    assert list(bones.indices) == [ 0, 1, 1, 2, 0, 3 ]
+    assert bones.colors.shape == ( 4, 3 )
+
+    skel.get_root().w_position = glm.vec3( 2, 0, 0 )
+    bones.update( bones.gather() )
+    assert np.allclose( bones.vertices[0], [ 0, 0, 0 ] )
+    assert np.allclose( bones.vertices[2], [ -0.5, 0.5, 0 ] )
+
+    segments = bones.segments()
+    assert segments.shape == ( 3, 2, 3 )
+    assert np.allclose( segments[1], [ bones.vertices[1], bones.vertices[2] ] )
+
+def test_bone_batch(skeleton_setup):
+    '''Instances of one rig share topology but have their own vertices.'''
+
+    skel = skeleton_setup
+    skel.init_world_positions()
+    rig = BoneBuffer( skel )
+    assert rig_key( skel ) == ( ( 'root', -1 ), ( 'child1', 0 ), ( 'grandchild', 1 ), ( 'child2', 0 ) )
+
+    placements = grid_placements( 2 )
+    assert np.allclose( placements, [ [ -1, 0, 0 ], [ 1, 0, 0 ] ] )
+
+    batch = BoneBatch( [ rig, rig ], placements )
+    assert len(batch) == 2
+    assert batch.num_bones == 6
+    assert list(batch.indices[6:]) == [ 4, 5, 5, 6, 4, 7 ]
+    assert batch.colors.shape == ( 8, 3 )
+
+    positions = rig.gather()
+    batch.update( 0, positions, 1.0 )
+    batch.update( 1, positions, 2.0 )
+    assert np.allclose( batch.vertices[2], [ 0, 1, 0 ] )
+    assert np.allclose( batch.vertices[6], [ 1.5, 0.5, 0 ] )
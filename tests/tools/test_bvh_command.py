@@ -0,0 +1,24 @@
+'''Tests for the bvh.py entry point.'''
+
+import bvh
+from tools.bvh import BVH
+
+from tests.tools.fixtures import make_bvh_text
+
+def test_copy_keeps_folders(tmp_path):
+    '''Same named files in different folders are copied to their own folders.'''
+
+    filenames = []
+    for folder, frames in ( ( 'walk', 3 ), ( 'run', 5 ) ):
+        ( tmp_path / folder ).mkdir()
+        ( tmp_path / folder / 'take.bvh' ).write_text( make_bvh_text( frames ), encoding='utf-8' )
+        filenames.append( str( tmp_path / folder / 'take.bvh' ) )
+
+    out = tmp_path / 'cleaned'
+    bvh.main( [ 'bvh.py', 'copy' ] + filenames + [ '-o', str(out) ] )
+    assert len( BVH( str( out / 'walk' / 'take.bvh' ) ).skeleton.get_root().frames ) == 3
+    assert len( BVH( str( out / 'run' / 'take.bvh' ) ).skeleton.get_root().frames ) == 5
+
+    single = str( tmp_path / 'single.bvh' )
+    bvh.main( [ 'bvh.py', 'copy', filenames[0], '-o', single ] )
+    assert len( BVH( single ).skeleton.get_root().frames ) == 3
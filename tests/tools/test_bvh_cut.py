@@ -0,0 +1,155 @@
+'''Tests for cutting and joining BVH files without decoding the motion.'''
+
+import pytest
+
+from tools.bvh import BVH
+from tools.bvh_cut import bvh_cut, bvh_concat
+
+from tests.tools.fixtures import bvh_file, make_bvh_text
+
+def root_x_positions(filename):
+    '''Loads a file and returns the root's X position for every frame.'''
+    bvh = BVH( filename )
+    return [ frame.position[0] for frame in bvh.skeleton.get_root().frames ]
+
+def test_read_header(bvh_file):
+    '''Only the header is parsed, the motion is left alone.'''
+
+    bvh = BVH()
+    offset = bvh.read_header( bvh_file )
+
+    assert bvh.skeleton.num_frames == 10
+    assert bvh.skeleton.frame_rate == 33
+    assert len(bvh.skeleton.joints) == 3
+    assert len(bvh.skeleton.get_root().frames) == 0
+    with open( bvh_file, 'rb' ) as fptr:
+        fptr.seek( offset )
+        assert fptr.readline().split()[0] == b'0.000000'
+
+def test_bvh_cut(bvh_file, tmp_path):
+    '''Cut out a range and make sure the right frames land in the output.'''
+
+    output = str(tmp_path / 'cut.bvh')
+    assert bvh_cut( bvh_file, output, 3, 7 ) == 4
+    assert root_x_positions( output ) == [ 3.0, 4.0, 5.0, 6.0 ]
+
+    #Open ended and over-long ranges run to the end of the file.
+    assert bvh_cut( bvh_file, output, 8 ) == 2
+    assert root_x_positions( output ) == [ 8.0, 9.0 ]
+    assert bvh_cut( bvh_file, output, 8, 100 ) == 2
+    assert root_x_positions( output ) == [ 8.0, 9.0 ]
+
+    with pytest.raises(Exception):
+        bvh_cut( bvh_file, output, 11 )
+
+def test_bvh_cut_untidy_file(tmp_path):
+    '''No trailing newline or extra blank lines shouldn't change the count.'''
+
+    source = tmp_path / 'untidy.bvh'
+    output = str(tmp_path / 'cut.bvh')
+
+    source.write_text( make_bvh_text(5).rstrip(), encoding='utf-8' )
+    assert bvh_cut( str(source), output, 2 ) == 3
+    assert root_x_positions( output ) == [ 2.0, 3.0, 4.0 ]
+
+    source.write_text( make_bvh_text(5) + '\n\n', encoding='utf-8' )
+    assert bvh_cut( str(source), output, 0 ) == 5
+
+def test_bvh_concat(bvh_file, tmp_path):
+    '''Join two files and verify the frames are in order.'''
+
+    second = tmp_path / 'second.bvh'
+    second.write_text( make_bvh_text(3, first=10), encoding='utf-8' )
+
+    output = str(tmp_path / 'joined.bvh')
+    assert bvh_concat( [ bvh_file, str(second) ], output ) == 13
+    assert root_x_positions( output ) == [ float(i) for i in range(13) ]
+
+def test_bvh_concat_mismatch(bvh_file, tmp_path):
+    '''Files with different rigs or frame times can't be joined.'''
+
+    output = str(tmp_path / 'joined.bvh')
+
+    other = tmp_path / 'other.bvh'
+    other.write_text( make_bvh_text(3).replace('leftleg', 'rightleg'), encoding='utf-8' )
+    with pytest.raises(Exception):
+        bvh_concat( [ bvh_file, str(other) ], output )
+
+    other.write_text( make_bvh_text(3, frame_time=0.01), encoding='utf-8' )
+    with pytest.raises(Exception):
+        bvh_concat( [ bvh_file, str(other) ], output )
+
+def resting_text(num_frames, first=0, resting=-1):
+    '''make_bvh_text with the line of frame `resting` as a resting pose'''
+    line = make_bvh_text( 1, first=resting ).splitlines( keepends=True )[-1]
+    return make_bvh_text( num_frames, first ).replace( 'Frame Time: 0.033333\n',
+                                                       'Frame Time: 0.033333\n' + line )
+
+def motion_lines(filename):
+    '''The Frames: count and the first value of each motion line'''
+    with open( filename, encoding='utf-8' ) as fptr:
+        lines = fptr.read().split( 'MOTION\n' )[1].splitlines()
+    return int( lines[0].split()[1] ), [ float( line.split()[0] ) for line in lines[2:] ]
+
+def test_resting_and_blank_lines(tmp_path):
+    '''A resting pose is kept once ahead of the frames and never counted,
+       blank lines are dropped.'''
+
+    first = tmp_path / 'first.bvh'
+    second = tmp_path / 'second.bvh'
+    first.write_text( resting_text(4).replace( '\n2.000000', '\n\n2.000000' ), encoding='utf-8' )
+    second.write_text( resting_text(3, first=4) + '\n\n', encoding='utf-8' )
+    output = str(tmp_path / 'out.bvh')
+
+    assert bvh_cut( str(first), output, 1, 3 ) == 2
+    assert motion_lines( output ) == ( 2, [ -1.0, 1.0, 2.0 ] )
+    assert bvh_cut( str(first), output, 4 ) == 0
+    assert motion_lines( output ) == ( 0, [ -1.0 ] )
+    with pytest.raises(Exception):
+        bvh_cut( str(first), output, 5 )
+
+    assert bvh_concat( [ str(first), str(second) ], output ) == 7
+    assert motion_lines( output ) == ( 7, [ -1.0 ] + [ float(i) for i in range(7) ] )
+    assert len( BVH( output ).skeleton.get_root().frames ) == 7
+
+    #Clips without a resting pose or with a different one can't be joined.
+    plain = tmp_path / 'plain.bvh'
+    plain.write_text( make_bvh_text(3, first=4), encoding='utf-8' )
+    with pytest.raises(Exception):
+        bvh_concat( [ str(first), str(plain) ], output )
+    second.write_text( resting_text(3, first=4, resting=-2), encoding='utf-8' )
+    with pytest.raises(Exception):
+        bvh_concat( [ str(first), str(second) ], output )
+
+def test_bvh_concat_exact_frame_time(bvh_file, tmp_path):
+    '''120 and 125 fps both round to 8 ms but are still different rates.'''
+
+    first = tmp_path / 'first.bvh'
+    second = tmp_path / 'second.bvh'
+    first.write_text( make_bvh_text(3, frame_time=1/120), encoding='utf-8' )
+    second.write_text( make_bvh_text(3, frame_time=1/125), encoding='utf-8' )
+    with pytest.raises(Exception):
+        bvh_concat( [ str(first), str(second) ], str(tmp_path / 'joined.bvh') )
+
+def test_indented_lines(tmp_path):
+    '''Indented motion lines are counted and copied like any other.'''
+
+    lines = make_bvh_text(6).splitlines( keepends=True )
+    lines[-4:] = [ '  ' + line for line in lines[-4:] ]
+    source = tmp_path / 'indented.bvh'
+    source.write_text( ''.join( lines ), encoding='utf-8' )
+    output = str(tmp_path / 'cut.bvh')
+    assert bvh_cut( str(source), output, 1, 4 ) == 3
+    assert root_x_positions( output ) == [ 1.0, 2.0, 3.0 ]
+
+def test_small_chunks(tmp_path, monkeypatch):
+    '''Lines split across read chunks are still counted and cut right.'''
+
+    import tools.bvh_cut
+    monkeypatch.setattr( tools.bvh_cut, '_CHUNK', 50 )
+    source = tmp_path / 'clip.bvh'
+    output = str(tmp_path / 'cut.bvh')
+    for text in ( make_bvh_text(20), resting_text(20).replace( '\n5.000000', '\n\n5.000000' ) ):
+        source.write_text( text, encoding='utf-8' )
+        assert bvh_cut( str(source), output, 3, 17 ) == 14
+        assert motion_lines( output )[1][-14:] == [ float(i) for i in range(3, 17) ]
@@ -0,0 +1,40 @@
+'''Tests for the header-only summary used by `bvh.py info`.'''
+
+import subprocess
+import sys
+
+import pytest
+
+from tools.bvh_info import read_info, format_info
+
+from tests.tools.fixtures import bvh_file
+
+def test_read_info(bvh_file):
+    '''Counts come from the hierarchy, timing from the MOTION preamble.'''
+
+    info = read_info( bvh_file )
+    assert info['root'] == 'hips'
+    assert info['joints'] == 3
+    assert info['end_sites'] == 2
+    assert info['channels'] == 12
+    assert info['frames'] == 10
+    assert info['duration'] == pytest.approx( 10 * 0.033333 )
+    assert 'hips' in format_info( info )
+
+def test_no_motion(tmp_path):
+    '''A file without MOTION is an error.'''
+
+    path = tmp_path / 'empty.bvh'
+    path.write_text( 'HIERARCHY\nROOT hips\n{\n}\n' )
+    with pytest.raises( Exception ):
+        read_info( str(path) )
+
+def test_info_is_light(bvh_file):
+    '''Reading headers doesn't pull in glm or NumPy.'''
+
+    code = ( 'import sys; from tools.bvh_info import read_info; '
+             f'read_info( {bvh_file!r} ); '
+             'print( "glm" in sys.modules or "numpy" in sys.modules )' )
+    result = subprocess.run( [ sys.executable, '-c', code ], capture_output=True, text=True,
+                             check=True )
+    assert result.stdout.strip() == 'False'
@@ -0,0 +1,78 @@
+'''Tests for the streaming channel statistics.'''
+
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from tools import channel_stats as stats
+from tools import motion
+
+from tests.tools.fixtures import bvh_file, make_bvh_text
+
+def by_channel(result):
+    return { ( row['joint'], row['channel'] ) : row for row in result['channels'] }
+
+@pytest.mark.parametrize( 'block', [ 1 << 22, 64 ] )
+def test_channel_stats(bvh_file, monkeypatch, block):
+    '''Values match NumPy over the whole file however it is chunked.'''
+
+    monkeypatch.setattr( motion, '_BLOCK', block )
+    result = stats.channel_stats( bvh_file, rotation_jump=0.5 )
+    rows = by_channel( result )
+    frames = np.arange( 10, dtype=float )
+
+    assert len(rows) == 12
+    hips_x = rows[ ( 'hips', 'Xposition' ) ]
+    assert hips_x['count'] == 10
+    assert hips_x['min'] == 0.0 and hips_x['max'] == 9.0
+    assert hips_x['mean'] == pytest.approx( frames.mean() )
+    assert hips_x['variance'] == pytest.approx( frames.var() )
+
+    chest = rows[ ( 'chest', 'Xrotation' ) ]
+    assert chest['max_jump'] == pytest.approx( 1.0 )
+    assert chest['jumps'] == 9
+    assert rows[ ( 'chest', 'Zrotation' ) ]['jumps'] == 0
+
+    summary = result['summary']
+    assert summary['frames'] == 10 and not summary['resting']
+    assert summary['jumps'] == 9 * 3
+
+def test_resting_and_wrap(tmp_path):
+    '''A resting line is left out and rotations wrap around 180.'''
+
+    text = make_bvh_text( 3 )
+    lines = text.splitlines( keepends=True )
+    lines[-1] = '2 0 0 179 0 0 0 2 0 0 0 -179\n'
+    lines.append( '3 0 0 -179 0 0 0 3 0 0 0 179\n\n9 9 9\n' )
+    path = tmp_path / 'resting.bvh'
+    path.write_text( ''.join( lines ) )
+
+    result = stats.channel_stats( str(path) )
+    rows = by_channel( result )
+    assert result['summary']['resting']
+    assert result['summary']['frames'] == 3
+    hips = rows[ ( 'hips', 'Zrotation' ) ]
+    assert hips['count'] == 3
+    assert hips['min'] == -179.0
+    assert hips['max_jump'] == pytest.approx( 178.0 )
+    assert hips['max_jump_frame'] == 1
+    assert rows[ ( 'leftleg', 'Yrotation' ) ]['max_jump'] == pytest.approx( 180.0 )
+
+def test_write_stats(bvh_file, tmp_path):
+    '''CSV and JSON output, per channel and per file.'''
+
+    results = stats.library_stats( [ bvh_file, str( tmp_path / 'missing.bvh' ) ], workers=1 )
+    assert len(results) == 1
+
+    out = tmp_path / 'stats.csv'
+    stats.write_stats( results, str(out) )
+    with open( out, newline='' ) as fptr:
+        rows = list( csv.DictReader( fptr ) )
+    assert len(rows) == 12
+    assert list(rows[0]) == stats.FIELDS
+
+    out = tmp_path / 'summary.json'
+    stats.write_stats( results, str(out), summary=True )
+    assert json.loads( out.read_text() )[0]['frames'] == 10
@@ -0,0 +1,97 @@
+'''Tests for comparing two clips.'''
+
+import json
+
+import numpy as np
+import pytest
+
+from tools.clip_diff import diff_clips, diff_motions, format_diff, pair_joints, write_diff
+from tools.motion import Motion
+
+from tests.tools.fixtures import bvh_file, make_bvh_text
+
+def write(tmp_path, text, name='other.bvh'):
+    path = tmp_path / name
+    path.write_text( text, encoding='utf-8' )
+    return str(path)
+
+def rows(result):
+    return { row['joint'] : row for row in result['joints'] }
+
+def test_pair_joints():
+    pairs, only_a, only_b = pair_joints( [ 'Hips', 'Chest', 'Neck' ], [ 'chest', 'hips', 'Head' ] )
+    assert pairs == [ ( 0, 1 ), ( 1, 0 ) ]
+    assert only_a == [ 'Neck' ] and only_b == [ 'Head' ]
+
+def test_same_file(bvh_file):
+    result = diff_clips( bvh_file, bvh_file, world=True )
+    summary = result['summary']
+    assert summary['equal'] and summary['differing_frames'] == []
+    assert summary['joints'] == 3 and summary['max_rotation'] == pytest.approx( 0.0, abs=1e-5 )
+
+def test_channel_order(bvh_file, tmp_path):
+    '''A file storing the chest with another channel order holds the same rotations.'''
+    header, motion = make_bvh_text( 10 ).split( 'MOTION\n' )
+    header = header.replace( 'CHANNELS 3 Zrotation Xrotation Yrotation\n\t\tEnd',
+                             'CHANNELS 3 Xrotation Zrotation Yrotation\n\t\tEnd', 1 )
+    lines = motion.splitlines( keepends=True )
+    for i in range( 2, len(lines) ):
+        values = lines[i].split()
+        values[6], values[7] = values[7], values[6]
+        lines[i] = ' '.join( values ) + '\n'
+    other = write( tmp_path, header + 'MOTION\n' + ''.join( lines ) )
+    result = diff_clips( bvh_file, other, world=True )
+    assert result['summary']['equal']
+
+@pytest.mark.parametrize( 'chunk', [ 8192, 3 ] )
+def test_differences(bvh_file, tmp_path, chunk):
+    lines = make_bvh_text( 10 ).splitlines( keepends=True )
+    values = lines[-6].split()
+    values[6] = '2.5'                   #chest Zrotation of frame 4
+    lines[-6] = ' '.join( values ) + '\n'
+    values = lines[-2].split()
+    values[1] = '0.5'                   #hips Yposition of frame 8
+    lines[-2] = ' '.join( values ) + '\n'
+    other = write( tmp_path, ''.join( lines ) )
+
+    result = diff_motions( Motion.read( bvh_file )[0], Motion.read( other )[0], chunk=chunk )
+    summary = result['summary']
+    assert not summary['equal']
+    assert summary['differing_frames'] == [ 4, 8 ]
+
+    chest = rows( result )['chest']
+    assert chest['max_rotation'] == pytest.approx( 2.5, abs=1e-6 )
+    assert chest['mean_rotation'] == pytest.approx( 0.25, abs=1e-6 )
+    assert chest['rotation_frames'] == 1 and chest['first_rotation_frame'] == 4
+    assert chest['max_position'] is None
+
+    hips = rows( result )['hips']
+    assert hips['rotation_frames'] == 0 and hips['first_rotation_frame'] == -1
+    assert hips['max_position'] == pytest.approx( 0.5 )
+    assert hips['first_position_frame'] == 8
+
+    world = diff_motions( Motion.read( bvh_file )[0], Motion.read( other )[0], world=True )
+    leg = rows( world )['leftleg']
+    assert leg['max_position'] == pytest.approx( 0.5 ) and leg['first_position_frame'] == 8
+
+def test_structure(bvh_file, tmp_path):
+    text = make_bvh_text( 8 ).replace( 'leftleg', 'rightleg' ).replace( 'OFFSET 0.0 1.0 0.0\n\t\tCHANNELS',
+                                                                         'OFFSET 0.0 2.0 0.0\n\t\tCHANNELS' )
+    other = write( tmp_path, text )
+    result = diff_clips( bvh_file, other, world=True )
+    summary = result['summary']
+
+    assert not summary['equal']
+    assert summary['only_a'] == [ 'leftleg' ] and summary['only_b'] == [ 'rightleg' ]
+    assert summary['frames_a'] == 10 and summary['compared_frames'] == 8
+    assert summary['max_offset'] == pytest.approx( 1.0 )
+    assert rows( result )['chest']['max_position'] == pytest.approx( 1.0 )
+
+    report = format_diff( result )
+    assert 'different' in report and 'only in second: rightleg' in report
+
+    write_diff( result, str( tmp_path / 'diff.json' ) )
+    data = json.loads( ( tmp_path / 'diff.json' ).read_text() )
+    assert data['summary']['only_a'] == [ 'leftleg' ]
+    write_diff( result, str( tmp_path / 'diff.csv' ) )
+    assert ( tmp_path / 'diff.csv' ).read_text().startswith( 'joint,other,offset' )
@@ -0,0 +1,123 @@
+'''Tests for the shared memory clip server.'''
+
+import os
+import stat
+import threading
+from multiprocessing.connection import Client
+
+import pytest
+
+from tools.bvh import BVH
+from tools.clip_server import ClipClient, ClipServer, check_address, default_authkey
+from tools.motion import Motion
+
+from tests.tools.fixtures import bvh_file, make_bvh_text
+
+KEY = b'test key'
+
+@pytest.fixture
+def server(tmp_path):
+    '''A server on a Unix socket, running on a background thread.'''
+    clip_server = ClipServer( str( tmp_path / 'clips.sock' ), authkey=KEY )
+    thread = threading.Thread( target=clip_server.serve_forever, daemon=True )
+    thread.start()
+    yield clip_server
+    with ClipClient( clip_server.address, KEY ) as client:
+        client.shutdown()
+    thread.join( 10.0 )
+
+def test_served_skeleton(server, bvh_file):
+    '''A served skeleton matches a local load, frames and all.'''
+
+    expected = BVH( bvh_file ).skeleton
+    with ClipClient( server.address, KEY ) as client:
+        skel = client.load( bvh_file )
+
+    assert list(skel.joints) == list(expected.joints)
+    for name, joint in expected.joints.items():
+        frames = skel.joints[name].frames
+        assert len(frames) == len(joint.frames)
+        assert frames[3].rotation == joint.frames[3].rotation
+        assert frames[-1].rotation == joint.frames[-1].rotation
+        if joint.frames[0].position is not None:
+            assert frames[5].position == pytest.approx( joint.frames[5].position )
+    assert skel.get_root().w_position == expected.get_root().w_position
+
+    local = Motion.from_skeleton( expected ).world_positions()
+    assert skel.motion.world_positions() == pytest.approx( local )
+
+def test_cache_hits(server, bvh_file):
+    '''The second load is served from the cache.'''
+
+    with ClipClient( server.address, KEY ) as client:
+        client.load( bvh_file )
+        client.load( bvh_file )
+        stats = client.stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 1
+    assert stats['clips'] == 1
+
+def test_budget_evicts(server, bvh_file, tmp_path):
+    '''Going over budget drops the least recently used clip.'''
+
+    other = tmp_path / 'other.bvh'
+    other.write_text( make_bvh_text( 10 ) )
+    server.budget = 1
+    with ClipClient( server.address, KEY ) as client:
+        first = client.load( bvh_file )
+        client.load( str(other) )
+        stats = client.stats()
+        #Already mapped arrays survive the eviction.
+        assert len( first.get_root().frames ) == 10
+    assert stats['clips'] == 1
+
+def test_errors_are_raised(server, tmp_path):
+    '''Server side failures come back as exceptions.'''
+
+    with ClipClient( server.address, KEY ) as client:
+        with pytest.raises( Exception, match='FileNotFoundError' ):
+            client.load( str( tmp_path / 'missing.bvh' ) )
+        assert client.stats()['ok']
+
+def test_default_authkey(tmp_path, monkeypatch):
+    '''The key is random, kept private and reused.'''
+
+    monkeypatch.setenv( 'XDG_RUNTIME_DIR', str(tmp_path) )
+    monkeypatch.delenv( 'BVH_CLIPS_AUTHKEY', raising=False )
+    key = default_authkey()
+    assert len(key) == 32 and default_authkey() == key
+    assert stat.S_IMODE( os.stat( tmp_path / 'bvh-tools' / 'authkey' ).st_mode ) == 0o600
+    assert stat.S_IMODE( os.stat( tmp_path / 'bvh-tools' ).st_mode ) == 0o700
+    monkeypatch.setenv( 'BVH_CLIPS_AUTHKEY', 'ab01' )
+    assert default_authkey() == bytes.fromhex( 'ab01' )
+
+def test_addresses():
+    check_address( ( '127.0.0.1', 0 ) )
+    check_address( ( 'localhost', 0 ) )
+    with pytest.raises( Exception, match='loopback' ):
+        check_address( ( '0.0.0.0', 0 ) )
+
+def test_rejects_other_keys_and_pickles(server):
+    '''Clients need the key, and requests are JSON rather than pickles.'''
+
+    with pytest.raises( Exception ):
+        Client( server.address, authkey=b'wrong' )
+    conn = Client( server.address, authkey=KEY )
+    conn.send( { 'op' : 'stats' } )
+    assert not conn.recv()['ok']
+    conn.close()
+
+def test_eviction_waits_for_attach(server, bvh_file, tmp_path):
+    '''A block evicted before its client mapped it stays until the client
+       says it has.'''
+
+    other = tmp_path / 'other.bvh'
+    other.write_text( make_bvh_text( 10 ) )
+    server.budget = 1
+    with ClipClient( server.address, KEY ) as client:
+        reply = client._request( op='load', filename=bvh_file )
+        client.load( str(other) )
+        assert server.stats()['clips'] == 1
+        assert reply['shm'] in server._retired
+        client._request( op='attached', shm=reply['shm'] )
+        assert not server._retired
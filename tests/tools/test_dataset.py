@@ -0,0 +1,81 @@
+'''Tests for the sliding window dataset.'''
+
+import numpy as np
+import pytest
+
+from tools.dataset import WindowDataset, cache_clip, load_motion, sliding_windows
+from tools.motion import Motion
+
+from tests.tools.fixtures import make_bvh_text
+
+@pytest.fixture
+def clips(tmp_path):
+    '''Two clips of 10 and 7 frames'''
+    names = []
+    for frames, first in ( ( 10, 0 ), ( 7, 100 ) ):
+        path = tmp_path / f'clip{frames}.bvh'
+        path.write_text( make_bvh_text( frames, first ), encoding='utf-8' )
+        names.append( str(path) )
+    return names
+
+def test_sliding_windows():
+    array = np.arange( 30.0 ).reshape( 10, 3 )
+    windows = sliding_windows( array, 4, 3 )
+    assert windows.shape == ( 3, 4, 3 )
+    assert np.shares_memory( windows, array )
+    assert windows[2] == pytest.approx( array[6:10] )
+    assert not windows.flags.writeable
+    assert sliding_windows( array, 11 ).shape == ( 0, 11, 3 )
+    for window, stride in ( ( 0, 1 ), ( -2, 1 ), ( 4, 0 ) ):
+        with pytest.raises( Exception ):
+            sliding_windows( array, window, stride )
+
+def test_windows(clips):
+    dataset = WindowDataset.from_files( clips, window=4, stride=3 )
+    motion = dataset.motions[1]
+    assert len(dataset) == 3 + 2
+    assert dataset.clip_ids.tolist() == [ 0, 0, 0, 1, 1 ]
+
+    window = dataset[4]
+    assert window.clip == 1 and window.start == 3
+    assert np.shares_memory( window.rotations, motion.rotations )
+    assert window.rotations == pytest.approx( motion.rotations[3:7] )
+    assert window.root_positions[:,0] == pytest.approx( [ 103, 104, 105, 106 ] )
+    assert window.normalized_root_positions[:,0] == pytest.approx( [ 0, 1, 2, 3 ] )
+    assert [ w.start for w in dataset ] == [ 0, 3, 6, 0, 3 ]
+
+def test_shuffle_and_shards(clips):
+    shards = [ WindowDataset.from_files( clips, window=2, stride=1, seed=5, shard=i, num_shards=3 )
+               for i in range( 3 ) ]
+    total = len(shards[0])
+    orders = [ shard.order( epoch=1 ).tolist() for shard in shards ]
+    assert sorted( sum( orders, [] ) ) == list( range( total ) )
+    assert orders[0] == shards[0].order( epoch=1 ).tolist()
+    assert orders[0] != shards[0].order( epoch=2 ).tolist()
+
+    clips_seen = { window.clip for window in shards[0].epoch( 1 ) }
+    assert clips_seen == { 0, 1 }
+    with pytest.raises( Exception ):
+        WindowDataset( [], shard=3, num_shards=3 )
+    with pytest.raises( Exception, match='Stride' ):
+        WindowDataset( [], stride=0 )
+    with pytest.raises( Exception, match='Window' ):
+        WindowDataset( [], window=0 )
+
+def test_cache_and_batches(clips, tmp_path):
+    cache = str( tmp_path / 'cache' )
+    prefix = cache_clip( clips[0], cache )
+    assert cache_clip( clips[0], cache ) == prefix
+    motion = load_motion( prefix )
+    expected, _ = Motion.read( clips[0] )
+    assert isinstance( np.load( prefix + '.rotations.npy', mmap_mode='r' ), np.memmap )
+    assert motion.rotations == pytest.approx( expected.rotations )
+    assert motion.names == expected.names
+
+    dataset = WindowDataset.from_files( clips, cache_dir=cache, window=5, stride=5 )
+    batches = list( dataset.batches( 2, shuffle=False ) )
+    assert [ len(rotations) for rotations, _ in batches ] == [ 2, 1 ]
+    rotations, roots = batches[0]
+    assert rotations.shape == ( 2, 5, 3, 4 )
+    assert roots[1,:,0] == pytest.approx( [ 0, 1, 2, 3, 4 ] )
+    assert rotations[1] == pytest.approx( expected.rotations[5:10] )
@@ -0,0 +1,60 @@
+'''Tests for animated bounds and reach.'''
+
+import json
+
+import numpy as np
+import pytest
+
+from tools.dataset import cache_clip, load_extents
+from tools.extents import compute_extents
+from tools.motion import Motion
+
+from tests.tools.fixtures import bvh_file
+
+def test_compute_extents(bvh_file):
+    motion, _ = Motion.read( bvh_file )
+    positions = motion.world_positions()
+    extents = compute_extents( motion, chunk=3 )
+
+    assert extents.frame_bounds[:,0] == pytest.approx( positions.min( axis=1 ) )
+    assert extents.frame_bounds[:,1] == pytest.approx( positions.max( axis=1 ) )
+    assert extents.bounds == pytest.approx( np.stack( ( positions.min( axis=( 0, 1 ) ),
+                                                        positions.max( axis=( 0, 1 ) ) ) ) )
+    reach = np.linalg.norm( positions - positions[:,:1], axis=-1 ).max( axis=0 )
+    assert extents.reach == pytest.approx( reach )
+    assert extents.fit_scale == pytest.approx( reach.max() )
+
+    #The fixture's root moves one unit along x a frame.
+    assert extents.root_travel == pytest.approx( 9.0 )
+    assert extents.ground_travel == pytest.approx( 9.0 )
+    assert extents.root_displacement == pytest.approx( [ 9.0, 0.0, 0.0 ] )
+    assert extents.unit_scale == pytest.approx( motion.unit_scale )
+    assert extents.unit_root_travel == pytest.approx( 9.0 / motion.unit_scale )
+    assert compute_extents( motion, up=0 ).ground_travel == pytest.approx( 0.0 )
+
+    empty = compute_extents( motion.take( np.arange( 0 ) ) )
+    assert empty.root_travel == 0.0 and empty.bounds == pytest.approx( np.zeros( ( 2, 3 ) ) )
+
+def test_cached_extents(bvh_file, tmp_path):
+    prefix = cache_clip( bvh_file, str( tmp_path / 'cache' ) )
+    summary = load_extents( prefix )
+    assert summary.frame_bounds is None
+    assert summary.root_travel == pytest.approx( 9.0 )
+
+    expected = compute_extents( Motion.read( bvh_file )[0] )
+    full = load_extents( prefix, frames=True )
+    assert isinstance( full.frame_bounds, np.memmap )
+    assert full.frame_bounds == pytest.approx( expected.frame_bounds )
+    assert full.bounds == pytest.approx( expected.bounds )
+    assert full.reach == pytest.approx( expected.reach )
+
+    assert summary.unit_scale == pytest.approx( expected.unit_scale )
+    assert summary.unit_ground_travel == pytest.approx( expected.unit_ground_travel )
+
+    #Caches written before the unit scale was saved take it from the rig.
+    with open( prefix + '.json', encoding='utf-8' ) as fptr:
+        meta = json.load( fptr )
+    del meta['extents']['unit_scale']
+    with open( prefix + '.json', 'w', encoding='utf-8' ) as fptr:
+        json.dump( meta, fptr )
+    assert load_extents( prefix ).unit_scale == pytest.approx( expected.unit_scale )
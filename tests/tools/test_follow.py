@@ -0,0 +1,124 @@
+'''Tests for following a BVH file while it is written.'''
+
+import time
+
+import numpy as np
+import pytest
+
+from tools.follow import MotionFollower
+from tools.glplot import Plot
+from tools.motion import Motion
+
+from tests.tools.fixtures import make_bvh_text
+
+def split_text(frames):
+    '''The header (with a stale Frames: count) and the motion lines'''
+    text = make_bvh_text( frames ).replace( f'Frames: {frames}', 'Frames: 0' )
+    header, motion = text.split( 'Frame Time: 0.033333\n' )
+    return header + 'Frame Time: 0.033333\n', motion.splitlines( keepends=True )
+
+def test_incremental(tmp_path):
+    path = tmp_path / 'live.bvh'
+    header, lines = split_text( 6 )
+    follower = MotionFollower( str(path) )
+    blocks = []
+    follower.subscribe( lambda first, values: blocks.append( ( first, values[:,0].tolist() ) ) )
+
+    assert not follower.wait_ready( timeout=0.0 )
+    with open( path, 'w', encoding='utf-8' ) as fptr:
+        fptr.write( header[:-10] )
+        fptr.flush()
+        assert follower.poll() == 0 and not follower.ready
+
+        fptr.write( header[-10:] + lines[0] + lines[1][:8] )
+        fptr.flush()
+        assert follower.poll() == 1 and follower.ready
+        assert follower.skeleton.num_frames == 1
+
+        fptr.write( lines[1][8:] + '\n' + ''.join( lines[2:5] ) )
+        fptr.flush()
+        assert follower.poll() == 4
+        assert follower.poll() == 0
+
+    assert blocks == [ ( 0, [ 0.0 ] ), ( 1, [ 1.0, 2.0, 3.0, 4.0 ] ) ]
+    assert follower.values[:,3].tolist() == [ 0.0, 1.0, 2.0, 3.0, 4.0 ]
+    motion = follower.motion()
+    assert motion.num_frames == 5 and not motion.has_resting
+    assert follower.motion( 4 ).root_positions[:,0].tolist() == [ 4.0 ]
+
+    path.write_text( header )
+    with pytest.raises( Exception ):
+        follower.poll()
+
+def test_malformed_line(tmp_path, capsys):
+    '''A bad line raises with its position and leaves the data unconsumed.'''
+    path = tmp_path / 'live.bvh'
+    header, lines = split_text( 4 )
+    path.write_text( header + lines[0], encoding='utf-8' )
+    follower = MotionFollower( str(path) )
+    assert follower.poll() == 1
+    offset = follower._offset
+
+    bad = lines[1].replace( '1.0', 'x', 1 )
+    with open( path, 'a', encoding='utf-8' ) as fptr:
+        fptr.write( bad + lines[2] )
+    with pytest.raises( Exception, match=f'byte {offset} \\(frame 1\\)' ):
+        follower.poll()
+    assert follower.num_frames == 1 and follower._offset == offset
+    with pytest.raises( Exception, match=f'byte {offset} \\(frame 1\\)' ):
+        follower.poll()
+
+    path.write_text( header + lines[0] + ' '.join( lines[1].split()[:-1] ) + '\n', encoding='utf-8' )
+    with pytest.raises( Exception, match='values on a' ):
+        follower.poll()
+
+    follower.skeleton.set_unit_scale_factor()
+    clip = Plot( [ follower ], 'test' )._clips[0]
+    assert clip.positions( 0.0, False )[1] == 0
+    assert clip.positions( 0.0, False )[1] == 0
+    assert capsys.readouterr().out.count( 'values on a' ) == 1
+
+    path.write_text( header + ''.join( lines[:3] ), encoding='utf-8' )
+    assert clip.positions( 0.0, False )[1] == 2
+    assert follower.values[:,0].tolist() == [ 0.0, 1.0, 2.0 ]
+
+def test_growth_and_thread(tmp_path):
+    path = tmp_path / 'live.bvh'
+    header, lines = split_text( 3000 )
+    path.write_text( header, encoding='utf-8' )
+    follower = MotionFollower( str(path), interval=0.001 )
+    assert follower.wait_ready( timeout=1.0 )
+    follower.start()
+    with open( path, 'a', encoding='utf-8' ) as fptr:
+        for first in range( 0, 3000, 500 ):
+            fptr.write( ''.join( lines[first:first+500] ) )
+            fptr.flush()
+    deadline = time.monotonic() + 10.0
+    while follower.num_frames < 3000 and time.monotonic() < deadline:
+        time.sleep( 0.01 )
+    follower.stop()
+    assert follower.values[:,0] == pytest.approx( np.arange( 3000 ) )
+
+    done = MotionFollower( str(path) )
+    done.follow( idle=0.05 )
+    assert done.num_frames == 3000
+
+def test_live_plot(tmp_path):
+    '''The viewer shows the newest frame of a followed file.'''
+    path = tmp_path / 'live.bvh'
+    header, lines = split_text( 4 )
+    path.write_text( header + ''.join( lines[:2] ), encoding='utf-8' )
+    follower = MotionFollower( str(path) )
+    follower.wait_ready()
+    follower.skeleton.set_unit_scale_factor()
+
+    plot = Plot( [ follower ], 'test' )
+    assert plot.animating
+    plot._update_vertices()
+    assert plot.frame == 1
+    with open( path, 'a', encoding='utf-8' ) as fptr:
+        fptr.write( ''.join( lines[2:] ) )
+    plot._update_vertices()
+    assert plot.frame == 3
+    expected = Motion.from_channels( follower.bvh, follower.values, resting=False ).world_positions()[3]
+    assert plot._clips[0].positions( 0.0, False )[0] == pytest.approx( expected )
@@ -0,0 +1,36 @@
+'''Tests for the parts of the viewer that don't need a window.'''
+
+import numpy as np
+import pytest
+
+from tools.bvh import BVH
+from tools.glplot import Plot
+
+from tests.tools.fixtures import bvh_file, make_bvh_text
+
+def test_multiple_clips(bvh_file, tmp_path):
+    '''Clips of one rig share a bone buffer and play from one clock.'''
+
+    other = tmp_path / 'other.bvh'
+    other.write_text( make_bvh_text(4, frame_time=0.016667), encoding='utf-8' )
+    skeletons = [ BVH( bvh_file ).skeleton, BVH( str(other) ).skeleton ]
+    for skel in skeletons:
+        skel.set_unit_scale_factor()
+
+    plot = Plot( skeletons, 'test' )
+    assert plot._bones.rigs[0] is plot._bones.rigs[1]
+    assert len(plot._bones.vertices) == 6
+    assert plot.clock.duration == pytest.approx( 10 * 0.033333, abs=0.02 )
+
+    plot._update_vertices()
+    assert not np.allclose( plot._bones.vertices[0], plot._bones.vertices[3] )
+
+    plot.animating = True
+    plot.clock.seek( 10 )    #The clock ticks at the faster clip's rate
+    plot._update_vertices()
+    assert plot.frame == 5
+
+def test_bad_layout(bvh_file):
+    '''Only known layouts are accepted.'''
+    with pytest.raises(Exception):
+        Plot( BVH( bvh_file ).skeleton, 'test', layout='potato' )
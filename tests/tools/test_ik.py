@@ -0,0 +1,142 @@
+'''Tests for batched inverse kinematics.'''
+
+import numpy as np
+import pytest
+
+from tools.ik import ccd_ik, contact_targets, joint_chain, lock_feet, lock_feet_file, planted_joints, \
+                     two_bone_ik
+from tools.motion import Motion
+
+NAMES = [ 'Hips', 'LeftUpLeg', 'LeftLeg', 'LeftFoot', 'LeftToe' ]
+PARENTS = [ -1, 0, 1, 2, 3 ]
+OFFSETS = [ [ 0, 1, 0 ], [ 0.2, -0.1, 0 ], [ 0, -0.5, 0.05 ], [ 0, -0.45, -0.02 ], [ 0, -0.05, 0.15 ] ]
+
+def _random_quats(rng, frames):
+    quats = rng.normal( size=( frames, len(NAMES), 4 ) )
+    quats[...,0] += 3.0
+    return quats / np.linalg.norm( quats, axis=-1, keepdims=True )
+
+@pytest.fixture(params=[ False, True ], ids=[ 'plain', 'resting' ])
+def posed(request):
+    '''A leg in random poses and reachable foot targets from other poses
+       with the same hips'''
+    rng = np.random.default_rng( 7 )
+    motion = Motion( NAMES, PARENTS, OFFSETS, _random_quats( rng, 50 ),
+                     rng.normal( size=( 50, 3 ) ), request.param )
+    rotations = _random_quats( rng, 50 )
+    rotations[:,0] = motion.rotations[:,0]
+    other = Motion( NAMES, PARENTS, OFFSETS, rotations, motion.root_positions, request.param )
+    return motion, other.world_positions()[:,3]
+
+def test_joint_chain():
+    motion = Motion( NAMES, PARENTS, OFFSETS, np.zeros( ( 0, 5, 4 ) ), np.zeros( ( 0, 3 ) ) )
+    assert joint_chain( motion, 'LeftFoot' ) == [ 1, 2, 3 ]
+    assert joint_chain( motion, 4, 4 ) == [ 0, 1, 2, 3, 4 ]
+    with pytest.raises( Exception ):
+        joint_chain( motion, 'LeftLeg', 3 )
+    assert planted_joints( motion ) == [ 3 ]
+
+def test_two_bone(posed):
+    motion, targets = posed
+    targets = targets.copy()
+    targets[::5] = np.nan
+    result = two_bone_ik( motion, 'LeftFoot', targets, chunk=16 )
+
+    before, after = motion.world_positions(), result.motion.world_positions()
+    assert result.max_error == pytest.approx( 0.0, abs=1e-9 )
+    assert np.nanmax( result.before ) > 0.1
+    assert np.linalg.norm( after[:,3] - targets, axis=-1 )[1::5] == pytest.approx( result.after[1::5] )
+    assert np.isnan( result.after[::5] ).all()
+    #Frames without a target, the joints above the chain and the foot's
+    #orientation are untouched.
+    assert after[::5] == pytest.approx( before[::5] )
+    assert after[:,:2] == pytest.approx( before[:,:2] )
+    assert after[:,4] - after[:,3] == pytest.approx( before[:,4] - before[:,3] )
+    assert result.motion.rotations is not motion.rotations
+    assert result.summary( 1e-6 )['frames'] == 40
+
+def test_weights_and_in_place(posed):
+    motion, targets = posed
+    rotations = motion.rotations.copy()
+    half = two_bone_ik( motion, 'LeftFoot', targets, weights=0.0 )
+    assert half.motion.rotations == pytest.approx( rotations )
+    assert half.after == pytest.approx( half.before )
+
+    result = two_bone_ik( motion, 'LeftFoot', targets, in_place=True )
+    assert result.motion is motion
+    assert not np.allclose( motion.rotations, rotations )
+
+def test_ccd(posed):
+    motion, targets = posed
+    result = ccd_ik( motion, 'LeftFoot', targets, bones=3, iterations=50, tolerance=1e-6 )
+    positions = result.motion.world_positions()
+    assert np.linalg.norm( positions[:,3] - targets, axis=-1 ) == pytest.approx( result.after )
+    assert np.median( result.after ) < 1e-5
+    assert result.max_error < 0.25 * np.nanmax( result.before )
+
+def test_contact_targets():
+    positions = np.zeros( ( 8, 1, 3 ) )
+    positions[:,0,0] = np.arange( 8 )
+    contacts = np.array( [ 0, 1, 1, 1, 0, 0, 1, 1 ], dtype=bool )[:,None]
+    targets, weights = contact_targets( positions, contacts )
+    assert np.isnan( targets[[0,4,5],0] ).all()
+    assert targets[1:4,0,0] == pytest.approx( [ 2, 2, 2 ] )
+    assert targets[6:,0,0] == pytest.approx( [ 6.5, 6.5 ] )
+    assert weights[:,0] == pytest.approx( contacts[:,0].astype( float ) )
+
+    targets, weights = contact_targets( positions, contacts, fade=1 )
+    assert weights[:,0] == pytest.approx( [ 0.5, 1, 1, 1, 0.5, 0.5, 1, 1 ] )
+    assert targets[[0,4,5],0,0] == pytest.approx( [ 2, 2, 6.5 ] )
+
+def test_lock_feet():
+    '''A bent leg dragged along by the hips is held in place.'''
+    frames = 20
+    rotations = np.zeros( ( frames, 5, 4 ) )
+    rotations[...,0] = 1.0
+    bend = np.radians( 30 )
+    rotations[:,1] = ( np.cos( bend / 2 ), np.sin( bend / 2 ), 0, 0 )
+    rotations[:,2] = ( np.cos( bend ), -np.sin( bend ), 0, 0 )
+    roots = np.zeros( ( frames, 3 ) )
+    roots[:,0] = np.linspace( 0.0, 0.1, frames )
+    motion = Motion( NAMES, PARENTS, OFFSETS, rotations, roots )
+
+    results = lock_feet( motion, frame_time=0.1 )
+    assert [ result.joint for result in results ] == [ 'LeftFoot' ]
+    foot = results[-1].motion.world_positions()[:,3]
+    assert np.ptp( foot, axis=0 ) == pytest.approx( np.zeros( 3 ), abs=1e-9 )
+    assert np.nanmax( results[0].before ) > 0.04
+
+def _leg_bvh(frames) -> str:
+    '''The test leg as BVH text, dragged along x with a bent knee'''
+    lines = [ 'HIERARCHY\n' ]
+    for depth, ( name, offset ) in enumerate( zip( NAMES, OFFSETS ) ):
+        tabs = '\t' * depth
+        lines.append( f'{tabs}{"ROOT" if depth == 0 else "JOINT"} {name}\n{tabs}{{\n' )
+        lines.append( f'{tabs}\tOFFSET {offset[0]} {offset[1]} {offset[2]}\n' )
+        lines.append( f'{tabs}\tCHANNELS {6 if depth == 0 else 3} ' +
+                      ( 'Xposition Yposition Zposition ' if depth == 0 else '' ) +
+                      'Zrotation Xrotation Yrotation\n' )
+    lines.append( '\t' * 5 + 'End Site\n' + '\t' * 5 + '{\n' + '\t' * 6 + 'OFFSET 0 0 0.1\n' + '\t' * 5 + '}\n' )
+    lines.extend( '\t' * depth + '}\n' for depth in range( 4, -1, -1 ) )
+    lines.append( f'MOTION\nFrames: {frames}\nFrame Time: 0.1\n' )
+    for frame in range( frames ):
+        values = [ 0.1 * frame / ( frames - 1 ), 0, 0, 0, 0, 0, 0, 30, 0, 0, -60, 0, 0, 0, 0, 0, 0, 0 ]
+        lines.append( ' '.join( f'{value:.6f}' for value in values ) + '\n' )
+    return ''.join( lines )
+
+def test_lock_feet_file(tmp_path):
+    '''The written file reads back with the corrected foot.'''
+    frames = 20
+    source = tmp_path / 'source.bvh'
+    source.write_text( _leg_bvh( frames ), encoding='utf-8' )
+    output, errors = str( tmp_path / 'locked.bvh' ), str( tmp_path / 'errors.csv' )
+    before, _ = Motion.read( str(source) )
+    assert np.ptp( before.world_positions()[:,3,0] ) > 0.09
+
+    results = lock_feet_file( str(source), output, errors=errors )
+    written, _ = Motion.read( output )
+    foot = written.world_positions()[:,3]
+    assert np.ptp( foot, axis=0 ) == pytest.approx( np.zeros( 3 ), abs=1e-4 )
+    lines = ( tmp_path / 'errors.csv' ).read_text().splitlines()
+    assert lines[0] == 'frame,LeftFoot_before,LeftFoot_after' and len(lines) == frames + 1
+    assert results[0].summary( 1e-3 )['over_tolerance'] == 0
@@ -0,0 +1,79 @@
+'''Tests for derivative tracks and foot contacts.'''
+
+import numpy as np
+import pytest
+
+from tools import nputils
+from tools.kinematics import ( Kinematics, angular_velocities, contact_joints, foot_contacts,
+                               velocities, accelerations, _hysteresis )
+from tools.motion import Motion
+
+from tests.tools.fixtures import bvh_file
+
+def test_velocities():
+    '''A parabola has constant acceleration.'''
+
+    times = np.arange( 20 ) * 0.1
+    positions = np.zeros( ( 20, 1, 3 ) )
+    positions[:,0,0] = 3.0 * times * times
+    vel = velocities( positions, 0.1 )
+    assert vel[5,0,0] == pytest.approx( 6.0 * times[5] )
+    assert accelerations( positions, 0.1 )[5:15,0,0] == pytest.approx( np.full( 10, 6.0 ) )
+
+def test_angular_velocities():
+    '''A steady turn about Y, including across the w sign flip.'''
+
+    angles = np.radians( np.arange( 0, 400, 10 ) )
+    quats = np.zeros( ( len(angles), 4 ) )
+    quats[:,0] = np.cos( angles / 2 )
+    quats[:,2] = np.sin( angles / 2 )
+    omega = angular_velocities( quats, 0.5 )
+    assert omega[:,1] == pytest.approx( np.full( len(angles), np.radians( 10 ) / 0.5 ) )
+    assert omega[:,[0, 2]] == pytest.approx( np.zeros( ( len(angles), 2 ) ) )
+
+def test_hysteresis():
+    '''Contact holds between the on and off thresholds.'''
+
+    on = np.array( [ 0, 1, 0, 0, 0, 1, 0 ], dtype=bool )[:,None]
+    off = np.array( [ 1, 0, 0, 1, 0, 0, 0 ], dtype=bool )[:,None]
+    assert _hysteresis( on, off )[:,0].tolist() == [ False, True, True, False, False, True, True ]
+
+def test_foot_contacts():
+    '''A foot that lifts and lands, with noise inside the hysteresis band.'''
+
+    heights = np.array( [ 0.0, 0.01, 0.03, 0.01, 0.05, 0.10, 0.03, 0.01, 0.0 ] )
+    positions = np.zeros( ( len(heights), 1, 3 ) )
+    positions[:,0,1] = heights
+    contacts = foot_contacts( positions, np.zeros( ( len(heights), 1 ) ) )
+    assert contacts[:,0].tolist() == [ True, True, True, True, False, False, False, True, True ]
+
+def test_contact_joints():
+    assert contact_joints( [ 'Hips', 'LeftFoot', 'RightToeBase', 'Spine', 'l_ankle' ] ) == [ 1, 2, 4 ]
+
+def test_kinematics(bvh_file):
+    '''Tracks line up with the motion and feet are configurable by name.'''
+
+    motion, bvh = Motion.read( bvh_file )
+    kin = Kinematics( motion, bvh.skeleton.frame_time, feet=[ 'leftleg' ] )
+    assert kin.velocities.shape == ( 10, 3, 3 )
+    #The root moves one unit along X per frame.
+    assert kin.velocities[:,0,0] == pytest.approx( np.full( 10, 1.0 / bvh.skeleton.frame_time ) )
+    assert kin.feet == [ 2 ]
+    assert kin.contacts.shape == ( 10, 1 )
+    assert kin.speeds.shape == ( 10, 3 )
+
+def test_unit_scale(bvh_file):
+    '''Contact thresholds default to the rig's unit scale, as the Skeleton measures it.'''
+
+    from tools.bvh import BVH
+    skel = BVH( bvh_file ).skeleton
+    skel.set_unit_scale_factor()
+    motion, bvh = Motion.read( bvh_file )
+    assert motion.unit_scale == pytest.approx( skel.scale_factor )
+
+    #Scaling the rig and the motion up scales the default thresholds with it.
+    big = Motion( motion.names, motion.parents, motion.offsets * 100.0, motion.rotations,
+                  motion.root_positions * 100.0 )
+    kin = Kinematics( big, bvh.skeleton.frame_time, feet=[ 'leftleg' ] )
+    assert big.unit_scale == pytest.approx( 100.0 * motion.unit_scale )
+    assert ( kin.contacts == Kinematics( motion, bvh.skeleton.frame_time, feet=[ 'leftleg' ] ).contacts ).all()
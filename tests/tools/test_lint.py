@@ -0,0 +1,123 @@
+'''Tests for the structural BVH validator.'''
+
+import csv
+import json
+import re
+
+import pytest
+
+from tools import lint
+
+from tests.tools.fixtures import bvh_file, make_bvh_text
+
+FIRST_MOTION_LINE = 28      #Line of frame 0 in make_bvh_text
+
+def codes(result):
+    return [ ( d['code'], d['line'] ) for d in result['diagnostics'] ]
+
+def write(tmp_path, text, name='clip.bvh'):
+    path = tmp_path / name
+    path.write_text( text, encoding='utf-8' )
+    return str(path)
+
+def test_clean_file(bvh_file):
+    result = lint.lint_file( bvh_file )
+    assert result['ok'] and result['errors'] == 0 and result['warnings'] == 0
+    assert result['frames'] == 10 and result['declared_frames'] == 10
+    assert result['channels'] == 12
+
+def test_motion_lines(tmp_path):
+    '''Column counts, non numbers and non finite values are found by line.'''
+
+    lines = make_bvh_text( 10 ).splitlines( keepends=True )
+    motion = FIRST_MOTION_LINE - 1
+    lines[motion + 2] = '1 2 3\n'
+    lines[motion + 4] = lines[motion + 4].replace( '0.000000', 'nan', 1 )
+    lines[motion + 6] = lines[motion + 6].replace( '0.000000', 'bad', 1 )
+    lines[motion + 7] = lines[motion + 7].replace( '0.000000', '-inf', 1 )
+    result = lint.lint_file( write( tmp_path, ''.join( lines ) ) )
+
+    assert not result['ok']
+    assert codes( result ) == [ ( 'E110', FIRST_MOTION_LINE + 2 ),
+                                ( 'E112', FIRST_MOTION_LINE + 4 ),
+                                ( 'E111', FIRST_MOTION_LINE + 6 ),
+                                ( 'E112', FIRST_MOTION_LINE + 7 ) ]
+    assert "column 2 is 'bad'" in result['diagnostics'][2]['message']
+
+def test_non_finite_fast_path(tmp_path):
+    '''NaN without any unparseable text is found without the per value scan.'''
+    text = make_bvh_text( 5 ).replace( '3.000000', 'inf' )
+    result = lint.lint_file( write( tmp_path, text ) )
+    assert [ code for code, _ in codes( result ) ] == [ 'E112' ] * 4
+    assert all( line == FIRST_MOTION_LINE + 3 for _, line in codes( result ) )
+
+def test_frame_counts(tmp_path):
+    text = make_bvh_text( 10 )
+    result = lint.lint_file( write( tmp_path, text.replace( 'Frames: 10', 'Frames: 12' ) ) )
+    assert [ code for code, _ in codes( result ) ] == [ 'E113' ]
+
+    result = lint.lint_file( write( tmp_path, text.replace( 'Frames: 10', 'Frames: 9' ) ) )
+    assert result['ok'] and [ code for code, _ in codes( result ) ] == [ 'W206' ]
+
+    result = lint.lint_file( write( tmp_path, text + '\n' + make_bvh_text( 1 ).splitlines()[-1] ) )
+    assert [ code for code, _ in codes( result ) ] == [ 'W205' ]
+
+def test_hierarchy(tmp_path):
+    text = make_bvh_text( 2 )
+    text = text.replace( 'CHANNELS 3 Zrotation Xrotation Yrotation\n\t\tEnd',
+                         'CHANNELS 3 Zrotation Xrotation\n\t\tEnd', 1 )
+    text = text.replace( 'JOINT leftleg', 'JOINT chest' )
+    text = text.replace( 'OFFSET 0.5 -1.0 0.0', 'OFFSET 0.5 -1.0' )
+    text = text.replace( 'Yrotation\n\tJOINT', 'Wrotation\n\tJOINT' )
+    result = lint.lint_file( write( tmp_path, text ) )
+
+    assert codes( result ) == [ ( 'E106', 5 ), ( 'E105', 9 ), ( 'W201', 15 ), ( 'E104', 17 ) ]
+
+def test_unbalanced_and_truncated(tmp_path):
+    text = make_bvh_text( 2 ).replace( '\t\t}\n\t}\n\tJOINT', '\t\t}\n\tJOINT', 1 )
+    result = lint.lint_file( write( tmp_path, text ) )
+    assert ( 'E103', 24 ) in codes( result )
+
+    result = lint.lint_file( write( tmp_path, make_bvh_text( 2 ).split( 'MOTION' )[0] ) )
+    assert [ code for code, _ in codes( result ) ] == [ 'E107' ]
+    result = lint.lint_file( str( tmp_path / 'missing.bvh' ) )
+    assert [ code for code, _ in codes( result ) ] == [ 'E100' ]
+
+def test_limit(tmp_path):
+    text = re.sub( r'\b0\.000000\b', 'nan', make_bvh_text( 30 ) )
+    result = lint.lint_file( write( tmp_path, text ), limit=5 )
+    assert len(result['diagnostics']) == 5
+    assert result['counts'] == { 'E112' : 12 + 29 * 8 }
+
+@pytest.mark.parametrize( 'block', [ 65536, 4 ] )
+def test_blocks(tmp_path, monkeypatch, block):
+    '''Line numbers are right across block boundaries.'''
+    monkeypatch.setattr( lint, '_BLOCK_LINES', block )
+    lines = make_bvh_text( 10 ).splitlines( keepends=True )
+    lines[FIRST_MOTION_LINE + 7] = '0\n'
+    result = lint.lint_file( write( tmp_path, ''.join( lines ) ) )
+    assert codes( result ) == [ ( 'E110', FIRST_MOTION_LINE + 8 ) ]
+
+def test_library_and_output(tmp_path, bvh_file, capsys):
+    bad = write( tmp_path, make_bvh_text( 3 ).replace( 'Frames: 3', 'Frames: 5' ), 'bad.bvh' )
+    results = lint.lint_library( [ bvh_file, bad ], workers=1 )
+    assert [ result['file'] for result in results ] == [ bvh_file, bad ]
+
+    summary = lint.summarize( results )
+    assert summary == { 'files' : 2, 'ok' : 1, 'with_errors' : 1, 'with_warnings' : 0,
+                        'counts' : { 'E113' : 1 } }
+
+    lint.write_diagnostics( results )
+    out = capsys.readouterr().out
+    assert f'{bad}:{FIRST_MOTION_LINE - 2}: error E113' in out
+    assert out.endswith( '2 files, 1 ok, 1 with errors, 0 with warnings\n' )
+
+    lint.write_diagnostics( results, str( tmp_path / 'lint.json' ) )
+    data = json.loads( ( tmp_path / 'lint.json' ).read_text() )
+    assert data['summary'] == summary and len(data['files']) == 2
+
+    lint.write_diagnostics( results, str( tmp_path / 'lint.csv' ) )
+    with open( tmp_path / 'lint.csv', newline='' ) as fptr:
+        rows = list( csv.DictReader( fptr ) )
+    assert rows == [ { 'file' : bad, 'line' : str( FIRST_MOTION_LINE - 2 ), 'severity' : 'error',
+                       'code' : 'E113', 'message' : 'Frames: says 5, found 3' } ]
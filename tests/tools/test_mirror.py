@@ -0,0 +1,92 @@
+'''Tests for left/right mirroring.'''
+
+import numpy as np
+import pytest
+
+from tools.bvh import BVH
+from tools.clip_diff import rotation_errors
+from tools.mirror import mirror_file, mirror_library, mirror_motion, mirror_pairs, \
+                         reflect_quats, reflect_vectors
+from tools.motion import Motion
+
+from tests.tools.fixtures import make_bvh_text
+
+def test_mirror_pairs():
+    names = [ 'Hips', 'LeftUpLeg', 'RightUpLeg', 'lShin', 'rShin', 'Spine',
+              'hand_L', 'hand_R', 'Root', 'LEFTFOOT', 'RIGHTFOOT', 'LeftEye' ]
+    pairs = mirror_pairs( names )
+    assert pairs.tolist() == [ 0, 2, 1, 4, 3, 5, 7, 6, 8, 10, 9, 11 ]
+    assert ( pairs[pairs] == np.arange( len(names) ) ).all()
+
+def test_reflection():
+    '''Reflected rotations act on reflected vectors like the originals do.'''
+    rng = np.random.default_rng( 4 )
+    quats = rng.normal( size=( 20, 4 ) )
+    quats /= np.linalg.norm( quats, axis=1, keepdims=True )
+    vecs = rng.normal( size=( 20, 3 ) )
+    for axis in range( 3 ):
+        from tools import nputils
+        expected = reflect_vectors( nputils.rotate_vectors( quats, vecs ), axis )
+        mirrored = nputils.rotate_vectors( reflect_quats( quats, axis ), reflect_vectors( vecs, axis ) )
+        assert mirrored == pytest.approx( expected )
+
+@pytest.fixture
+def two_legs(tmp_path):
+    '''The fixture skeleton with a rightleg added opposite leftleg, moving differently'''
+    text = make_bvh_text( 6 )
+    leg = text[ text.index( '\tJOINT leftleg' ):text.rindex( '}' ) ]
+    text = text.replace( leg, leg + leg.replace( 'leftleg', 'rightleg' ).replace( '0.5 -1.0', '-0.6 -1.0' ) )
+    lines = text.splitlines( keepends=True )
+    start = lines.index( 'MOTION\n' ) + 3
+    lines[lines.index( 'MOTION\n' ) + 1] = 'Frames: 6\n'
+    for frame in range( 6 ):
+        values = [ frame, 0, 0, frame, 2 * frame, 0, 0, frame, 0, 0, 0, frame, 3 * frame, 0, 5 ]
+        lines[start + frame] = ' '.join( str(value) for value in values ) + '\n'
+    path = tmp_path / 'legs.bvh'
+    path.write_text( ''.join( lines ), encoding='utf-8' )
+    return str(path)
+
+def test_mirror_motion(two_legs):
+    motion, _ = Motion.read( two_legs )
+    pairs = mirror_pairs( motion.names )
+    assert [ motion.names[i] for i in pairs ] == [ 'hips', 'chest', 'rightleg', 'leftleg' ]
+
+    mirrored = mirror_motion( motion )
+    expected = reflect_vectors( motion.world_positions()[:,pairs], 0 )
+    assert mirrored.world_positions() == pytest.approx( expected )
+    assert mirror_motion( mirrored ).rotations == pytest.approx( motion.rotations )
+
+def test_mirror_file(two_legs, tmp_path):
+    out = str( tmp_path / 'out.bvh' )
+    assert mirror_file( two_legs, out ) == 2
+    written, _ = Motion.read( out )
+    expected = mirror_motion( Motion.read( two_legs )[0] )
+    assert rotation_errors( written.rotations, expected.rotations ) == pytest.approx( 0.0, abs=1e-3 )
+    assert written.world_positions() == pytest.approx( expected.world_positions(), abs=1e-5 )
+    skel = BVH( out ).skeleton
+    assert skel.joints['leftleg'].children == [] and skel.joints['rightleg'].end_position.x == 0.0
+
+    #A resting pose is folded into the written rotations.
+    resting = tmp_path / 'resting.bvh'
+    with open( two_legs, encoding='utf-8' ) as fptr:
+        resting.write_text( fptr.read().replace( 'Frames: 6', 'Frames: 5' ), encoding='utf-8' )
+    mirror_file( str(resting), out )
+    expected = mirror_motion( Motion.read( str(resting) )[0] )
+    assert expected.has_resting
+    assert Motion.read( out )[0].world_positions() == pytest.approx( expected.world_positions(), abs=1e-5 )
+
+    results = mirror_library( [ two_legs, str( tmp_path / 'missing.bvh' ) ], str( tmp_path / 'lib' ),
+                              workers=1 )
+    assert results == [ 2, None ]
+    assert ( tmp_path / 'lib' / 'legs_mirror.bvh' ).exists()
+
+    #Same named files in different folders keep their folders.
+    filenames = []
+    for folder in ( 'walk', 'run' ):
+        ( tmp_path / folder ).mkdir()
+        filenames.append( str( tmp_path / folder / 'legs.bvh' ) )
+        with open( two_legs, encoding='utf-8' ) as fptr:
+            ( tmp_path / folder / 'legs.bvh' ).write_text( fptr.read(), encoding='utf-8' )
+    assert mirror_library( filenames, str( tmp_path / 'lib' ), workers=1 ) == [ 2, 2 ]
+    assert ( tmp_path / 'lib' / 'walk' / 'legs_mirror.bvh' ).exists()
+    assert ( tmp_path / 'lib' / 'run' / 'legs_mirror.bvh' ).exists()
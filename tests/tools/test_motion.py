@@ -0,0 +1,127 @@
+'''Tests for the array based motion store and forward kinematics.'''
+
+import glm
+import numpy as np
+import pytest
+
+from tools.bvh import BVH
+from tools.motion import Motion, Track
+
+from tests.tools.fixtures import joint_setup, skeleton_setup, bvh_file, make_bvh_text
+
+def reference_positions(joint, frame, rotation, has_resting, out):
+    '''The per-joint recursion the viewer used to run every tick.'''
+
+    child_rot = joint.frames[frame].rotation * rotation
+    if has_resting:
+        child_rot = glm.conjugate(joint.frames[frame].rotation) * rotation
+
+    if joint.parent is not None:
+        if has_resting:
+            w_position = out[joint.parent.alias] + joint.position * rotation
+        else:
+            w_position = out[joint.parent.alias] + joint.position * glm.conjugate(rotation)
+    else:
+        w_position = joint.position
+    out[joint.alias] = w_position
+
+    for child in joint.children:
+        reference_positions(child, frame, child_rot, has_resting, out)
+    return out
+
+@pytest.mark.parametrize('has_resting', [False, True])
+def test_world_positions(skeleton_setup, has_resting):
+    '''Batched FK matches the recursive version for every frame.'''
+
+    skel = skeleton_setup
+    skel.has_resting = has_resting
+    motion = Motion.from_skeleton( skel )
+
+    assert motion.num_frames == 5
+    assert motion.num_joints == 4
+    assert motion.names == [ 'root', 'child1', 'grandchild', 'child2' ]
+
+    positions = motion.world_positions()
+    for frame in range(motion.num_frames):
+        expected = reference_positions( skel.get_root(), frame, glm.quat(), has_resting, {} )
+        for index, name in enumerate( motion.names ):
+            assert np.allclose( positions[frame, index], tuple(expected[name]), atol=1e-5 )
+
+    assert np.allclose( motion.world_positions(2, 4), positions[2:4] )
+
+def test_root_translation(bvh_file):
+    '''The root's translation channel moves the whole skeleton.'''
+
+    motion = Motion.from_skeleton( BVH( bvh_file ).skeleton )
+    positions = motion.world_positions()
+
+    assert np.allclose( motion.root_positions[:,0], np.arange(10) )
+    assert np.allclose( positions[:,0,0], np.arange(10) )
+
+def test_track(skeleton_setup):
+    '''Frames are computed a chunk at a time on demand.'''
+
+    motion = Motion.from_skeleton( skeleton_setup )
+    track = Track( motion, chunk_size=2 )
+    expected = motion.world_positions()
+
+    assert len(track) == 5
+    assert np.allclose( track[3], expected[3], atol=1e-6 )
+    assert list(track._ready) == [ False, True, False ]
+    track.fill()
+    assert track._ready.all()
+    assert np.allclose( track.positions, expected, atol=1e-6 )
+
+@pytest.mark.parametrize( 'resting', [ False, True ] )
+def test_read_matches_parser(tmp_path, resting):
+    '''The array loader gives the same motion as going through keyframes.'''
+
+    text = make_bvh_text( 12 )
+    if resting:
+        text = text.replace( 'Frames: 12', 'Frames: 11' )
+    text = text.replace( '0.000000 0.000000 0.000000\n', '10.0 20.0 -30.0\n' )
+    path = tmp_path / 'clip.bvh'
+    path.write_text( text )
+
+    motion, bvh = Motion.read( str(path) )
+    expected = Motion.from_skeleton( BVH( str(path) ).skeleton )
+
+    assert motion.names == expected.names
+    assert motion.has_resting == resting
+    assert bvh.skeleton.has_resting == resting
+    assert motion.num_frames == expected.num_frames
+    assert motion.rotations == pytest.approx( expected.rotations, abs=1e-6 )
+    assert motion.root_positions == pytest.approx( expected.root_positions )
+    assert motion.world_positions() == pytest.approx( expected.world_positions(), abs=1e-5 )
+
+def test_read_frame_count(tmp_path):
+    '''A frame count that is neither right nor a resting pose is an error.'''
+
+    path = tmp_path / 'clip.bvh'
+    path.write_text( make_bvh_text( 5 ).replace( 'Frames: 5', 'Frames: 9' ) )
+    with pytest.raises( Exception, match='Expected 9 got 5' ):
+        Motion.read( str(path) )
+
+def test_resting_to_skeleton(tmp_path):
+    '''A resting pose is folded into the rotations written back out.'''
+    from tools.bvh_write import bvh_write
+
+    rng = np.random.default_rng( 3 )
+    lines = make_bvh_text( 6 ).replace( 'Frames: 6', 'Frames: 5' ).splitlines( keepends=True )
+    for i in range( len(lines) - 6, len(lines) ):
+        values = np.concatenate( ( [ i, 0, 0 ], rng.uniform( -60, 60, 9 ) ) )
+        lines[i] = ' '.join( f'{value:.4f}' for value in values ) + '\n'
+    path = tmp_path / 'clip.bvh'
+    path.write_text( ''.join( lines ) )
+
+    motion, bvh = Motion.read( str(path) )
+    plain = motion.without_resting()
+    assert motion.has_resting and not plain.has_resting
+    assert plain.world_positions() == pytest.approx( motion.world_positions() )
+    assert plain.without_resting() is plain
+
+    out = str( tmp_path / 'out.bvh' )
+    bvh_write( motion.to_skeleton( bvh.skeleton ), out )
+    written, _ = Motion.read( out )
+    assert not written.has_resting and written.num_frames == 5
+    assert written.world_positions() == pytest.approx( motion.world_positions(), abs=1e-4 )
@@ -0,0 +1,80 @@
+'''Tests for the pose similarity index.'''
+
+import numpy as np
+import pytest
+
+from tools.motion_index import MotionIndex, window_features
+
+from tests.tools.fixtures import make_bvh_text
+
+@pytest.fixture
+def library(tmp_path):
+    '''Three clips, one of them a copy of another.'''
+    names = []
+    for name, first in ( ( 'a', 0 ), ( 'b', 40 ), ( 'c', 0 ) ):
+        path = tmp_path / f'{name}.bvh'
+        path.write_text( make_bvh_text( 30, first ) )
+        names.append( str(path) )
+    return names
+
+def test_window_features():
+    '''Windows are consecutive frames flattened, one per stride.'''
+
+    relative = np.arange( 5 * 2 * 3, dtype=float ).reshape( 5, 2, 3 )
+    starts, features = window_features( relative, window=2, stride=2 )
+    assert list(starts) == [ 0, 2 ]
+    assert features.shape == ( 2, 12 )
+    assert features[1] == pytest.approx( relative[2:4].ravel() )
+
+    starts, features = window_features( relative[:2], window=3 )
+    assert len(starts) == 0
+    assert features.shape == ( 0, 18 ) and features.dtype == np.float32
+
+def test_build_and_query(library, tmp_path):
+    '''A frame finds itself and its duplicate first, and survives a save.'''
+
+    index = MotionIndex.build( library, window=2, dims=8, clusters=4, workers=1 )
+    assert len(index) == 3 * 29
+    assert index.joints == [ 'chest', 'leftleg' ]
+
+    path = str( tmp_path / 'index.npz' )
+    index.save( path )
+    index = MotionIndex.load( path )
+
+    matches = index.query_clip( library[0], 10, k=2, probes=4 )
+    assert sorted( ( name, frame ) for name, frame, _ in matches ) == \
+           [ ( library[0], 10 ), ( library[2], 10 ) ]
+    assert matches[0][2] == pytest.approx( 0.0, abs=1e-5 )
+
+def test_short_clip(library, tmp_path):
+    '''Clips shorter than the window are skipped, and can't be queried.'''
+
+    short = tmp_path / 'short.bvh'
+    short.write_text( make_bvh_text( 2 ) )
+    index = MotionIndex.build( library + [ str(short) ], window=4, dims=8, clusters=4, workers=1 )
+    assert str(short) not in index.clips
+    with pytest.raises( Exception, match='shorter than the 4 frame window' ):
+        index.query_clip( str(short), 0 )
+
+def test_missing_joints(library):
+    '''Clips without the requested joints are skipped, all of them is an error.'''
+    with pytest.raises( Exception, match='No clips' ):
+        MotionIndex.build( library, joints=[ 'nose' ], workers=1 )
+
+def test_empty_clusters():
+    '''Empty clusters are never probed, so the nearest one being empty still
+       finds rows, and an index of only empty clusters finds nothing.'''
+
+    features = np.array( [ [ 0, 0 ], [ 1, 0 ], [ 10, 0 ] ], dtype=np.float32 )
+    centroids = np.array( [ [ 0.5, 0 ], [ 5, 0 ], [ 10, 0 ] ], dtype=np.float32 )
+    index = MotionIndex( [ 'clip.bvh' ], [ 'chest' ], 1, np.zeros( 3, dtype=int ), np.arange( 3 ),
+                         np.zeros( 2, dtype=np.float32 ), np.eye( 2, dtype=np.float32 ), centroids,
+                         np.array( [ 0, 2, 2, 3 ] ), features )
+
+    matches = index.query( [ 5, 0 ], k=5, probes=1 )
+    assert [ frame for _, frame, _ in matches ] == [ 1, 0 ] and matches[0][2] == pytest.approx( 4.0 )
+    assert [ frame for _, frame, _ in index.query( [ 5, 0 ], k=5, probes=3 ) ] == [ 1, 0, 2 ]
+    assert index.query( [ 5, 0 ], k=0 ) == []
+
+    index.starts = np.array( [ 0, 0, 0, 0 ] )
+    assert index.query( [ 5, 0 ], k=3, probes=2 ) == []
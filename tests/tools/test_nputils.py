@@ -0,0 +1,103 @@
+'''The array versions of putils must agree with the scalar versions.'''
+
+import math
+import glm
+import numpy as np
+import pytest
+
+from tools import putils, nputils
+
+def random_vecs(count, seed=7):
+    '''Reproducible random vectors'''
+    return np.random.default_rng(seed).normal( size=( count, 3 ) )
+
+def assert_matches(batch, expected):
+    '''Every row matches within the tolerance of compare_vecs, NaN included'''
+    for row, scalar in zip( batch, expected ):
+        assert putils.compare_vecs( list(row), list(scalar) )
+        assert list(np.isnan(row)) == [ math.isnan(value) for value in scalar ]
+
+def test_quat_multiply_and_rotate():
+    '''Matches glm's quat * quat and quat * vec3.'''
+
+    quats = np.random.default_rng(3).normal( size=( 20, 4 ) )
+    quats /= np.linalg.norm( quats, axis=1, keepdims=True )
+    vecs = random_vecs(20)
+
+    products = nputils.quat_multiply( quats, quats[::-1] )
+    rotated = nputils.rotate_vectors( quats, vecs )
+    for i in range(20):
+        quat_a = glm.quat( *quats[i] )
+        quat_b = glm.quat( *quats[19 - i] )
+        assert putils.compare_vecs( list(products[i]), list(quat_a * quat_b) )
+        assert putils.compare_vecs( rotated[i], quat_a * glm.vec3( *vecs[i] ) )
+        assert putils.compare_vecs( list(nputils.quat_conjugate( quats[i] )),
+                                    list(glm.conjugate( quat_a )) )
+
+def test_quat_slerp_and_nlerp():
+    '''slerp matches glm.slerp, both take the short way and hit the ends.'''
+
+    rng = np.random.default_rng(9)
+    quats_a = rng.normal( size=( 50, 4 ) )
+    quats_a /= np.linalg.norm( quats_a, axis=1, keepdims=True )
+    quats_b = rng.normal( size=( 50, 4 ) )
+    quats_b /= np.linalg.norm( quats_b, axis=1, keepdims=True )
+    quats_b[0] = quats_a[0]
+    weights = rng.uniform( size=50 )
+
+    slerped = nputils.quat_slerp( quats_a, quats_b, weights )
+    for i in range(50):
+        expected = glm.slerp( glm.quat( *quats_a[i] ), glm.quat( *quats_b[i] ), weights[i] )
+        assert putils.compare_vecs( list(slerped[i]), list(expected) )
+
+    nlerped = nputils.quat_nlerp( quats_a, quats_b, weights )
+    assert np.linalg.norm( nlerped, axis=1 ) == pytest.approx( 1.0 )
+    assert np.abs( ( nlerped * slerped ).sum( axis=1 ) ) == pytest.approx( 1.0, abs=0.02 )
+    for blend in ( nputils.quat_slerp, nputils.quat_nlerp ):
+        assert blend( quats_a, quats_b, 0.0 ) == pytest.approx( quats_a )
+        ends = blend( quats_a, -quats_b, 1.0 )
+        assert np.abs( ( ends * quats_b ).sum( axis=1 ) ) == pytest.approx( 1.0 )
+
+def test_quat_to_euler():
+    '''Random rotations plus the gimbal lock and identity cases.'''
+
+    quats = np.random.default_rng(5).normal( size=( 200, 4 ) )
+    quats = np.concatenate( ( quats, [ [ 1, 0, 0, 0 ], [ 0, 1, 0, 0 ], [ 0.5, 0.5, 0.5, 0.5 ],
+                                       [ 0.5, -0.5, 0.5, -0.5 ],
+                                       [ math.sqrt(0.5), 0, math.sqrt(0.5), 0 ] ] ) )
+    assert_matches( nputils.quat_to_euler( quats ),
+                    [ putils.quat_to_euler( glm.quat( *quat ) ) for quat in quats ] )
+
+def test_shortest_arc():
+    '''Includes parallel, anti-parallel and zero magnitude pairs.'''
+
+    points_a = random_vecs(200)
+    points_b = random_vecs(200, seed=8)
+    points_b[:5] = -points_a[:5]                #Anti-parallel
+    points_b[5:10] = points_a[5:10] * 2.0       #Parallel
+    points_a[10] = 0.0                          #No magnitude
+    points_a[11], points_b[11] = [ 0, 0, 1 ], [ 0, 0, -1 ]  #Anti-parallel along z
+
+    expected = [ putils.shortest_arc( glm.vec3( *a ), glm.vec3( *b ) )
+                 for a, b in zip( points_a, points_b ) ]
+    assert_matches( nputils.shortest_arc( points_a, points_b ), expected )
+
+def test_dir_to_quat():
+    '''Every up axis, including directions parallel to up.'''
+
+    dirs = random_vecs(200)
+    dirs[0] = [ 1, 0, 0 ]
+    dirs[1] = [ 0, 0, -1 ]
+    for up_axis in 'xyz':
+        expected = [ putils.dir_to_quat( glm.vec3( *vec ), up_axis ) for vec in dirs ]
+        assert_matches( nputils.dir_to_quat( dirs, up_axis ), expected )
+
+def test_distance_3d():
+    '''Matches the scalar distance'''
+
+    vecs1 = random_vecs(50)
+    vecs2 = random_vecs(50, seed=9)
+    distances = nputils.distance_3d( vecs1, vecs2 )
+    for i in range(50):
+        assert abs( distances[i] - putils.distance_3d( glm.vec3( *vecs1[i] ),
+                                                       glm.vec3( *vecs2[i] ) ) ) <= 0.0001
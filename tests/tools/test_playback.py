@@ -0,0 +1,91 @@
+'''Tests for the wall-clock playback scheduler.'''
+
+import pytest
+
+from tools.playback import PlaybackClock
+
+class FakeClock:
+    '''A clock that only moves when told to.'''
+    def __init__(self):
+        self.now = 100.0
+    def __call__(self):
+        return self.now
+
+@pytest.fixture(scope='function')
+def clock_setup():
+    '''A 10 frame clip at 10 frames per second on a fake clock.'''
+    fake = FakeClock()
+    return fake, PlaybackClock( 10, 0.1, clock=fake )
+
+def test_follows_wall_clock(clock_setup):
+    '''The frame is derived from elapsed time, not from ticks.'''
+
+    fake, clock = clock_setup
+    assert clock.tick() == ( 0, 1, 0.0 )
+
+    clock.play()
+    fake.now += 0.25
+    index, next_index, blend = clock.tick()
+    assert ( index, next_index ) == ( 2, 3 )
+    assert blend == pytest.approx( 0.5 )
+
+    #Falling behind skips frames rather than slowing down.
+    fake.now += 0.5
+    assert clock.tick()[0] == 7
+    assert clock.stats.dropped == 5
+    assert clock.stats.presented == 3
+
+    #Loops at the end of the clip.
+    fake.now += 0.3
+    index, next_index, _ = clock.tick()
+    assert ( index, next_index ) == ( 0, 1 )
+
+def test_pause_and_speed(clock_setup):
+    '''Pausing holds time and speed changes don't jump.'''
+
+    fake, clock = clock_setup
+    clock.play()
+    fake.now += 0.2
+    clock.pause()
+    fake.now += 5.0
+    assert clock.frame() == pytest.approx( 2.0 )
+
+    clock.play()
+    clock.set_speed( 2.0 )
+    assert clock.frame() == pytest.approx( 2.0 )
+    fake.now += 0.1
+    assert clock.frame() == pytest.approx( 4.0 )
+
+    clock.set_speed( -1.0 )
+    fake.now += 0.1
+    assert clock.frame() == pytest.approx( 3.0 )
+
+def test_scrub(clock_setup):
+    '''Seeking and stepping move directly to a frame.'''
+
+    fake, clock = clock_setup
+    clock.seek( 6 )
+    assert clock.tick()[0] == 6
+    clock.step( -2 )
+    assert clock.tick()[0] == 4
+    clock.step( 7 )
+    assert clock.tick()[0] == 1
+
+def test_no_loop(clock_setup):
+    '''Without looping playback holds on the last frame.'''
+
+    fake, clock = clock_setup
+    clock.loop = False
+    clock.play()
+    fake.now += 3.0
+    assert clock.tick() == ( 9, 9, 0.0 )
+
+def test_render_stats(clock_setup):
+    '''Render times are accumulated.'''
+
+    _, clock = clock_setup
+    for _ in range(3):
+        clock.begin_render()
+        clock.end_render()
+    assert clock.stats.render_count == 3
+    assert clock.stats.render_max >= clock.stats.render_mean >= 0.0
@@ -0,0 +1,46 @@
+'''Tests for the per-phase load profile.'''
+
+import os
+
+from tools.bvh import BVH
+from tools.profiling import LoadProfile
+
+from tests.tools.fixtures import bvh_file
+
+PHASES = [ 'hierarchy', 'motion_tokenize', 'build_keyframes',
+           'fix_end_positions', 'init_world_positions', 'handle_resting_pose' ]
+
+def test_load_phases(bvh_file):
+    '''Every phase is reported once, in order, with the callback seeing each.'''
+
+    seen = []
+    profile = LoadProfile( callback=lambda timing: seen.append( timing.name ) )
+    bvh = BVH( bvh_file, profile=profile )
+
+    assert [ timing.name for timing in profile.phases ] == PHASES
+    assert seen == PHASES
+    assert len(bvh.skeleton.get_root().frames) == 10
+
+    phases = { timing.name : timing for timing in profile.phases }
+    assert phases['motion_tokenize'].frames == 10
+    assert phases['build_keyframes'].frames == 10
+    assert phases['hierarchy'].bytes + phases['motion_tokenize'].bytes == os.path.getsize( bvh_file )
+    assert phases['motion_tokenize'].bytes_per_second > 0.0
+    assert phases['hierarchy'].peak is None
+    assert profile.total_seconds > 0.0
+    assert 'total' in profile.report()
+
+def test_trace_memory(bvh_file):
+    '''Allocation figures are only filled in when tracing.'''
+
+    profile = LoadProfile( trace_memory=True )
+    BVH( bvh_file, profile=profile )
+
+    phases = { timing.name : timing for timing in profile.phases }
+    assert phases['build_keyframes'].peak > 0
+    assert phases['build_keyframes'].blocks > 0
+    assert 'peak' in str( phases['build_keyframes'] )
+
+def test_unprofiled(bvh_file):
+    '''Loading without a profile still works.'''
+    assert len(BVH( bvh_file ).skeleton.get_root().frames) == 10
@@ -0,0 +1,70 @@
+'''Tests for the headless renderer.'''
+
+import numpy as np
+
+from tools.camera import OrbitCamera
+from tools.raster import draw_lines, render_clip, render_library, write_png, write_ppm
+
+from tests.tools.fixtures import bvh_file, make_bvh_text
+
+def test_camera_project():
+    '''The origin lands in the middle of the image.'''
+
+    camera = OrbitCamera()
+    pixels, visible = camera.project( np.array( [ [ 0, 0, 0 ], [ 0.5, 0, 0 ], [ 0, 0.5, 0 ] ] ),
+                                      100, 100 )
+    assert visible.all()
+    assert np.allclose( pixels[0], [ 50, 50 ] )
+    assert pixels[1][0] > 50     #The default orbit looks down -z so +x is on the right
+    assert pixels[2][1] < 50     #y is up on screen
+
+def test_draw_lines():
+    '''Lines are drawn end to end and clipped to the image.'''
+
+    image = np.zeros( ( 10, 10, 3 ), dtype=np.uint8 )
+    colors = np.array( [ [ 255, 0, 0 ], [ 0, 0, 255 ] ], dtype=np.uint8 )
+    draw_lines( image, [ [ 1, 2 ], [ -20, 5 ] ], [ [ 8, 2 ], [ 30, 5 ] ], colors )
+
+    assert ( image[2,1:9,0] == 255 ).all()
+    assert image[2,0,0] == 0 and image[2,9,0] == 0
+    assert ( image[5,:,2] == 255 ).all()
+    assert image[3:5].sum() == 0
+
+def test_write_images(tmp_path):
+    '''Check the headers of the written files.'''
+
+    image = np.zeros( ( 4, 6, 3 ), dtype=np.uint8 )
+    png = tmp_path / 'out.png'
+    ppm = tmp_path / 'out.ppm'
+    write_png( str(png), image )
+    write_ppm( str(ppm), image )
+
+    assert png.read_bytes()[:8] == b'\x89PNG\r\n\x1a\n'
+    assert ppm.read_bytes().startswith( b'P6\n6 4\n255\n' )
+    assert len(ppm.read_bytes()) == len(b'P6\n6 4\n255\n') + 4 * 6 * 3
+
+def test_render_clip(bvh_file, tmp_path):
+    '''A contact sheet of four frames is a 2x2 grid of tiles.'''
+
+    output = str(tmp_path / 'sheet.ppm')
+    render_clip( bvh_file, output, frames=4, size=32 )
+
+    data = (tmp_path / 'sheet.ppm').read_bytes()
+    assert data.startswith( b'P6\n64 64\n255\n' )
+    assert any( data[len(b'P6\n64 64\n255\n'):] )
+
+    render_clip( bvh_file, output, frames=4, size=32, fit=True )
+    assert any( (tmp_path / 'sheet.ppm').read_bytes()[len(b'P6\n64 64\n255\n'):] )
+
+def test_render_library(tmp_path):
+    '''Clips with the same name in different folders get their own images.'''
+
+    library = tmp_path / 'library'
+    for folder in ( 'walk', 'run' ):
+        ( library / folder ).mkdir( parents=True )
+        ( library / folder / 'take.bvh' ).write_text( make_bvh_text( 2 ), encoding='utf-8' )
+    filenames = [ str( library / folder / 'take.bvh' ) for folder in ( 'walk', 'run' ) ]
+
+    outputs = render_library( filenames, str( tmp_path / 'thumbs' ), 'ppm', workers=1, size=16 )
+    assert outputs == [ str( tmp_path / 'thumbs' / folder / 'take.ppm' ) for folder in ( 'walk', 'run' ) ]
+    assert all( ( tmp_path / 'thumbs' / folder / 'take.ppm' ).exists() for folder in ( 'walk', 'run' ) )
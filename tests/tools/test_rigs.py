@@ -0,0 +1,87 @@
+'''Tests for rig fingerprints and the topology registry.'''
+
+import pytest
+
+from tools.bvh import BVH
+from tools.motion import Motion
+from tools.rigs import RigRegistry, rig_fingerprint, split_header
+
+from tests.tools.fixtures import bvh_file, make_bvh_text
+
+def _header(path) -> BVH:
+    bvh = BVH()
+    bvh.read_header( str(path) )
+    return bvh
+
+@pytest.fixture
+def library(tmp_path):
+    '''Two clips on the fixture rig, one with reformatted offsets, one with a
+       longer leg and one with different channels'''
+
+    text = make_bvh_text( 5 )
+    files = { 'a.bvh' : text,
+              'b.bvh' : make_bvh_text( 7, first=3 ).replace( 'OFFSET 0.5 -1.0 0.0', 'OFFSET 0.50000001 -1 0' ),
+              'long.bvh' : text.replace( 'OFFSET 0.5 -1.0 0.0', 'OFFSET 0.5 -1.2 0.0' ),
+              'order.bvh' : text.replace( 'CHANNELS 3 Zrotation Xrotation Yrotation\n\t\tEnd Site\n\t\t{\n\t\t\tOFFSET 0.0 -1.0',
+                                          'CHANNELS 3 Xrotation Zrotation Yrotation\n\t\tEnd Site\n\t\t{\n\t\t\tOFFSET 0.0 -1.0' ) }
+    paths = {}
+    for name, contents in files.items():
+        paths[name] = tmp_path / name
+        paths[name].write_text( contents, encoding='utf-8' )
+    return { name : str(path) for name, path in paths.items() }
+
+def test_fingerprint(library):
+    prints = { name : rig_fingerprint( _header( path ) ) for name, path in library.items() }
+    assert prints['a.bvh'] == prints['b.bvh']
+    assert len( set( prints.values() ) ) == 3
+    assert rig_fingerprint( _header( library['long.bvh'] ), precision=1.0 ) == \
+           rig_fingerprint( _header( library['a.bvh'] ), precision=1.0 )
+
+def test_split_header(bvh_file):
+    with open( bvh_file, 'rb' ) as fptr:
+        hierarchy, frames, frame_time = split_header( BVH.read_header_bytes( fptr ) )
+    assert hierarchy.endswith( b'MOTION\n' ) and frames == 10 and frame_time == pytest.approx( 0.033333 )
+    with pytest.raises( Exception ):
+        split_header( b'HIERARCHY\nROOT hips\n' )
+
+def test_registry_read(library):
+    registry = RigRegistry()
+    first = registry.read( library['a.bvh'] )
+    second = registry.read( library['b.bvh'] )
+    assert len(registry) == 1
+    assert first.topology is second.topology
+    assert second.motion.offsets is first.motion.offsets
+    assert not first.topology.offsets.flags.writeable
+
+    expected, _ = Motion.read( library['b.bvh'] )
+    assert second.motion.num_frames == 7 and second.frame_time == pytest.approx( 0.033333 )
+    assert second.motion.names == expected.names
+    assert second.motion.rotations == pytest.approx( expected.rotations )
+    assert second.motion.world_positions() == pytest.approx( expected.world_positions(), abs=1e-6 )
+
+def test_registry_group(library, tmp_path):
+    registry = RigRegistry()
+    groups = registry.group( list( library.values() ) + [ str( tmp_path / 'missing.bvh' ) ] )
+    assert sorted( len(files) for files in groups.values() ) == [ 1, 1, 2 ]
+    shared = registry[ rig_fingerprint( _header( library['a.bvh'] ) ) ]
+    assert groups[shared.fingerprint] == [ library['a.bvh'], library['b.bvh'] ]
+    assert shared.num_joints == 3 and shared.width == 12
+    assert shared.channels[0] == ( 0, ( 'Xposition', 'Yposition', 'Zposition',
+                                        'Zrotation', 'Xrotation', 'Yrotation' ) )
+
+def test_rounding_boundary(tmp_path):
+    '''Offsets either side of a rounding boundary hash apart but are one rig.'''
+
+    paths = []
+    for name, offset in ( ( 'low', '1.00004999' ), ( 'high', '1.00005001' ), ( 'far', '1.0003' ) ):
+        paths.append( tmp_path / f'{name}.bvh' )
+        paths[-1].write_text( make_bvh_text( 3 ).replace( 'OFFSET 0.5 -1.0 0.0', f'OFFSET 0.5 -{offset} 0.0' ),
+                              encoding='utf-8' )
+    paths = [ str(path) for path in paths ]
+    assert rig_fingerprint( _header( paths[0] ) ) != rig_fingerprint( _header( paths[1] ) )
+
+    registry = RigRegistry()
+    groups = registry.group( paths )
+    assert list( groups.values() ) == [ paths[:2], paths[2:] ]
+    assert len(registry) == 2
+    assert registry[ rig_fingerprint( _header( paths[1] ) ) ] is registry[ rig_fingerprint( _header( paths[0] ) ) ]
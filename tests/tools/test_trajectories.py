@@ -0,0 +1,55 @@
+'''Tests for bulk trajectory export.'''
+
+import csv
+
+import numpy as np
+import pytest
+
+from tools.motion import Motion
+from tools.trajectories import export_trajectories, trajectory_columns
+
+from tests.tools.fixtures import bvh_file
+
+def test_export_npy(bvh_file, tmp_path):
+    '''The .npy holds the requested frames, joints and value groups.'''
+
+    motion, _ = Motion.read( bvh_file )
+    out = str( tmp_path / 'out.npy' )
+    written = export_trajectories( motion, out, [ 'leftleg', 'hips' ], start=1, stride=3,
+                                   values=[ 'world', 'local', 'rotation' ], chunk=2 )
+    data = np.load( out )
+
+    assert written == 3
+    assert data.shape == ( 3, 2, 10 )
+    world = motion.world_positions()
+    assert data[:,0,:3] == pytest.approx( world[[1, 4, 7], 2] )
+    assert data[:,1,3:6] == pytest.approx( motion.offsets[0] + motion.root_positions[[1, 4, 7]] )
+    assert data[:,0,3:6] == pytest.approx( np.tile( motion.offsets[2], ( 3, 1 ) ) )
+    assert data[:,1,6:] == pytest.approx( motion.rotations[[1, 4, 7], 0] )
+
+def test_export_csv(bvh_file, tmp_path):
+    '''CSV rows have a frame number and joint major columns.'''
+
+    motion, _ = Motion.read( bvh_file )
+    out = str( tmp_path / 'out.csv' )
+    export_trajectories( motion, out, None, stop=4, values=[ 'euler' ] )
+    with open( out, newline='' ) as fptr:
+        rows = list( csv.reader( fptr ) )
+
+    assert rows[0] == [ 'frame' ] + trajectory_columns( motion.names, [ 'euler' ] )
+    assert len(rows) == 5
+    assert rows[4][0] == '3'
+    #hips turns 3 degrees about Z on frame 3
+    assert float( rows[4][3] ) == pytest.approx( 3.0, abs=1e-4 )
+
+def test_unknown_joint(bvh_file, tmp_path):
+    motion, _ = Motion.read( bvh_file )
+    with pytest.raises( Exception, match='nose' ):
+        export_trajectories( motion, str( tmp_path / 'out.csv' ), [ 'nose' ] )
+
+def test_bad_selection(bvh_file, tmp_path):
+    motion, _ = Motion.read( bvh_file )
+    with pytest.raises( Exception, match='No joints' ):
+        export_trajectories( motion, str( tmp_path / 'out.csv' ), [] )
+    with pytest.raises( Exception, match='Stride' ):
+        export_trajectories( motion, str( tmp_path / 'out.csv' ), stride=0 )
@@ -0,0 +1,86 @@
+'''Loading BVH files from asyncio code without blocking the event loop.
+
+File contents are read on a thread so the loop stays responsive, then the
+text is parsed in a process pool so many clips can use every core despite
+the GIL.  The skeleton built in the worker is pickled back, so callers get
+the same Skeleton objects that BVH( filename ) produces.
+
+    async with AsyncLoader( max_concurrency=16 ) as loader:
+        skeletons = await loader.load_many( filenames )'''
+
+import asyncio
+import io
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List
+from tools.bvh import BVH
+from tools.skeleton import Skeleton
+
+def _read_bytes( filename:str ) -> bytes:
+    '''Thread worker, the whole file in one read'''
+    with open( filename, 'rb' ) as fptr:
+        return fptr.read()
+
+def parse_bvh_bytes( data:bytes, max_depth:int=None, ignore_after=None ) -> Skeleton:
+    '''Parses the contents of a BVH file and runs the same post-load passes
+       as BVH( filename ).  Runs in the executor.'''
+
+    bvh = BVH( None, max_depth, ignore_after )
+    bvh.read_stream( io.StringIO( data.decode( 'utf-8' ) ) )
+    bvh.finish_load()
+    return bvh.skeleton
+
+class AsyncLoader:
+    '''Loads BVH files concurrently from a running event loop.
+
+       executor is where parsing happens.  By default a ProcessPoolExecutor
+       with max_workers processes is created and shut down by close().
+       max_concurrency bounds how many loads are in flight (reading or
+       parsing) at once so a gather over thousands of files doesn't read
+       them all into memory up front.  It defaults to twice the workers.'''
+
+    def __init__( self, executor:Executor=None, max_workers:int=None, max_concurrency:int=None ):
+        self._owns_executor = executor is None
+        if executor is None:
+            executor = ProcessPoolExecutor( max_workers=max_workers )
+        self.executor = executor
+        '''Runs parse_bvh_bytes'''
+        if max_concurrency is None:
+            max_concurrency = 2 * ( max_workers or os.cpu_count() or 1 )
+        self.max_concurrency = max_concurrency
+        '''The most loads allowed in flight at once'''
+        self._slots = asyncio.Semaphore( max_concurrency )
+
+    async def load( self, filename:str, max_depth:int=None, ignore_after=None ) -> Skeleton:
+        '''Loads one file.  Cancelling the awaiting task releases its slot
+           straight away; a parse that has already started in the pool runs
+           to completion and its result is discarded, one still queued is
+           dropped.'''
+
+        loop = asyncio.get_running_loop()
+        async with self._slots:
+            data = await loop.run_in_executor( None, _read_bytes, filename )
+            return await loop.run_in_executor( self.executor, parse_bvh_bytes,
+                                               data, max_depth, ignore_after )
+
+    async def load_many( self, filenames:List[str], max_depth:int=None,
+                         return_exceptions:bool=False ) -> list:
+        '''Loads every file concurrently, results in the order given.  With
+           return_exceptions a failed file gives its exception instead of
+           cancelling the rest.'''
+
+        return await asyncio.gather( *[ self.load( filename, max_depth ) for filename in filenames ],
+                                     return_exceptions=return_exceptions )
+
+    def close( self ):
+        '''Shuts down the executor if this loader created it, abandoning
+           parses that haven't started.'''
+        if self._owns_executor:
+            self.executor.shutdown( wait=False, cancel_futures=True )
+
+    async def __aenter__( self ):
+        return self
+
+    async def __aexit__( self, *exc ):
+        self.close()
+        return False
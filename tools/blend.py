@@ -0,0 +1,156 @@
+'''Blending, layering and crossfading clips as whole arrays.
+
+Clips are Motions on compatible skeletons: every joint of the first clip must
+exist by name in the others, which are reordered to match.  Weights vary
+over time and, through masks built from the hierarchy, per joint, and every
+frame range is interpolated in one vectorized slerp or nlerp.  The result is
+a Motion; Motion.to_skeleton and bvh_write turn it back into a file.'''
+
+from typing import List
+import numpy as np
+from tools import nputils
+from tools.motion import Motion
+
+CURVES = ( 'linear', 'smooth' )
+'''Shapes of a ramp.  smooth is smoothstep, easing in and out.'''
+
+METHODS = { 'slerp' : nputils.quat_slerp, 'nlerp' : nputils.quat_nlerp }
+'''Quaternion interpolations by name'''
+
+def subtree_mask( motion:Motion, joint:str, value:float=1.0 ) -> np.ndarray:
+    '''(joints,) weights that are value for the named joint and everything
+       below it and 0 elsewhere, eg: subtree_mask( motion, 'Spine' ) for the
+       upper body.  Subtract from 1 for the rest of the skeleton.'''
+
+    if joint not in motion.names:
+        raise Exception( f'No joint named {joint}' )
+    inside = np.zeros( motion.num_joints, dtype=bool )
+    inside[ motion.names.index( joint ) ] = True
+    #Parents precede their children, so one pass reaches the whole subtree.
+    for child, parent in enumerate( motion.parents ):
+        if parent >= 0 and inside[parent]:
+            inside[child] = True
+    return np.where( inside, value, 0.0 )
+
+def ramp( frames:int, start:int, length:int, curve:str='linear' ) -> np.ndarray:
+    '''(frames,) weights that are 0 before start, rise over length frames and
+       are 1 from start + length - 1 on.'''
+
+    if curve not in CURVES:
+        raise Exception( f'Unknown curve {curve}' )
+    steps = max( length - 1, 1 )
+    weights = np.clip( ( np.arange( frames ) - start ) / steps, 0.0, 1.0 )
+    if curve == 'smooth':
+        weights = weights * weights * ( 3.0 - 2.0 * weights )
+    return weights
+
+def _aligned( base:Motion, other:Motion ) -> Motion:
+    '''other with its joints reordered to match base'''
+
+    missing = [ name for name in base.names if name not in other.names ]
+    if missing:
+        raise Exception( f'No joints named {" ".join(missing)}' )
+    if other.has_resting != base.has_resting:
+        raise Exception( 'Clips with and without a resting pose can not be blended' )
+    if other.names == base.names:
+        return other
+    picks = [ other.names.index( name ) for name in base.names ]
+    return Motion( base.names, base.parents, base.offsets, other.rotations[:,picks],
+                   other.root_positions, other.has_resting )
+
+def blend( motions:List[Motion], weights, method:str='slerp' ) -> Motion:
+    '''Weighted blend of several clips over their common frames.  weights
+       is (clips,), (clips, frames) or (clips, frames, joints) and is
+       normalized per frame and joint; where every weight is 0 the first
+       clip is used.  Rotations are interpolated one clip at a time, which
+       for two clips is exactly slerp (or nlerp), and the root translation
+       uses the root's weights.  The skeleton is the first clip's.'''
+
+    interpolate = METHODS[method]
+    base = motions[0]
+    others = [ _aligned( base, motion ) for motion in motions[1:] ]
+    frames = min( motion.num_frames for motion in motions )
+    weights = np.asarray( weights, dtype=float )
+    weights = weights.reshape( weights.shape + ( 1, ) * ( 3 - weights.ndim ) )[:,:frames]
+    weights = np.broadcast_to( weights, ( len(motions), frames, base.num_joints ) )
+
+    rotations = base.rotations[:frames]
+    total = weights[0].copy()
+    for motion, weight in zip( others, weights[1:] ):
+        total += weight
+        with np.errstate( divide='ignore', invalid='ignore' ):
+            share = np.where( total > 0.0, weight / total, 0.0 )
+        rotations = interpolate( rotations, motion.rotations[:frames], share )
+
+    root_weights = weights[:,:,0]
+    root_total = root_weights.sum( axis=0 )
+    roots = np.stack( [ motion.root_positions[:frames] for motion in [ base ] + others ] )
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        root_positions = np.where( ( root_total > 0.0 )[:,None],
+                                   ( roots * root_weights[...,None] ).sum( axis=0 ) / root_total[:,None],
+                                   roots[0] )
+    return Motion( base.names, base.parents, base.offsets, rotations, root_positions, base.has_resting )
+
+def layer( base:Motion, other:Motion, weight=1.0, mask=None, method:str='slerp' ) -> Motion:
+    '''base with other blended over it.  weight is a number or (frames,)
+       curve and mask a (joints,) array such as subtree_mask, so only those
+       joints take other's motion.'''
+
+    frames = min( base.num_frames, other.num_frames )
+    amount = np.broadcast_to( np.asarray( weight, dtype=float ), ( frames, ) )[:,None]
+    amount = amount * ( np.ones( base.num_joints ) if mask is None else np.asarray( mask, dtype=float ) )
+    return blend( [ base, other ], np.stack( ( 1.0 - amount, amount ) ), method )
+
+def additive( base:Motion, other:Motion, weight=1.0, mask=None, reference=None ) -> Motion:
+    '''Adds other's change from a reference pose on top of base.  reference
+       is a (joints, 4) pose in other's joint order and defaults to other's
+       first frame; the root translation adds its change from the first
+       frame.  weight and mask are as for layer.'''
+
+    other_aligned = _aligned( base, other )
+    if reference is None:
+        reference = other_aligned.rotations[0]
+    elif other_aligned is not other:
+        reference = np.asarray( reference )[ [ other.names.index( name ) for name in base.names ] ]
+    frames = min( base.num_frames, other.num_frames )
+    amount = np.broadcast_to( np.asarray( weight, dtype=float ), ( frames, ) )[:,None]
+    amount = amount * ( np.ones( base.num_joints ) if mask is None else np.asarray( mask, dtype=float ) )
+
+    delta = nputils.quat_multiply( nputils.quat_conjugate( reference )[None],
+                                   other_aligned.rotations[:frames] )
+    identity = np.zeros_like( delta )
+    identity[...,0] = 1.0
+    rotations = nputils.quat_multiply( base.rotations[:frames],
+                                       nputils.quat_slerp( identity, delta, amount ) )
+    root_positions = base.root_positions[:frames] + amount[:,:1] * \
+                     ( other_aligned.root_positions[:frames] - other_aligned.root_positions[:1] )
+    return Motion( base.names, base.parents, base.offsets, rotations, root_positions, base.has_resting )
+
+def crossfade( first:Motion, second:Motion, overlap:int, curve:str='linear', method:str='slerp',
+               align_root:bool=True, up:int=1 ) -> Motion:
+    '''first followed by second, blending over `overlap` frames where the
+       end of first and the start of second play together.  With align_root
+       second's translation is moved on the ground plane so it starts where
+       first is at the start of the overlap.  up is the vertical axis.'''
+
+    second = _aligned( first, second )
+    if not 0 <= overlap <= min( first.num_frames, second.num_frames ):
+        raise Exception( f'Overlap of {overlap} frames is longer than a clip' )
+
+    cut = first.num_frames - overlap
+    root_positions = second.root_positions
+    if align_root and first.num_frames > 0 and second.num_frames > 0:
+        shift = first.root_positions[ min( cut, first.num_frames - 1 ) ] - second.root_positions[0]
+        shift[up] = 0.0
+        root_positions = root_positions + shift
+    second = Motion( second.names, second.parents, second.offsets, second.rotations,
+                     root_positions, second.has_resting )
+
+    faded = layer( first.take( np.arange( cut, first.num_frames ) ),
+                   second.take( np.arange( overlap ) ),
+                   ramp( overlap, 0, overlap, curve ), method=method )
+    return Motion( first.names, first.parents, first.offsets,
+                   np.concatenate( ( first.rotations[:cut], faded.rotations, second.rotations[overlap:] ) ),
+                   np.concatenate( ( first.root_positions[:cut], faded.root_positions,
+                                     second.root_positions[overlap:] ) ),
+                   first.has_resting )
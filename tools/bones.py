@@ -0,0 +1,136 @@
+'''Flat array layout of a skeleton's bones for batched drawing.
+This module does not touch OpenGL so it can be used headless.'''
+
+import numpy as np
+from tools.skeleton import Skeleton
+
+CENTER_COLOR = ( 1.0, 1.0, 1.0 )
+RIGHT_COLOR = ( 1.0, 0.0, 0.0 )
+LEFT_COLOR = ( 0.0, 0.0, 1.0 )
+
+def joint_color( alias:str ) -> tuple:
+    '''Picks a color for a joint from its name.  Right side joints are red,
+       left side are blue, everything else is white.'''
+
+    jname = alias.upper()
+    if 'RIGHT' in jname or jname[0]=='R':
+        return RIGHT_COLOR
+    if 'LEFT' in jname or jname[0]=='L':
+        return LEFT_COLOR
+    return CENTER_COLOR
+
+def gather_positions( joints:list ) -> np.ndarray:
+    '''Collects the current world positions of a list of joints into a
+       (joints, 3) array.'''
+    return np.array( [ tuple(joint.w_position) for joint in joints ],
+                     dtype=np.float32 ).reshape( -1, 3 )
+
+class BoneBuffer:
+    '''The static part of a skeleton's bones (index pairs and colors) plus
+       a vertex array refreshed with joint positions each frame.  Joints are
+       laid out in Skeleton.ordered_joints() order so the root is vertex 0.'''
+
+    def __init__( self, skeleton:Skeleton ):
+        self.joints = skeleton.ordered_joints()
+        '''The joints in vertex order'''
+        index = { id(joint) : i for i, joint in enumerate( self.joints ) }
+        self.parents = np.array( [ index[id(joint.parent)] if joint.parent is not None else -1
+                                   for joint in self.joints ], dtype=np.int32 )
+        '''The vertex index of each joint's parent.  -1 for the root.'''
+
+        children = np.nonzero( self.parents >= 0 )[0]
+        self.indices = np.empty( ( len(children), 2 ), dtype=np.uint32 )
+        '''One (parent, child) vertex pair per bone, flattened for GL_LINES'''
+        self.indices[:,0] = self.parents[children]
+        self.indices[:,1] = children
+        self.indices = self.indices.ravel()
+
+        self.colors = np.array( [ joint_color( joint.alias ) for joint in self.joints ],
+                                dtype=np.float32 )
+        '''Per-vertex colors.  With flat shading a bone takes its child's color.'''
+        self.vertices = np.zeros( ( len(self.joints), 3 ), dtype=np.float32 )
+        '''Root relative, unit scaled joint positions for the current frame'''
+        self.scale_factor = skeleton.scale_factor
+
+    @property
+    def num_bones( self ) -> int:
+        '''The number of parent to child line segments'''
+        return len(self.indices) // 2
+
+    def gather( self ) -> np.ndarray:
+        '''Collects the current world positions from the joints.'''
+        return gather_positions( self.joints )
+
+    def update( self, positions:np.ndarray ):
+        '''Refreshes the vertex array from a (joints, 3) array of world positions,
+           keeping the root at the origin.'''
+        np.subtract( positions, positions[0], out=self.vertices, casting='unsafe' )
+        self.vertices /= self.scale_factor
+
+    def segments( self ) -> np.ndarray:
+        '''The bones of the current frame as a (bones, 2, 3) array of end points.'''
+        return self.vertices[ self.indices ].reshape( -1, 2, 3 )
+
+def rig_key( skeleton:Skeleton ) -> tuple:
+    '''Joint names and parent layout.  Skeletons with equal keys can share
+       a BoneBuffer's indices and colors.'''
+
+    joints = skeleton.ordered_joints()
+    index = { id(joint) : i for i, joint in enumerate( joints ) }
+    return tuple( ( joint.alias, index[id(joint.parent)] if joint.parent is not None else -1 )
+                  for joint in joints )
+
+class BoneBatch:
+    '''Several skeletons laid out back to back in one vertex array so they can
+       all be drawn together.  Instances of the same rig pass the same
+       BoneBuffer and only differ in their slice of the vertices.'''
+
+    def __init__( self, rigs:list, placements=None ):
+        counts = [ len(rig.joints) for rig in rigs ]
+        starts = np.concatenate( ( [0], np.cumsum( counts ) ) ).astype( np.uint32 )
+        self._slices = [ slice( int(starts[i]), int(starts[i+1]) ) for i in range( len(rigs) ) ]
+
+        self.rigs = rigs
+        '''The BoneBuffer supplying the topology of each instance'''
+        self.indices = np.concatenate( [ rig.indices + start for rig, start in zip( rigs, starts ) ] )
+        '''Bone vertex pairs of every instance, flattened for GL_LINES'''
+        self.colors = np.concatenate( [ rig.colors for rig in rigs ] )
+        '''Per-vertex colors of every instance'''
+        self.vertices = np.zeros( ( int(starts[-1]), 3 ), dtype=np.float32 )
+        '''Root relative, unit scaled joint positions, offset by placement'''
+        if placements is None:
+            placements = np.zeros( ( len(rigs), 3 ) )
+        self.placements = np.asarray( placements, dtype=np.float32 )
+        '''Where each instance's root is drawn'''
+
+    def __len__( self ) -> int:
+        return len(self.rigs)
+
+    @property
+    def num_bones( self ) -> int:
+        '''The number of parent to child line segments over all instances'''
+        return len(self.indices) // 2
+
+    def update( self, instance:int, positions:np.ndarray, scale_factor:float ):
+        '''Refreshes one instance's vertices from its (joints, 3) world positions.'''
+
+        view = self.vertices[ self._slices[instance] ]
+        np.subtract( positions, positions[0], out=view, casting='unsafe' )
+        view /= scale_factor
+        view += self.placements[instance]
+
+    def segments( self ) -> np.ndarray:
+        '''The bones of the current frame as a (bones, 2, 3) array of end points.'''
+        return self.vertices[ self.indices ].reshape( -1, 2, 3 )
+
+def grid_placements( count:int, spacing:float=2.0 ) -> np.ndarray:
+    '''Centers count instances on a square-ish grid in the x/y plane.
+       Returns (count, 3) placements.'''
+
+    columns = int( np.ceil( np.sqrt( count ) ) )
+    rows = ( count + columns - 1 ) // columns
+    index = np.arange( count )
+    placements = np.zeros( ( count, 3 ) )
+    placements[:,0] = ( index % columns - ( columns - 1 ) / 2.0 ) * spacing
+    placements[:,1] = ( ( rows - 1 ) / 2.0 - index // columns ) * spacing
+    return placements
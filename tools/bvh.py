@@ -1,9 +1,12 @@
 '''A simple library for parsing BVH files.'''
 
 import copy
+import io
+import time
 from typing import List
 import glm
 from tools import putils
+from tools.profiling import LoadProfile, NULL_PROFILE
 from tools.skeleton import KeyFrame, Joint, Skeleton
 
 class _Channels:
@@ -46,7 +49,8 @@ class BVH:
     channel_offset: int
     depth: int
 
-    def __init__( self, filename:str=None, max_depth:int=None, ignore_after=None ):
+    def __init__( self, filename:str=None, max_depth:int=None, ignore_after=None,
+                  profile:LoadProfile=None ):
         '''Load a BVH file into memory.  Assumes that the file is a valid BVH format
         and the program has appropriate permissions.
         '''
@@ -59,6 +63,8 @@ class BVH:
         '''ignore_after [OPTIONAL] a whitespace delimited list of joint names to exclude.
         eg:  "mLeftHand mRightHand" would preserve the left and right hand joints
         but cut off all the fingers.'''
+        self.profile = profile if profile is not None else NULL_PROFILE
+        '''profile [OPTIONAL] a LoadProfile that times each phase of the load.'''
 
         self.channels = []
         self.channel_offset = 0 #A running counter of channels
@@ -66,9 +72,20 @@ class BVH:
 
         if filename is not None:
             self.read_file( filename )
+            self.finish_load()
+
+    def finish_load( self ):
+        '''The post-load passes that BVH( filename ) runs after read_file:
+           end positions, world positions and resting pose extraction.'''
+
+        with self.profile.phase( 'fix_end_positions' ):
             self.skeleton.fix_end_positions()
+        with self.profile.phase( 'init_world_positions' ):
             self.skeleton.init_world_positions()
+        with self.profile.phase( 'handle_resting_pose' ) as timing:
             self.skeleton.handle_resting_pose()
+            if self.skeleton.has_resting:
+                timing.frames = self.skeleton.num_frames
 
     @staticmethod
     def _read_hierarchy_line( fptr ):
@@ -208,33 +225,119 @@ class BVH:
             quat = quat * glm.quat( putils.radians( euler ) )
         return quat
 
-    def _parse_motion( self, fptr ):
-        '''Parse the motion portion of the file'''
+    def _build_keyframe( self, channels:list ):
+        '''Appends one tokenized motion line to each joint's keyframes'''
+
+        frame = KeyFrame()
+        for channel in self.channels:
+            if len(channel.rotation) > 0:
+                frame.rotation = self._extract_rotation( channel.rotation,
+                                                         channels )
+            if len(channel.position) > 0:
+                frame.position = self._extract_vector( channel.position,
+                                                       channels,
+                                                       0.0 )
+            if len(channel.scale) > 0:
+                frame.scale = self._extract_vector( channel.scale,
+                                                    channels,
+                                                    1.0 )
+
+            channel.joint.frames.append( copy.deepcopy(frame) )
+
+    def _parse_motion_timed( self, fptr, tokenize, build ) -> int:
+        '''_parse_motion adding each line's tokenizing and keyframe building
+           time to the tokenize and build PhaseTimings'''
 
         frame_no = 0
+        clock = time.perf_counter
+        start = clock()
         channels = self._read_motion_line( fptr )
+        tokenized = clock()
+        tokenize.seconds += tokenized - start
 
         while len(channels) > 0:
-            frame = KeyFrame()
-            for channel in self.channels:
-                if len(channel.rotation) > 0:
-                    frame.rotation = self._extract_rotation( channel.rotation,
-                                                             channels )
-                if len(channel.position) > 0:
-                    frame.position = self._extract_vector( channel.position,
-                                                           channels,
-                                                           0.0 )
-                if len(channel.scale) > 0:
-                    frame.scale = self._extract_vector( channel.scale,
-                                                        channels,
-                                                        1.0 )
-
-                channel.joint.frames.append( copy.deepcopy(frame) )
+            self._build_keyframe( channels )
+            built = clock()
+            build.seconds += built - tokenized
+
+            channels = self._read_motion_line( fptr )
+            tokenized = clock()
+            tokenize.seconds += tokenized - built
+            frame_no += 1
+        return frame_no
 
+    def _parse_motion( self, fptr ):
+        '''Parse the motion portion of the file a line at a time'''
+
+        if self.profile is not NULL_PROFILE:
+            with self.profile.interleaved( 'motion_tokenize', 'build_keyframes' ) as ( tokenize, build ):
+                start = fptr.tell()
+                frame_no = self._parse_motion_timed( fptr, tokenize, build )
+                tokenize.bytes = fptr.tell() - start
+                tokenize.frames = build.frames = frame_no
+            return frame_no
+
+        frame_no = 0
+        channels = self._read_motion_line( fptr )
+
+        while len(channels) > 0:
+            self._build_keyframe( channels )
             channels = self._read_motion_line( fptr )
             frame_no += 1
         return frame_no
 
+    def _parse_preamble( self, fptr ):
+        '''Reads the Frames: and Frame Time: lines that follow MOTION'''
+
+        _, _, fields = self._read_hierarchy_line( fptr )
+        self.skeleton.num_frames = int( fields[1] )
+        _, _, fields = self._read_hierarchy_line( fptr )
+        self.skeleton.frame_time = float( fields[2] )
+        self.skeleton.frame_rate = int ( float (fields[2]) * 1000.0 )  #In ms
+
+    def _parse_header( self, fptr ) -> bool:
+        '''Reads the HIERARCHY and the MOTION preamble.  Returns True if
+           MOTION was found, leaving fptr at the first line of motion data.'''
+
+        valid, tag, fields = self._read_hierarchy_line( fptr )
+        while valid:
+            if tag == 'HIERARCHY':
+                tag,fields = self._parse_hierarchy( fptr )
+            if tag == 'MOTION':
+                self._parse_preamble( fptr )
+                return True
+            valid, tag, fields = self._read_hierarchy_line( fptr )
+        return False
+
+    @staticmethod
+    def read_header_bytes( fptr ) -> bytes:
+        '''Given a file opened in binary mode, returns the raw bytes of everything
+           up to and including the Frame Time: line.  fptr is left at the first
+           byte of motion data.'''
+
+        header = []
+        line = fptr.readline()
+        while line:
+            header.append( line )
+            if line.strip().upper() == b'MOTION':
+                header.append( fptr.readline() )    #Frames:
+                header.append( fptr.readline() )    #Frame Time:
+                break
+            line = fptr.readline()
+        return b''.join( header )
+
+    def read_header( self, filename:str ) -> int:
+        '''Reads only the hierarchy, frame count and frame time, leaving the motion
+           data untouched.  Returns the byte offset of the first motion line.'''
+
+        with open( filename, 'rb' ) as fptr:
+            header = self.read_header_bytes( fptr )
+            offset = fptr.tell()
+
+        if not self._parse_header( io.StringIO( header.decode( 'utf-8' ) ) ):
+            raise Exception( f'No MOTION section found in {filename}' )
+        return offset
+
     def read_file( self, filename:str, max_depth:int=None, ignore_after_list:List[str]=None ):
         '''Attempts to read the BVH file.  If max_depth is set,
            ignore joints below this depth.  If ignore_list is set,
@@ -247,21 +350,21 @@ class BVH:
             self.ignore_after_list = ignore_after_list
 
         with open( filename, 'r', encoding='utf-8' ) as fptr:
-            valid, tag, fields = self._read_hierarchy_line( fptr )
-            while valid:
-                if tag == 'HIERARCHY':
-                    tag,fields = self._parse_hierarchy( fptr )
-                if tag == 'MOTION':
-                    _, _, fields = self._read_hierarchy_line( fptr )
-                    self.skeleton.num_frames = int( fields[1] )
-                    _, _, fields = self._read_hierarchy_line( fptr )
-                    self.skeleton.frame_rate = int ( float (fields[2]) * 1000.0 )  #In ms
-                    num_frames_read =  self._parse_motion( fptr )
-
-                    if self.skeleton.num_frames != num_frames_read:
-                        if self.skeleton.num_frames+1 == num_frames_read:
-                            print("Resting pose detected.")
-                            self.skeleton.has_resting = True
-                        else:
-                            raise Exception(f'Expected {self.skeleton.num_frames} got {num_frames_read}')
-                valid, tag, fields = self._read_hierarchy_line( fptr )
+            self.read_stream( fptr )
+
+    def read_stream( self, fptr ):
+        '''Like read_file but from an open text stream, eg: io.StringIO for
+           a file whose contents were read elsewhere.'''
+
+        with self.profile.phase( 'hierarchy' ) as timing:
+            found = self._parse_header( fptr )
+            timing.bytes = fptr.tell()
+        if found:
+            num_frames_read =  self._parse_motion( fptr )
+
+            if self.skeleton.num_frames != num_frames_read:
+                if self.skeleton.num_frames+1 == num_frames_read:
+                    print("Resting pose detected.")
+                    self.skeleton.has_resting = True
+                else:
+                    raise Exception(f'Expected {self.skeleton.num_frames} got {num_frames_read}')
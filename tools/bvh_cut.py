@@ -0,0 +1,286 @@
+'''Slicing and concatenating BVH motion without decoding it.
+
+The hierarchy of each file is parsed so rigs can be compared, but the
+motion lines themselves are never parsed.  Lines are counted by counting
+newlines a chunk at a time and the frames are copied as raw byte ranges,
+so only the Frames: line of the header is rewritten.  A motion line more
+than the Frames: line declares is a resting pose, as BVH.read_file has
+it: it is kept ahead of the frames and never counted as one.  Telling
+whether a file has one means counting all of its lines once, so every
+cut reads the whole motion section, but only the newlines are looked at.
+
+Blank lines are not counted as frames.  Chunks holding blank or indented
+lines fall back to matching each line with a regular expression, and a
+range holding blank lines is copied a line at a time without them.'''
+
+import os
+import re
+from typing import List
+import numpy as np
+from tools import putils
+from tools.bvh import BVH
+
+_CHUNK = 1 << 20    #Bytes read at a time while scanning motion data.
+_FRAMES_RE = re.compile( rb'^([ \t]*Frames:[ \t]*)\d+', re.MULTILINE | re.IGNORECASE )
+_LINE_RE = re.compile( rb'^[^\S\n]*\S[^\n]*', re.MULTILINE )    #A non-blank line.
+_SPACE = np.zeros( 256, dtype=bool )
+_SPACE[ list( b' \t\r\n\v\f' ) ] = True   #Whitespace bytes by value.
+
+class _Clip:
+    '''The parsed header of a BVH file plus the byte range of its motion data.'''
+
+    def __init__( self, filename:str ):
+        self.filename = filename
+        self.bvh = BVH()
+        self.begin = self.bvh.read_header( filename )
+        '''Offset of the first motion line'''
+        self.end = _data_end( filename, self.begin )
+        '''Offset just past the last non-whitespace byte of motion'''
+        with open( filename, 'rb' ) as fptr:
+            lines, blank = _scan_lines( fptr, self.begin, self.end )
+        self.blank = blank
+        '''True if the motion holds blank lines, which aren't copied'''
+        self.has_resting = lines == self.bvh.skeleton.num_frames + 1
+        '''True if the first motion line is a resting pose, which is how
+           BVH.read_file treats a line more than Frames: declares'''
+        self.num_frames = lines - self.has_resting
+        '''Motion lines after the resting pose, blank lines not counted'''
+        self.frames_begin = self.begin
+        '''Offset of the first frame, past any resting pose'''
+        if self.has_resting:
+            with open( filename, 'rb' ) as fptr:
+                fptr.seek( self.begin )
+                _skip_lines( fptr, 1, self.end )
+                self.frames_begin = fptr.tell()
+
+    def copy( self, src, dst, begin:int, end:int ):
+        '''Copies the frames in [begin, end) of the file open as src to dst'''
+        if self.blank:
+            _copy_lines( src, dst, begin, end )
+        else:
+            _copy_range( src, dst, begin, end, self.end )
+
+    def resting( self ) -> bytes:
+        '''The resting pose line, empty if there isn't one'''
+
+        if not self.has_resting:
+            return b''
+        with open( self.filename, 'rb' ) as fptr:
+            return _LINE_RE.search( _read( fptr, self.begin, self.frames_begin ) ).group() + b'\n'
+
+    def header( self, num_frames:int ) -> bytes:
+        '''The raw header bytes with the Frames: count replaced.'''
+
+        with open( self.filename, 'rb' ) as fptr:
+            header = fptr.read( self.begin )
+        header, count = _FRAMES_RE.subn( lambda m: m.group(1) + str(num_frames).encode(),
+                                         header, count=1 )
+        if count != 1:
+            raise Exception( f'No Frames: line found in {self.filename}' )
+        return header
+
+def _data_end( filename:str, begin:int ) -> int:
+    '''Returns the offset just past the last non-whitespace byte in the file
+       so trailing blank lines are not mistaken for frames.'''
+
+    with open( filename, 'rb' ) as fptr:
+        end = fptr.seek( 0, os.SEEK_END )
+        while end > begin:
+            start = max( begin, end - 4096 )
+            fptr.seek( start )
+            block = fptr.read( end - start ).rstrip()
+            if block:
+                return start + len(block)
+            end = start
+    return begin
+
+def _read( fptr, begin:int, end:int ) -> bytes:
+    '''The bytes [begin, end)'''
+    fptr.seek( begin )
+    return fptr.read( end - begin )
+
+def _chunks( fptr, begin:int, limit:int ):
+    '''Yields ( offset, chunk ) for the bytes from begin to limit, each
+       chunk ending with a whole line.  limit is treated as the end of the
+       last line.'''
+
+    pos = begin
+    while pos < limit:
+        fptr.seek( pos )
+        chunk = fptr.read( min( _CHUNK, limit - pos ) )
+        if not chunk:
+            return
+        while pos + len(chunk) < limit and b'\n' not in chunk:
+            #A line longer than _CHUNK.
+            more = fptr.read( min( _CHUNK, limit - pos - len(chunk) ) )
+            if not more:
+                break
+            chunk += more
+        if pos + len(chunk) < limit:
+            chunk = chunk[:chunk.rindex( b'\n' ) + 1]
+        yield pos, chunk
+        pos += len(chunk)
+
+def _line_ends( chunk:bytes ) -> np.ndarray:
+    '''Offsets of the newlines in a chunk of whole lines, or None if any
+       line is blank or starts with whitespace, when lines can't be found
+       by their newlines alone'''
+
+    data = np.frombuffer( chunk, dtype=np.uint8 )
+    ends = np.flatnonzero( data == 10 )
+    starts = ends[ends + 1 < len(data)] + 1
+    if _SPACE[data[0]] or _SPACE[data[starts]].any():
+        return None
+    return ends
+
+def _skip_lines( fptr, lines:int, limit:int ) -> int:
+    '''Moves fptr past up to `lines` non-blank lines, and the newline ending
+       the last of them, without going past limit.  Blank lines are passed
+       over without being counted.  Whole chunks are skipped by counting
+       newlines so only the chunk holding the target is searched.  Returns
+       the number of lines skipped.'''
+
+    skipped = 0
+    if lines <= 0:
+        return skipped
+    for pos, chunk in _chunks( fptr, fptr.tell(), limit ):
+        ends = _line_ends( chunk )
+        if ends is None:
+            for match in _LINE_RE.finditer( chunk ):
+                skipped += 1
+                if skipped == lines:
+                    fptr.seek( min( pos + match.end() + 1, limit ) )
+                    return skipped
+            continue
+
+        count = len(ends) + ( not chunk.endswith( b'\n' ) )
+        if skipped + count < lines:
+            skipped += count
+            continue
+        index = lines - skipped - 1
+        fptr.seek( pos + int( ends[index] ) + 1 if index < len(ends) else limit )
+        return lines
+    fptr.seek( limit )
+    return skipped
+
+def _scan_lines( fptr, begin:int, end:int ) -> tuple:
+    '''Counts the non-blank lines between begin and end, end being the end
+       of the last line.  Returns the count and whether any line was blank.'''
+
+    count = 0
+    blank = False
+    for _, chunk in _chunks( fptr, begin, end ):
+        ends = _line_ends( chunk )
+        if ends is not None:
+            count += len(ends) + ( not chunk.endswith( b'\n' ) )
+            continue
+        found = sum( 1 for _ in _LINE_RE.finditer( chunk ) )
+        blank = blank or found != chunk.count( b'\n' ) + ( not chunk.endswith( b'\n' ) )
+        count += found
+    return count, blank
+
+def _copy_range( src, dst, begin:int, end:int, limit:int ):
+    '''Copies the bytes [begin, end) from src to dst.  If end is the end
+       of the motion data the missing final newline is supplied.'''
+
+    src.seek( begin )
+    remaining = end - begin
+    while remaining > 0:
+        chunk = src.read( min( _CHUNK, remaining ) )
+        if not chunk:
+            break
+        dst.write( chunk )
+        remaining -= len(chunk)
+    if end == limit and end > begin:
+        dst.write( b'\n' )
+
+def _copy_lines( src, dst, begin:int, end:int ):
+    '''Copies the non-blank lines in [begin, end) from src to dst, each
+       ending with a newline.'''
+
+    for _, chunk in _chunks( src, begin, end ):
+        lines = [ match.group() for match in _LINE_RE.finditer( chunk ) ]
+        if lines:
+            dst.write( b'\n'.join( lines ) + b'\n' )
+
+def _same_rig( clip_a:_Clip, clip_b:_Clip ) -> bool:
+    '''Compares the parsed hierarchies of two clips: joint names, parents,
+       offsets and channel layouts must all match.'''
+
+    channels_a = clip_a.bvh.channels
+    channels_b = clip_b.bvh.channels
+    if len(channels_a) != len(channels_b):
+        return False
+
+    for chan_a, chan_b in zip( channels_a, channels_b ):
+        joint_a = chan_a.joint
+        joint_b = chan_b.joint
+        if joint_a.name != joint_b.name:
+            return False
+        parent_a = joint_a.parent.name if joint_a.parent is not None else None
+        parent_b = joint_b.parent.name if joint_b.parent is not None else None
+        if parent_a != parent_b:
+            return False
+        if not putils.compare_vecs( joint_a.position, joint_b.position ):
+            return False
+        for layout_a, layout_b in ( ( chan_a.rotation, chan_b.rotation ),
+                                    ( chan_a.position, chan_b.position ),
+                                    ( chan_a.scale, chan_b.scale ) ):
+            if list(layout_a.items()) != list(layout_b.items()):
+                return False
+    return True
+
+def bvh_cut( filename:str, output:str, start:int, stop:int=None ) -> int:
+    '''Writes frames [start, stop) of filename to output, after the resting
+       pose if it has one.  stop defaults to the end of the file and is
+       clamped to it.  Returns the number of frames written.'''
+
+    if start < 0 or ( stop is not None and stop < start ):
+        raise Exception( f'Invalid frame range {start}:{stop}' )
+
+    clip = _Clip( filename )
+    if start > clip.num_frames:
+        raise Exception( f'{filename} has fewer than {start} frames' )
+    stop = clip.num_frames if stop is None else min( stop, clip.num_frames )
+    with open( filename, 'rb' ) as src:
+        src.seek( clip.frames_begin )
+        _skip_lines( src, start, clip.end )
+        begin = src.tell()
+        _skip_lines( src, stop - start, clip.end )
+        end = src.tell()
+
+        with open( output, 'wb' ) as dst:
+            dst.write( clip.header( stop - start ) )
+            dst.write( clip.resting() )
+            clip.copy( src, dst, begin, end )
+    return stop - start
+
+def bvh_concat( filenames:List[str], output:str ) -> int:
+    '''Writes the motion of every file in filenames, in order, to output.
+       All files must share the same hierarchy, frame time and resting pose,
+       which is written once at the start.  Returns the number of frames
+       written.'''
+
+    if len(filenames) == 0:
+        raise Exception( 'Nothing to concatenate' )
+
+    clips = [ _Clip( filename ) for filename in filenames ]
+    first = clips[0]
+    resting = first.resting().split()
+    for clip in clips[1:]:
+        if not _same_rig( first, clip ):
+            raise Exception( f'Hierarchy of {clip.filename} does not match {first.filename}' )
+        if clip.bvh.skeleton.frame_time != first.bvh.skeleton.frame_time:
+            raise Exception( f'Frame time of {clip.filename} does not match {first.filename}' )
+        if clip.has_resting != first.has_resting or \
+           not all( float(a) == float(b) for a, b in zip( clip.resting().split(), resting ) ):
+            raise Exception( f'Resting pose of {clip.filename} does not match {first.filename}' )
+
+    num_frames = sum( clip.num_frames for clip in clips )
+    with open( output, 'wb' ) as dst:
+        dst.write( first.header( num_frames ) )
+        dst.write( first.resting() )
+        for clip in clips:
+            with open( clip.filename, 'rb' ) as src:
+                clip.copy( src, dst, clip.frames_begin, clip.end )
+    return num_frames
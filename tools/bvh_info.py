@@ -0,0 +1,42 @@
+'''A quick summary of a BVH file from its header alone.  Only the standard
+library is used so it can be imported without glm or NumPy.'''
+
+def read_info( filename:str ) -> dict:
+    '''Scans the hierarchy and MOTION preamble of a BVH file.  Returns a dict
+       with the root name, joint, end site and channel counts, frame count,
+       frame time and duration in seconds.  The motion lines are not read.'''
+
+    info = { 'filename' : filename, 'root' : None, 'joints' : 0, 'end_sites' : 0,
+             'channels' : 0, 'frames' : None, 'frame_time' : None }
+
+    with open( filename, 'rb' ) as fptr:
+        line = fptr.readline()
+        while line:
+            fields = line.split()
+            tag = fields[0].upper() if fields else b''
+            if tag == b'ROOT':
+                info['root'] = fields[1].decode( 'utf-8' )
+                info['joints'] += 1
+            elif tag == b'JOINT':
+                info['joints'] += 1
+            elif tag == b'END':
+                info['end_sites'] += 1
+            elif tag == b'CHANNELS':
+                info['channels'] += int( fields[1] )
+            elif tag == b'FRAMES:':
+                info['frames'] = int( fields[1] )
+            elif tag == b'FRAME' and len(fields) > 2:
+                info['frame_time'] = float( fields[2] )
+                break
+            line = fptr.readline()
+
+    if info['frames'] is None or info['frame_time'] is None:
+        raise Exception( f'No MOTION section found in {filename}' )
+    info['duration'] = info['frames'] * info['frame_time']
+    return info
+
+def format_info( info:dict ) -> str:
+    '''One line summary of read_info's result'''
+    return ( f"{info['filename']}: root {info['root']}, {info['joints']} joints, "
+             f"{info['end_sites']} end sites, {info['channels']} channels, "
+             f"{info['frames']} frames at {info['frame_time']:g}s ({info['duration']:.2f}s)" )
@@ -11,8 +11,10 @@ def _vec_to_str(vec):
 
 def _quat_to_str( quat : glm.quat ):
     '''Turns a glm.quat into a string complaint with BVH format.
-        assumes x y z order and degrees'''
-    return _vec_to_str( putils.degrees( putils.quat_to_euler(quat) ) )
+        Eulers from glm compose as z * y * x, so they are written in
+        z y x order to match the Zrotation Yrotation Xrotation channels.'''
+    euler = putils.degrees( putils.quat_to_euler(quat) )
+    return _vec_to_str( ( euler[2], euler[1], euler[0] ) )
 
 def _write_joint( fptr, joint:Joint, rotation:glm.vec3, indent:int=0):
     '''Writes the joint data.  Presently only writes rotation data.'''
@@ -37,9 +39,9 @@ def _write_joint( fptr, joint:Joint, rotation:glm.vec3, indent:int=0):
 
     fptr.write(f'{tabs}OFFSET {_vec_to_str(joint.position)}\n')
     if is_root:
-        fptr.write(f'{tabs}CHANNELS 6 Xposition Yposition Zposition Xrotation Yrotation Zrotation\n')
+        fptr.write(f'{tabs}CHANNELS 6 Xposition Yposition Zposition Zrotation Yrotation Xrotation\n')
     else:
-        fptr.write(f'{tabs}CHANNELS 3 Xrotation Yrotation Zrotation\n')
+        fptr.write(f'{tabs}CHANNELS 3 Zrotation Yrotation Xrotation\n')
 
     if len(joint.children) > 0:
         for child in joint.children:
@@ -78,14 +80,13 @@ def bvh_write( skeleton:Skeleton, filename:str):
         _write_joint( fptr, root, rotation )
         fptr.write('MOTION\n')
 
-        num_frames = skeleton.num_frames
-        if skeleton.has_resting:
-            num_frames = num_frames - 1
-        fptr.write(f'Frames: {num_frames}\n')
-        fptr.write(f'Frame Time: {float(skeleton.frame_rate/1000.0)}\n')
+        #Any resting pose has already been taken out of the frames and is
+        #folded into the rotations below, so every frame is written.
+        fptr.write(f'Frames: {len(root.frames)}\n')
+        fptr.write(f'Frame Time: {skeleton.frame_time}\n')
 
         #Loop through frames
-        for frame_no in range(1,len(root.frames)):
+        for frame_no in range(0,len(root.frames)):
             fptr.write(f'{_vec_to_str(root.frames[frame_no].position)}')
             _recurse_channels(root, frame_no, fptr)
             fptr.write('\n')
@@ -0,0 +1,90 @@
+'''The orbit camera shared by the OpenGL viewer and the headless renderer.'''
+
+import math
+import numpy as np
+
+def _rotation( angle:float, axis:int ) -> np.ndarray:
+    '''4x4 rotation of angle degrees about the x (0) or y (1) axis, as glRotatef'''
+
+    cos = math.cos( math.radians( angle ) )
+    sin = math.sin( math.radians( angle ) )
+    mat = np.identity( 4 )
+    if axis == 0:
+        mat[1:3,1:3] = [ [ cos, -sin ], [ sin, cos ] ]
+    else:
+        mat[0,0], mat[0,2], mat[2,0], mat[2,2] = cos, sin, -sin, cos
+    return mat
+
+def _look_at( eye, center, up ) -> np.ndarray:
+    '''4x4 view matrix, as gluLookAt'''
+
+    eye = np.asarray( eye, dtype=float )
+    forward = np.asarray( center, dtype=float ) - eye
+    forward /= np.linalg.norm( forward )
+    side = np.cross( forward, up )
+    side /= np.linalg.norm( side )
+    upward = np.cross( side, forward )
+
+    mat = np.identity( 4 )
+    mat[0,:3] = side
+    mat[1,:3] = upward
+    mat[2,:3] = -forward
+    mat[:3,3] = -mat[:3,:3] @ eye
+    return mat
+
+def _frustum( left, right, bottom, top, near, far ) -> np.ndarray:
+    '''4x4 perspective projection, as glFrustum'''
+
+    mat = np.zeros( ( 4, 4 ) )
+    mat[0,0] = 2.0 * near / ( right - left )
+    mat[1,1] = 2.0 * near / ( top - bottom )
+    mat[0,2] = ( right + left ) / ( right - left )
+    mat[1,2] = ( top + bottom ) / ( top - bottom )
+    mat[2,2] = -( far + near ) / ( far - near )
+    mat[2,3] = -2.0 * far * near / ( far - near )
+    mat[3,2] = -1.0
+    return mat
+
+class OrbitCamera:
+    '''Orbits the origin at a fixed distance.  The arrow keys in the viewer
+       change rotate_x and rotate_y.'''
+
+    def __init__( self, rotate_y:float=180.0, rotate_x:float=0.0, scale:float=1.0 ):
+        self.rotate_y = rotate_y
+        '''Degrees of orbit around the vertical axis'''
+        self.rotate_x = rotate_x
+        '''Degrees of orbit around the horizontal axis'''
+        self.scale = scale
+        '''Zoom applied to the skeleton'''
+        self.eye = ( 0.0, 0.0, -3.0 )
+        '''Where the camera sits before orbiting'''
+        self.zoom = 2.0
+        '''Scale applied to the projection.  Deals with near clipping plane weirdness.'''
+        self.frustum = ( -1.0, 1.0, -1.0, 1.0, 2.0, 5.0 )
+        '''left, right, bottom, top, near, far.  Boutique config. :('''
+
+    def projection( self ) -> np.ndarray:
+        '''The 4x4 projection matrix'''
+        return np.diag( [ self.zoom, self.zoom, self.zoom, 1.0 ] ) @ _frustum( *self.frustum )
+
+    def modelview( self ) -> np.ndarray:
+        '''The 4x4 camera and orbit matrix'''
+        return _look_at( self.eye, ( 0.0, 0.0, 0.0 ), ( 0.0, 1.0, 0.0 ) ) @ \
+               np.diag( [ self.scale, self.scale, self.scale, 1.0 ] ) @ \
+               _rotation( self.rotate_y, 1 ) @ _rotation( self.rotate_x, 0 )
+
+    def project( self, points:np.ndarray, width:int, height:int ):
+        '''Projects (..., 3) points to pixel coordinates with y down.  Returns
+           (pixels, visible) where visible is False for points behind the eye.'''
+
+        points = np.asarray( points, dtype=float )
+        homogeneous = np.concatenate( ( points, np.ones( points.shape[:-1] + (1,) ) ), axis=-1 )
+        clip = homogeneous @ ( self.projection() @ self.modelview() ).T
+        visible = clip[...,3] > 1e-9
+        w = np.where( visible, clip[...,3], 1.0 )
+        ndc = clip[...,:2] / w[...,None]
+
+        pixels = np.empty( ndc.shape )
+        pixels[...,0] = ( ndc[...,0] + 1.0 ) * 0.5 * width
+        pixels[...,1] = ( 1.0 - ndc[...,1] ) * 0.5 * height
+        return pixels, visible
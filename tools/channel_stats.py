@@ -0,0 +1,204 @@
+'''Per-channel statistics of BVH motion in a single streaming pass.
+
+The motion lines are read a block at a time straight into NumPy arrays,
+without building KeyFrames, and folded into running accumulators.  Means and
+variances are merged block by block with Chan's parallel form of Welford's
+algorithm so they stay stable over very long takes.  Consecutive frame
+differences are tracked to flag jumps, with rotations compared the short way
+round so 179 to -179 is a 2 degree step.'''
+
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List
+import numpy as np
+from tools.bvh import BVH
+from tools.motion import motion_blocks
+
+
+FIELDS = [ 'file', 'joint', 'channel', 'count', 'min', 'max', 'mean', 'variance', 'std',
+           'max_jump', 'max_jump_frame', 'jumps' ]
+'''Columns of a channel row'''
+
+SUMMARY_FIELDS = [ 'file', 'frames', 'header_frames', 'resting', 'channels', 'frame_time',
+                   'jumps', 'worst_channel', 'worst_jump' ]
+'''Columns of a file summary row'''
+
+def channel_labels( bvh:BVH ) -> list:
+    '''(joint alias, channel name) for every motion column of a parsed header,
+       in file order.'''
+
+    labels = []
+    for channels in bvh.channels:
+        columns = [ ( index, f'{axis}rotation' ) for axis, index in channels.rotation.items() ]
+        columns += [ ( index, f'{axis}position' ) for axis, index in channels.position.items() ]
+        columns += [ ( index, f'{axis}scale' ) for axis, index in channels.scale.items() ]
+        labels.extend( ( index, channels.joint.alias, name ) for index, name in columns )
+    return [ ( joint, name ) for _, joint, name in sorted( labels ) ]
+
+class _Moments:
+    '''Running count, min, max, mean and sum of squared deviations per column'''
+
+    def __init__( self, width:int ):
+        self.count = 0
+        self.min = np.full( width, np.inf )
+        self.max = np.full( width, -np.inf )
+        self.mean = np.zeros( width )
+        self.m2 = np.zeros( width )
+
+    def add( self, block:np.ndarray ):
+        '''Merges the statistics of a (rows, width) block'''
+        rows = len(block)
+        if rows == 0:
+            return
+        mean = block.mean( axis=0 )
+        m2 = ( ( block - mean ) ** 2 ).sum( axis=0 )
+        total = self.count + rows
+        delta = mean - self.mean
+        self.mean += delta * ( rows / total )
+        self.m2 += m2 + delta * delta * ( self.count * rows / total )
+        self.count = total
+        np.minimum( self.min, block.min( axis=0 ), out=self.min )
+        np.maximum( self.max, block.max( axis=0 ), out=self.max )
+
+    @property
+    def variance( self ) -> np.ndarray:
+        '''Population variance'''
+        if self.count == 0:
+            return np.full( len(self.m2), np.nan )
+        return self.m2 / self.count
+
+class _Jumps:
+    '''Largest frame to frame step and how many steps exceed a threshold'''
+
+    def __init__( self, thresholds:np.ndarray, wraps:np.ndarray ):
+        self.thresholds = thresholds
+        self.wraps = wraps
+        self.largest = np.zeros( len(thresholds) )
+        self.frame = np.full( len(thresholds), -1 )
+        self.count = np.zeros( len(thresholds), dtype=int )
+
+    def add( self, previous:np.ndarray, block:np.ndarray, first_frame:int ):
+        '''Steps from previous (the row before the block) through the block.
+           first_frame is the frame number of the block's first row.'''
+        if len(block) == 0:
+            return
+        steps = np.diff( block, axis=0, prepend=previous[None,:] )
+        wrapped = ( steps + 180.0 ) % 360.0 - 180.0
+        steps = np.abs( np.where( self.wraps, wrapped, steps ) )
+        worst = steps.argmax( axis=0 )
+        worst_step = steps[ worst, np.arange( steps.shape[1] ) ]
+        better = worst_step > self.largest
+        self.largest[better] = worst_step[better]
+        self.frame[better] = worst[better] + first_frame
+        self.count += ( steps > self.thresholds ).sum( axis=0 )
+
+def channel_stats( filename:str, rotation_jump:float=30.0, position_jump:float=None ) -> dict:
+    '''Streams the motion of one file and returns { 'summary' : dict,
+       'channels' : [ dict per channel ] } keyed by SUMMARY_FIELDS and FIELDS.
+       Steps larger than rotation_jump degrees or position_jump file units
+       count as jumps; None disables the count for that kind of channel.
+       A resting pose line is left out of the statistics.'''
+
+    bvh = BVH()
+    offset = bvh.read_header( filename )
+    labels = channel_labels( bvh )
+    width = len(labels)
+    is_rotation = np.array( [ name.endswith( 'rotation' ) for _, name in labels ] )
+    thresholds = np.where( is_rotation,
+                           np.inf if rotation_jump is None else rotation_jump,
+                           np.inf if position_jump is None else position_jump )
+
+    moments = _Moments( width )
+    jumps = _Jumps( thresholds, is_rotation )
+    first = second = previous = None   #Line 0 is held back in case it's a resting pose.
+    lines = 0
+
+    with open( filename, 'rb' ) as fptr:
+        fptr.seek( offset )
+        for block in motion_blocks( fptr, width ):
+            if len(block) > 0 and first is None:
+                first, block = block[0].copy(), block[1:]
+                lines = 1
+            if len(block) == 0:
+                continue
+            if second is None:
+                second = previous = block[0].copy()
+            moments.add( block )
+            jumps.add( previous, block, lines )
+            previous = block[-1].copy()
+            lines += len(block)
+
+    resting = lines == bvh.skeleton.num_frames + 1
+    if first is not None and not resting:
+        #Line 0 is an ordinary frame after all.
+        moments.add( first[None,:] )
+        if second is not None:
+            jumps.add( first, second[None,:], 1 )
+    elif resting:
+        jumps.frame[ jumps.frame >= 0 ] -= 1
+    return _report( filename, bvh, labels, moments, jumps, lines - resting, resting )
+
+def _report( filename:str, bvh:BVH, labels:list, moments:_Moments, jumps:_Jumps,
+             frames:int, resting:bool ) -> dict:
+    '''Turns the accumulators into plain rows'''
+
+    variance = moments.variance
+    rows = []
+    for i, ( joint, name ) in enumerate( labels ):
+        rows.append( { 'file' : filename, 'joint' : joint, 'channel' : name,
+                       'count' : moments.count,
+                       'min' : float( moments.min[i] ), 'max' : float( moments.max[i] ),
+                       'mean' : float( moments.mean[i] ), 'variance' : float( variance[i] ),
+                       'std' : float( np.sqrt( variance[i] ) ),
+                       'max_jump' : float( jumps.largest[i] ), 'max_jump_frame' : int( jumps.frame[i] ),
+                       'jumps' : int( jumps.count[i] ) } )
+
+    worst = int( jumps.largest.argmax() ) if labels else None
+    summary = { 'file' : filename, 'frames' : frames, 'header_frames' : bvh.skeleton.num_frames,
+                'resting' : resting, 'channels' : len(labels),
+                'frame_time' : bvh.skeleton.frame_time, 'jumps' : int( jumps.count.sum() ),
+                'worst_channel' : None if worst is None else '.'.join( labels[worst] ),
+                'worst_jump' : None if worst is None else float( jumps.largest[worst] ) }
+    return { 'summary' : summary, 'channels' : rows }
+
+def _stats_job( filename:str, **kwargs ) -> dict:
+    '''Pool worker.  Errors are reported rather than aborting the batch.'''
+    try:
+        return channel_stats( filename, **kwargs )
+    except Exception as err:
+        print( f'Failed to read {filename}: {err}' )
+        return None
+
+def library_stats( filenames:List[str], workers:int=None, **kwargs ) -> List[dict]:
+    '''channel_stats for every file across a process pool, skipping failures.
+       Extra keyword arguments are passed to channel_stats.'''
+
+    job = partial( _stats_job, **kwargs )
+    with ProcessPoolExecutor( max_workers=workers ) as pool:
+        return [ result for result in pool.map( job, filenames, chunksize=4 ) if result is not None ]
+
+def write_stats( results:List[dict], output:str, summary:bool=False ):
+    '''Writes channel rows, or one summary row per file, as JSON if output
+       ends in .json and CSV otherwise.  output of None or - is stdout.'''
+
+    if summary:
+        rows, fields = [ result['summary'] for result in results ], SUMMARY_FIELDS
+    else:
+        rows, fields = [ row for result in results for row in result['channels'] ], FIELDS
+
+    to_stdout = output in ( None, '-' )
+    fptr = sys.stdout if to_stdout else open( output, 'w', encoding='utf-8', newline='' )
+    try:
+        if not to_stdout and os.path.splitext( output )[1].lower() == '.json':
+            json.dump( rows, fptr, indent=1 )
+        else:
+            writer = csv.DictWriter( fptr, fieldnames=fields )
+            writer.writeheader()
+            writer.writerows( rows )
+    finally:
+        if not to_stdout:
+            fptr.close()
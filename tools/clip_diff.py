@@ -0,0 +1,187 @@
+'''Frame by frame comparison of two BVH clips.
+
+Both files are read straight into Motion arrays and their joints are paired
+by name.  Rotations are compared as quaternions, so two files that store
+the same pose with different channel orders or equivalent Euler angles
+match, and every error is computed for all paired joints and a chunk of
+frames at once.  Optionally the world positions from forward kinematics are
+compared as well.'''
+
+import csv
+import json
+import os
+import numpy as np
+from tools.motion import Motion
+
+FIELDS = [ 'joint', 'other', 'offset', 'max_rotation', 'mean_rotation', 'rotation_frames',
+           'first_rotation_frame', 'max_position', 'mean_position', 'position_frames',
+           'first_position_frame' ]
+'''Columns of a joint row.  Rotations are in degrees, positions in file
+   units.  position is the world position, or the root translation channel
+   for the root when world positions weren't compared.'''
+
+def pair_joints( names_a:list, names_b:list ) -> tuple:
+    '''Pairs joints by name, then case insensitively for the rest.  Returns
+       [ ( index in a, index in b ) ] in a's order and the names found only
+       in a and only in b.'''
+
+    index_b = { name : i for i, name in enumerate( names_b ) }
+    folded_b = {}
+    for i, name in enumerate( names_b ):
+        folded_b.setdefault( name.upper(), i )
+    pairs, used = [], set()
+    for i, name in enumerate( names_a ):
+        j = index_b.get( name )
+        if j is None or j in used:
+            j = folded_b.get( name.upper() )
+        if j is not None and j not in used:
+            pairs.append( ( i, j ) )
+            used.add( j )
+    paired_a = { i for i, _ in pairs }
+    return ( pairs, [ name for i, name in enumerate( names_a ) if i not in paired_a ],
+             [ name for j, name in enumerate( names_b ) if j not in used ] )
+
+def rotation_errors( quats_a:np.ndarray, quats_b:np.ndarray ) -> np.ndarray:
+    '''Angle in degrees between matching (..., 4) unit quaternions'''
+    dot = np.abs( ( quats_a * quats_b ).sum( axis=-1 ) )
+    return np.degrees( 2.0 * np.arccos( np.minimum( dot, 1.0 ) ) )
+
+class _Errors:
+    '''Running max, sum, count and first frame over a tolerance, per joint'''
+
+    def __init__( self, width:int, tolerance:float ):
+        self.tolerance = tolerance
+        self.max = np.zeros( width )
+        self.sum = np.zeros( width )
+        self.frames = 0
+        self.over = np.zeros( width, dtype=int )
+        self.first = np.full( width, -1 )
+
+    def add( self, errors:np.ndarray, first_frame:int ) -> np.ndarray:
+        '''Folds in (frames, width) errors starting at first_frame.  Returns
+           which of the frames have any error over the tolerance.'''
+        over = errors > self.tolerance
+        np.maximum( self.max, errors.max( axis=0, initial=0.0 ), out=self.max )
+        self.sum += errors.sum( axis=0 )
+        self.frames += len(errors)
+        self.over += over.sum( axis=0 )
+        found = ( self.first < 0 ) & over.any( axis=0 )
+        self.first[found] = over[:,found].argmax( axis=0 ) + first_frame
+        return over.any( axis=1 )
+
+    @property
+    def mean( self ) -> np.ndarray:
+        return self.sum / max( self.frames, 1 )
+
+def diff_motions( motion_a:Motion, motion_b:Motion, rotation_tolerance:float=0.01,
+                  position_tolerance:float=1e-4, world:bool=False, first:int=10,
+                  chunk:int=8192 ) -> dict:
+    '''Compares the paired joints of two motions over their common frames.
+       Returns { 'summary' : dict, 'joints' : [ dict per pair keyed by
+       FIELDS ] }.  The summary lists up to `first` frames where any joint
+       is out of tolerance and says whether the clips are equal, meaning
+       the same joints, frame counts and resting pose, and every offset,
+       rotation and position within tolerance.'''
+
+    pairs, only_a, only_b = pair_joints( motion_a.names, motion_b.names )
+    picks_a = [ i for i, _ in pairs ]
+    picks_b = [ j for _, j in pairs ]
+    frames = min( motion_a.num_frames, motion_b.num_frames )
+    root = [ k for k, ( i, j ) in enumerate( pairs ) if i == 0 and j == 0 ]
+
+    offsets = np.linalg.norm( motion_a.offsets[picks_a] - motion_b.offsets[picks_b], axis=-1 )
+    rotations = _Errors( len(pairs), rotation_tolerance )
+    positions = _Errors( len(pairs), position_tolerance )
+    differing = []
+
+    for start in range( 0, frames, chunk ):
+        stop = min( start + chunk, frames )
+        bad = rotations.add( rotation_errors( motion_a.rotations[start:stop,picks_a],
+                                              motion_b.rotations[start:stop,picks_b] ), start )
+        if world:
+            errors = np.linalg.norm( motion_a.world_positions( start, stop )[:,picks_a] -
+                                     motion_b.world_positions( start, stop )[:,picks_b], axis=-1 )
+        else:
+            errors = np.zeros( ( stop - start, len(pairs) ) )
+            if root:
+                errors[:,root[0]] = np.linalg.norm( motion_a.root_positions[start:stop] -
+                                                    motion_b.root_positions[start:stop], axis=-1 )
+        bad |= positions.add( errors, start )
+        if len(differing) < first:
+            differing.extend( int(frame) + start for frame in np.nonzero( bad )[0][:first - len(differing)] )
+
+    has_position = np.ones( len(pairs), dtype=bool ) if world else np.isin( np.arange( len(pairs) ), root )
+    rows = []
+    for k, ( i, j ) in enumerate( pairs ):
+        rows.append( { 'joint' : motion_a.names[i], 'other' : motion_b.names[j],
+                       'offset' : float( offsets[k] ),
+                       'max_rotation' : float( rotations.max[k] ),
+                       'mean_rotation' : float( rotations.mean[k] ),
+                       'rotation_frames' : int( rotations.over[k] ),
+                       'first_rotation_frame' : int( rotations.first[k] ),
+                       'max_position' : float( positions.max[k] ) if has_position[k] else None,
+                       'mean_position' : float( positions.mean[k] ) if has_position[k] else None,
+                       'position_frames' : int( positions.over[k] ),
+                       'first_position_frame' : int( positions.first[k] ) } )
+
+    equal = ( not only_a and not only_b and motion_a.num_frames == motion_b.num_frames and
+              motion_a.has_resting == motion_b.has_resting and
+              not ( offsets > position_tolerance ).any() and
+              rotations.over.sum() == 0 and positions.over.sum() == 0 )
+    summary = { 'frames_a' : motion_a.num_frames, 'frames_b' : motion_b.num_frames,
+                'compared_frames' : frames, 'joints' : len(pairs),
+                'only_a' : only_a, 'only_b' : only_b,
+                'resting_a' : motion_a.has_resting, 'resting_b' : motion_b.has_resting,
+                'max_offset' : float( offsets.max( initial=0.0 ) ),
+                'max_rotation' : float( rotations.max.max( initial=0.0 ) ),
+                'max_position' : float( positions.max.max( initial=0.0 ) ),
+                'world' : world, 'differing_frames' : differing, 'equal' : bool( equal ) }
+    return { 'summary' : summary, 'joints' : rows }
+
+def diff_clips( file_a:str, file_b:str, **kwargs ) -> dict:
+    '''diff_motions of two files, with the filenames added to the summary.
+       Keyword arguments are passed to diff_motions.'''
+
+    result = diff_motions( Motion.read( file_a )[0], Motion.read( file_b )[0], **kwargs )
+    result['summary'] = { 'file_a' : file_a, 'file_b' : file_b, **result['summary'] }
+    return result
+
+def format_diff( result:dict, all_joints:bool=False ) -> str:
+    '''Readable report listing the joints that differ, or every joint'''
+
+    summary = result['summary']
+    lines = [ f"{summary['file_a']} vs {summary['file_b']}: "
+              f"{'equal' if summary['equal'] else 'different'}",
+              f"  frames {summary['frames_a']} vs {summary['frames_b']}, "
+              f"{summary['joints']} joints compared" ]
+    if summary['resting_a'] != summary['resting_b']:
+        lines.append( f"  resting pose {summary['resting_a']} vs {summary['resting_b']}" )
+    if summary['only_a']:
+        lines.append( f"  only in first: {' '.join( summary['only_a'] )}" )
+    if summary['only_b']:
+        lines.append( f"  only in second: {' '.join( summary['only_b'] )}" )
+    if summary['differing_frames']:
+        lines.append( f"  first differing frames: {' '.join( str(f) for f in summary['differing_frames'] )}" )
+
+    for row in result['joints']:
+        if not all_joints and row['rotation_frames'] == 0 and row['position_frames'] == 0:
+            continue
+        text = ( f"  {row['joint']:<20} rot max {row['max_rotation']:.4f} mean {row['mean_rotation']:.4f} "
+                 f"over {row['rotation_frames']} from {row['first_rotation_frame']}" )
+        if row['max_position'] is not None:
+            text += ( f"  pos max {row['max_position']:.4f} mean {row['mean_position']:.4f} "
+                      f"over {row['position_frames']} from {row['first_position_frame']}" )
+        lines.append( text )
+    return '\n'.join( lines )
+
+def write_diff( result:dict, output:str ):
+    '''Writes the whole result as JSON if output ends in .json, otherwise
+       the joint rows as CSV'''
+
+    with open( output, 'w', encoding='utf-8', newline='' ) as fptr:
+        if os.path.splitext( output )[1].lower() == '.json':
+            json.dump( result, fptr, indent=1 )
+        else:
+            writer = csv.DictWriter( fptr, fieldnames=FIELDS )
+            writer.writeheader()
+            writer.writerows( result['joints'] )
@@ -0,0 +1,436 @@
+'''A local daemon that keeps parsed clips in memory for short-lived tools.
+
+The server parses each file once and copies its keyframes into a
+multiprocessing.shared_memory block.  A client asking for the same file gets
+back the block's name plus a pickled copy of the hierarchy, so a repeat load
+is one round trip and a mapping rather than a parse.  Clips are evicted
+least recently used first once their blocks exceed the memory budget, but a
+block isn't unlinked until every client it was sent to has mapped it.
+
+    python3 bvh.py serve
+    skel = ClipClient().load( 'take.bvh' )
+
+Addresses are a Unix socket path or a (host, port) tuple, as accepted by
+multiprocessing.connection.  The default is a socket in a per-user runtime
+directory and TCP is only accepted on loopback addresses.  Connections are
+authenticated with a random per-user key, see default_authkey, and requests
+are JSON, so the server never unpickles what a client sends.'''
+
+import ipaddress
+import json
+import os
+import pickle
+import secrets
+import socket
+import tempfile
+import threading
+from collections import OrderedDict
+from multiprocessing import AuthenticationError, resource_tracker
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+import glm
+import numpy as np
+from tools.bvh import BVH
+from tools.motion import Motion
+from tools.skeleton import KeyFrame, Skeleton
+
+AUTHKEY_ENV = 'BVH_CLIPS_AUTHKEY'
+'''Environment variable holding a hex authentication key.  Overrides the
+   key file when set.'''
+
+_KINDS = ( ( 'rotation', 4 ), ( 'position', 3 ), ( 'scale', 3 ) )
+'''KeyFrame fields stored in a clip's block and their widths'''
+
+_OWNED = set()
+'''Names of blocks created by servers in this process'''
+
+def runtime_dir() -> str:
+    '''A directory only this user can use: bvh-tools under $XDG_RUNTIME_DIR,
+       or bvh-tools-<uid> in the temporary directory.  Created with mode
+       0700 and refused if someone else owns it or can get into it.'''
+
+    base = os.environ.get( 'XDG_RUNTIME_DIR' )
+    path = os.path.join( base, 'bvh-tools' ) if base else \
+           os.path.join( tempfile.gettempdir(), f'bvh-tools-{os.getuid()}' )
+    os.makedirs( path, mode=0o700, exist_ok=True )
+    info = os.lstat( path )
+    if info.st_uid != os.getuid() or info.st_mode & 0o077 or not os.path.isdir( path ) \
+       or os.path.islink( path ):
+        raise Exception( f'{path} must be a directory owned by this user with mode 0700' )
+    return path
+
+def default_address() -> str:
+    '''The socket the server listens on when no address is given'''
+    return os.path.join( runtime_dir(), 'clips.sock' )
+
+def default_authkey() -> bytes:
+    '''The key from $BVH_CLIPS_AUTHKEY if set, otherwise from an authkey
+       file in runtime_dir, made with 32 random bytes and mode 0600 the
+       first time.'''
+
+    key = os.environ.get( AUTHKEY_ENV )
+    if key:
+        return bytes.fromhex( key )
+    path = os.path.join( runtime_dir(), 'authkey' )
+    try:
+        fd = os.open( path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600 )
+    except FileExistsError:
+        info = os.stat( path )
+        if info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise Exception( f'{path} must be owned by this user with mode 0600' )
+        with open( path, encoding='ascii' ) as fptr:
+            return bytes.fromhex( fptr.read().strip() )
+    with os.fdopen( fd, 'w', encoding='ascii' ) as fptr:
+        key = secrets.token_hex( 32 )
+        fptr.write( key )
+    return bytes.fromhex( key )
+
+def check_address( address ):
+    '''Raises unless address is a socket path or a loopback (host, port)'''
+    if isinstance( address, str ):
+        return
+    host = address[0]
+    if not all( ipaddress.ip_address( info[4][0] ).is_loopback
+                for info in socket.getaddrinfo( host, address[1], type=socket.SOCK_STREAM ) ):
+        raise Exception( f'Refusing to serve clips on {host}, only loopback addresses are allowed' )
+
+def _keyframe_arrays( joints:list, num_frames:int ) -> dict:
+    '''(frames, joints, width) arrays of every KeyFrame field some joint uses,
+       plus a (joints,) mask of which joints have it.'''
+
+    arrays = {}
+    for kind, width in _KINDS:
+        present = np.array( [ len(joint.frames) > 0 and getattr( joint.frames[0], kind ) is not None
+                              for joint in joints ], dtype=bool )
+        if not present.any():
+            continue
+        values = np.zeros( ( num_frames, len(joints), width ) )
+        for i in np.nonzero( present )[0]:
+            if kind == 'rotation':
+                values[:,i] = [ ( key.rotation.w, key.rotation.x, key.rotation.y, key.rotation.z )
+                                for key in joints[i].frames ]
+            else:
+                values[:,i] = [ tuple( getattr( key, kind ) ) for key in joints[i].frames ]
+        arrays[kind] = ( values, present )
+    return arrays
+
+class _Entry:
+    '''A cached clip: its shared block and what a client needs to map it.'''
+
+    def __init__( self, skeleton:Skeleton ):
+        joints = skeleton.ordered_joints()
+        num_frames = len( joints[0].frames )
+        arrays = _keyframe_arrays( joints, num_frames )
+
+        size = max( 1, sum( values.nbytes for values, _ in arrays.values() ) )
+        self.shm = SharedMemory( create=True, size=size )
+        '''Owned by the server and unlinked on eviction'''
+        _OWNED.add( self.shm.name )
+        self.layout = {}
+        '''kind : ( byte offset, shape, joint mask )'''
+        offset = 0
+        for kind, ( values, present ) in arrays.items():
+            view = np.ndarray( values.shape, dtype=float, buffer=self.shm.buf, offset=offset )
+            view[:] = values
+            self.layout[kind] = ( offset, values.shape, present )
+            offset += values.nbytes
+
+        #Ship the hierarchy without its keyframes, they live in the block.
+        saved = [ joint.frames for joint in joints ]
+        for joint in joints:
+            joint.frames = []
+        self.skeleton = pickle.dumps( skeleton )
+        for joint, frames in zip( joints, saved ):
+            joint.frames = frames
+        self.pending = 0
+        '''Replies sent for this block that the client hasn't acknowledged'''
+
+    @property
+    def nbytes( self ) -> int:
+        return self.shm.size
+
+    def reply( self ) -> dict:
+        return { 'ok' : True, 'shm' : self.shm.name, 'layout' : self.layout,
+                 'skeleton' : self.skeleton }
+
+    def release( self ):
+        _OWNED.discard( self.shm.name )
+        self.shm.close()
+        self.shm.unlink()
+
+class ClipServer:
+    '''Serves parsed clips from an LRU cache of shared memory blocks.
+       budget is the most bytes of keyframe data kept at once.  The most
+       recently loaded clip is always kept even if it alone is over budget.
+       address and authkey default to default_address and default_authkey.'''
+
+    def __init__( self, address=None, budget:int=512 * 1024 * 1024, authkey:bytes=None ):
+        if address is None:
+            address = default_address()
+        check_address( address )
+        if authkey is None:
+            authkey = default_authkey()
+        self.listener = Listener( address, authkey=authkey )
+        self._authkey = authkey
+        self.address = self.listener.address
+        '''Where clients connect.  Useful when port 0 was asked for.'''
+        self.budget = budget
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._retired = {}
+        self._lock = threading.Lock()
+        self._running = False
+
+    @staticmethod
+    def _key( filename:str, max_depth:int ) -> tuple:
+        '''Identifies a version of a file so edits on disk aren't served stale'''
+        stat = os.stat( filename )
+        return ( os.path.realpath( filename ), stat.st_mtime_ns, stat.st_size, max_depth )
+
+    def _load( self, filename:str, max_depth:int=None ) -> _Entry:
+        '''The entry for a file with a lease taken on it for the reply'''
+
+        key = self._key( filename, max_depth )
+        with self._lock:
+            entry = self._cache.get( key )
+            if entry is not None:
+                self._cache.move_to_end( key )
+                self.hits += 1
+                entry.pending += 1
+                return entry
+
+        #Parse outside the lock so other clients aren't held up.
+        entry = _Entry( BVH( filename, max_depth ).skeleton )
+        with self._lock:
+            if key in self._cache:
+                entry.release()
+                entry = self._cache[key]
+                self._cache.move_to_end( key )
+            else:
+                self.misses += 1
+                self._cache[key] = entry
+            entry.pending += 1
+            self._evict()
+            return entry
+
+    def _evict( self ):
+        '''Drops least recently used clips until the cache fits the budget.
+           Clients that already mapped a block keep their mapping, blocks
+           still waiting to be mapped are retired until they have been.'''
+        while len(self._cache) > 1 and self.cached_bytes > self.budget:
+            _, entry = self._cache.popitem( last=False )
+            if entry.pending > 0:
+                self._retired[entry.shm.name] = entry
+            else:
+                entry.release()
+
+    def _attached( self, entry:_Entry ):
+        '''Ends a lease, unlinking the block if it was waiting on it'''
+        with self._lock:
+            entry.pending -= 1
+            if entry.pending == 0 and self._retired.get( entry.shm.name ) is entry:
+                del self._retired[entry.shm.name]
+                entry.release()
+
+    @property
+    def cached_bytes( self ) -> int:
+        return sum( entry.nbytes for entry in self._cache.values() )
+
+    def stats( self ) -> dict:
+        '''Cache counters'''
+        with self._lock:
+            return { 'ok' : True, 'clips' : len(self._cache), 'bytes' : self.cached_bytes,
+                     'budget' : self.budget, 'hits' : self.hits, 'misses' : self.misses }
+
+    def _handle( self, request:dict, leases:dict ) -> dict:
+        '''Answers one request.  leases are the connection's unacknowledged
+           blocks by name.'''
+        try:
+            if request['op'] == 'load':
+                entry = self._load( request['filename'], request.get( 'max_depth' ) )
+                leases.setdefault( entry.shm.name, [] ).append( entry )
+                return entry.reply()
+            if request['op'] == 'attached':
+                held = leases.get( request['shm'] )
+                if not held:
+                    raise Exception( f'No block {request["shm"]} is waiting to be attached' )
+                self._attached( held.pop() )
+                return { 'ok' : True }
+            if request['op'] == 'stats':
+                return self.stats()
+            if request['op'] == 'shutdown':
+                self._running = False
+                return { 'ok' : True }
+            raise Exception( f'Unknown request {request["op"]}' )
+        except Exception as err:
+            return { 'ok' : False, 'error' : f'{type(err).__name__}: {err}' }
+
+    def _serve_connection( self, conn ):
+        '''One thread per client, answering requests until it hangs up.
+           Leases the client never acknowledged end with the connection.'''
+        leases = {}
+        with conn:
+            try:
+                while True:
+                    try:
+                        request = json.loads( conn.recv_bytes( 1 << 16 ) )
+                    except ( EOFError, OSError ):
+                        return
+                    except ValueError as err:
+                        conn.send( { 'ok' : False, 'error' : f'Bad request: {err}' } )
+                        continue
+                    if not isinstance( request, dict ):
+                        conn.send( { 'ok' : False, 'error' : 'Bad request: expected an object' } )
+                        continue
+                    conn.send( self._handle( request, leases ) )
+                    if not self._running:
+                        #Wake the accept loop so it notices the shutdown.
+                        try:
+                            Client( self.address, authkey=self._authkey ).close()
+                        except OSError:
+                            pass
+                        return
+            finally:
+                for held in leases.values():
+                    for entry in held:
+                        self._attached( entry )
+
+    def serve_forever( self ):
+        '''Accepts clients until a shutdown request arrives, then releases
+           every block.'''
+        self._running = True
+        try:
+            while self._running:
+                try:
+                    conn = self.listener.accept()
+                except ( OSError, AuthenticationError, EOFError ):
+                    #A client without the key, or one that hung up early.
+                    continue
+                threading.Thread( target=self._serve_connection, args=( conn, ), daemon=True ).start()
+        finally:
+            self.close()
+
+    def close( self ):
+        '''Stops listening and unlinks all shared memory'''
+        self.listener.close()
+        with self._lock:
+            while self._cache:
+                self._cache.popitem()[1].release()
+            while self._retired:
+                self._retired.popitem()[1].release()
+
+def _attach( name:str ) -> SharedMemory:
+    '''Maps a server owned block without letting this process's resource
+       tracker unlink it at exit.'''
+    try:
+        return SharedMemory( name, track=False )
+    except TypeError:   #Before Python 3.13 there is no track argument.
+        shm = SharedMemory( name )
+        if name not in _OWNED:      #The tracker is per process, leave the server's entry.
+            resource_tracker.unregister( shm._name, 'shared_memory' )
+        return shm
+
+class SharedFrames:
+    '''A read-only sequence of KeyFrames for one joint, built on demand from
+       the shared arrays.  Stands in for Joint.frames on served skeletons.'''
+
+    def __init__( self, arrays:dict, joint:int, num_frames:int ):
+        self._arrays = { kind : values[:,joint] for kind, values in arrays.items() }
+        self._num_frames = num_frames
+
+    def __len__( self ) -> int:
+        return self._num_frames
+
+    def _frame( self, index:int ) -> KeyFrame:
+        key = KeyFrame()
+        for kind, values in self._arrays.items():
+            if kind == 'rotation':
+                key.rotation = glm.quat( *values[index] )
+            else:
+                setattr( key, kind, values[index].tolist() )
+        return key
+
+    def __getitem__( self, index ):
+        if isinstance( index, slice ):
+            return [ self._frame( i ) for i in range( *index.indices( self._num_frames ) ) ]
+        if index < 0:
+            index += self._num_frames
+        if not 0 <= index < self._num_frames:
+            raise IndexError( 'frame index out of range' )
+        return self._frame( index )
+
+    def __iter__( self ):
+        return ( self._frame( i ) for i in range( self._num_frames ) )
+
+class ClipClient:
+    '''A connection to a ClipServer.  Served skeletons are ordinary Skeleton
+       objects whose joints' frames are SharedFrames, plus a `motion`
+       attribute holding a Motion over the shared arrays.'''
+
+    def __init__( self, address=None, authkey:bytes=None ):
+        self.conn = Client( default_address() if address is None else address,
+                            authkey=default_authkey() if authkey is None else authkey )
+
+    def _request( self, **request ) -> dict:
+        self.conn.send_bytes( json.dumps( request ).encode( 'utf-8' ) )
+        reply = self.conn.recv()
+        if not reply['ok']:
+            raise Exception( reply['error'] )
+        return reply
+
+    def load( self, filename:str, max_depth:int=None ) -> Skeleton:
+        '''Gets a clip from the server, parsing it there if it isn't cached.'''
+
+        reply = self._request( op='load', filename=os.path.abspath( filename ), max_depth=max_depth )
+        try:
+            skeleton = pickle.loads( reply['skeleton'] )
+            shm = _attach( reply['shm'] )
+        finally:
+            #Once mapped the block may be unlinked, the mapping stays valid.
+            self._request( op='attached', shm=reply['shm'] )
+        skeleton.shared_memory = shm     #Keeps the mapping alive with the skeleton.
+
+        arrays = {}
+        for kind, ( offset, shape, _ ) in reply['layout'].items():
+            values = np.ndarray( shape, dtype=float, buffer=shm.buf, offset=offset )
+            values.flags.writeable = False
+            arrays[kind] = values
+
+        joints = skeleton.ordered_joints()
+        num_frames = next( iter( arrays.values() ) ).shape[0] if arrays else 0
+        for i, joint in enumerate( joints ):
+            joint.frames = SharedFrames( { kind : arrays[kind] for kind, ( _, _, present )
+                                           in reply['layout'].items() if present[i] },
+                                         i, num_frames )
+
+        index = { id(joint) : i for i, joint in enumerate( joints ) }
+        rotations = arrays.get( 'rotation' )
+        if rotations is None:
+            rotations = np.zeros( ( num_frames, len(joints), 4 ) )
+            rotations[...,0] = 1.0
+        positions = arrays['position'][:,0] if 'position' in arrays else np.zeros( ( num_frames, 3 ) )
+        skeleton.motion = Motion( [ joint.alias for joint in joints ],
+                                  [ index[id(joint.parent)] if joint.parent is not None else -1
+                                    for joint in joints ],
+                                  [ tuple(joint.position) for joint in joints ],
+                                  rotations, positions, skeleton.has_resting )
+        return skeleton
+
+    def stats( self ) -> dict:
+        '''The server's cache counters'''
+        return self._request( op='stats' )
+
+    def shutdown( self ):
+        '''Asks the server to stop'''
+        self._request( op='shutdown' )
+
+    def close( self ):
+        self.conn.close()
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc ):
+        self.close()
+        return False
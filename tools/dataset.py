@@ -0,0 +1,192 @@
+'''Fixed length windows of frames over a clip library, for training.
+
+Each clip's Motion arrays are turned into a strided view of every window
+once, so a window is an index into that view and nothing is copied until a
+batch is stacked.  Clips can be cached as .npy files and memory mapped, in
+which case windows are views straight onto the page cache and a worker
+only touches the pages of the windows it reads.  The window order is
+shuffled across clips with a seed per epoch and split between workers by
+taking every n-th window, so workers never overlap.'''
+
+import hashlib
+import json
+import os
+from typing import List
+import numpy as np
+from tools.extents import Extents, compute_extents
+from tools.motion import Motion
+
+def sliding_windows( array:np.ndarray, window:int, stride:int=1 ) -> np.ndarray:
+    '''Read only (windows, window, ...) view of every window of a frame
+       major array, starting every stride frames.  Nothing is copied.'''
+
+    if window < 1 or stride < 1:
+        raise Exception( f'Window {window} and stride {stride} must both be at least 1' )
+    count = max( 0, ( len(array) - window ) // stride + 1 )
+    return np.lib.stride_tricks.as_strided(
+        array, shape=( count, window ) + array.shape[1:],
+        strides=( array.strides[0] * stride, ) + array.strides, writeable=False )
+
+def save_motion( motion:Motion, prefix:str, up:int=1 ):
+    '''Writes a Motion as prefix.rotations.npy, prefix.root_positions.npy and
+       a prefix.json of the hierarchy, ready for load_motion.  The clip's
+       Extents go in the .json, with the per frame bounds in
+       prefix.bounds.npy, ready for load_extents.'''
+
+    extents = compute_extents( motion, up )
+    np.save( prefix + '.rotations.npy', motion.rotations )
+    np.save( prefix + '.root_positions.npy', motion.root_positions )
+    np.save( prefix + '.bounds.npy', extents.frame_bounds )
+    with open( prefix + '.json', 'w', encoding='utf-8' ) as fptr:
+        json.dump( { 'names' : motion.names, 'parents' : motion.parents.tolist(),
+                     'offsets' : motion.offsets.tolist(), 'has_resting' : motion.has_resting,
+                     'extents' : extents.to_dict() }, fptr )
+
+def load_motion( prefix:str, mmap:bool=True ) -> Motion:
+    '''Reads a Motion written by save_motion.  With mmap the frame arrays are
+       read only memory maps rather than loaded.'''
+
+    with open( prefix + '.json', encoding='utf-8' ) as fptr:
+        meta = json.load( fptr )
+    mode = 'r' if mmap else None
+    return Motion( meta['names'], meta['parents'], meta['offsets'],
+                   np.load( prefix + '.rotations.npy', mmap_mode=mode ),
+                   np.load( prefix + '.root_positions.npy', mmap_mode=mode ),
+                   meta['has_resting'] )
+
+def load_extents( prefix:str, frames:bool=False, mmap:bool=True ) -> Extents:
+    '''Reads the Extents saved by save_motion without posing a frame.  Only
+       the .json is read unless frames asks for the per frame bounds too.'''
+
+    with open( prefix + '.json', encoding='utf-8' ) as fptr:
+        meta = json.load( fptr )
+    if 'extents' not in meta:
+        raise Exception( f'No extents saved with {prefix}' )
+    if 'unit_scale' not in meta['extents']:
+        #Caches from before the unit scale was saved get it from the rig.
+        meta['extents']['unit_scale'] = load_motion( prefix ).unit_scale
+    frame_bounds = np.load( prefix + '.bounds.npy', mmap_mode='r' if mmap else None ) if frames else None
+    return Extents.from_dict( meta['extents'], frame_bounds )
+
+def cache_clip( filename:str, cache_dir:str ) -> str:
+    '''Saves a clip's Motion under cache_dir unless an up to date copy is
+       already there.  Returns the prefix to pass to load_motion.'''
+
+    path = os.path.realpath( filename )
+    name = os.path.splitext( os.path.basename( path ) )[0]
+    prefix = os.path.join( cache_dir, f'{name}-{hashlib.sha1( path.encode() ).hexdigest()[:12]}' )
+    #Caches from before extents were saved have no bounds and are redone.
+    if not os.path.exists( prefix + '.json' ) or not os.path.exists( prefix + '.bounds.npy' ) or \
+       os.path.getmtime( prefix + '.json' ) < os.path.getmtime( path ):
+        os.makedirs( cache_dir, exist_ok=True )
+        save_motion( Motion.read( path )[0], prefix )
+    return prefix
+
+class Window:
+    '''One window of a clip.  rotations and root_positions are views into
+       the clip's arrays, the normalized root is worked out on first use.'''
+
+    def __init__( self, clip:int, start:int, rotations:np.ndarray, root_positions:np.ndarray,
+                  up:int=1 ):
+        self.clip = clip
+        '''Index of the clip in the dataset'''
+        self.start = start
+        '''First frame of the window in its clip'''
+        self.rotations = rotations
+        '''(window, joints, 4) local rotations, a read only view'''
+        self.root_positions = root_positions
+        '''(window, 3) root translation channel, a read only view'''
+        self.up = up
+        self._normalized = None
+
+    @property
+    def normalized_root_positions( self ) -> np.ndarray:
+        '''(window, 3) root translation relative to the first frame on the
+           ground plane, keeping the height along the up axis'''
+        if self._normalized is None:
+            origin = self.root_positions[0].copy()
+            origin[self.up] = 0.0
+            self._normalized = self.root_positions - origin
+        return self._normalized
+
+class WindowDataset:
+    '''Every window of `window` frames, starting every `stride` frames, of a
+       list of motions.  Indexing gives a Window; iterating an epoch gives
+       this shard's windows in a shuffled order.'''
+
+    def __init__( self, motions:List[Motion], window:int=64, stride:int=8, seed:int=0,
+                  shard:int=0, num_shards:int=1, up:int=1 ):
+        if not 0 <= shard < num_shards:
+            raise Exception( f'Shard {shard} is not in 0 to {num_shards - 1}' )
+        if window < 1:
+            raise Exception( f'Window of {window} frames, it must be at least 1' )
+        if stride < 1:
+            raise Exception( f'Stride of {stride} frames, it must be at least 1' )
+        self.motions = list(motions)
+        self.window = window
+        self.stride = stride
+        self.seed = seed
+        self.shard = shard
+        self.num_shards = num_shards
+        self.up = up
+
+        self._rotations = [ sliding_windows( motion.rotations, window, stride ) for motion in self.motions ]
+        self._roots = [ sliding_windows( motion.root_positions, window, stride ) for motion in self.motions ]
+        counts = [ len(windows) for windows in self._rotations ]
+        self.clip_ids = np.repeat( np.arange( len(counts), dtype=np.int32 ), counts )
+        '''(windows,) clip of each window'''
+        self.offsets = np.concatenate( [ np.zeros( 1, dtype=np.int64 ), np.cumsum( counts ) ] )
+        '''(clips + 1,) windows of clip i are offsets[i]:offsets[i+1]'''
+
+    @classmethod
+    def from_files( cls, filenames:List[str], cache_dir:str=None, **kwargs ):
+        '''Dataset of BVH files.  With a cache_dir the clips are converted once
+           and memory mapped, otherwise they are read into memory.  Keyword
+           arguments are passed to the constructor.'''
+
+        if cache_dir is None:
+            motions = [ Motion.read( filename )[0] for filename in filenames ]
+        else:
+            motions = [ load_motion( cache_clip( filename, cache_dir ) ) for filename in filenames ]
+        return cls( motions, **kwargs )
+
+    def __len__( self ) -> int:
+        '''Windows in the whole dataset, across every shard'''
+        return len(self.clip_ids)
+
+    def __getitem__( self, index:int ) -> Window:
+        clip = int( self.clip_ids[index] )
+        row = int( index - self.offsets[clip] )
+        return Window( clip, row * self.stride, self._rotations[clip][row],
+                       self._roots[clip][row], self.up )
+
+    def order( self, epoch:int=0, shuffle:bool=True ) -> np.ndarray:
+        '''This shard's window indices for an epoch.  Every shard shuffles
+           with the same seed and takes every num_shards-th index, so the
+           shards of an epoch cover the dataset without overlapping.'''
+
+        indices = np.arange( len(self) )
+        if shuffle:
+            indices = np.random.default_rng( ( self.seed, epoch ) ).permutation( indices )
+        return indices[self.shard::self.num_shards]
+
+    def epoch( self, epoch:int=0, shuffle:bool=True ):
+        '''Yields this shard's Windows in order( epoch, shuffle )'''
+        for index in self.order( epoch, shuffle ):
+            yield self[index]
+
+    def __iter__( self ):
+        return self.epoch( 0, shuffle=False )
+
+    def batches( self, batch_size:int, epoch:int=0, shuffle:bool=True, normalize:bool=True ):
+        '''Yields ( rotations, root_positions ) arrays of shape (batch, window,
+           joints, 4) and (batch, window, 3), stacking this shard's windows.
+           This is the only copy.  Root positions are normalized unless told
+           otherwise.  The last batch may be short.'''
+
+        order = self.order( epoch, shuffle )
+        for first in range( 0, len(order), batch_size ):
+            windows = [ self[index] for index in order[first:first+batch_size] ]
+            roots = [ window.normalized_root_positions if normalize else window.root_positions
+                      for window in windows ]
+            yield np.stack( [ window.rotations for window in windows ] ), np.stack( roots )
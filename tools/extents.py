@@ -0,0 +1,103 @@
+'''How far a clip actually moves, worked out once from its world positions.
+
+Skeleton.set_unit_scale_factor only measures the rest offsets.  Framing a
+camera, sizing thumbnails or picking clips by how far they travel needs the
+animated extent: the bounding box of every frame and of the whole clip, the
+distance the root covers and how far each joint reaches from the root.  They
+are in the skeleton's units, with the rig's unit scale kept alongside so
+travel can also be compared in skeleton sizes.
+compute_extents gets all of them from one pass of forward kinematics, a
+chunk of frames at a time.  The result is small enough to keep with a
+clip's cached arrays, see dataset.save_motion and dataset.load_extents.'''
+
+import numpy as np
+from tools.motion import Motion
+
+class Extents:
+    '''The animated extent of a clip in the skeleton's units'''
+
+    def __init__( self, frame_bounds:np.ndarray, reach:np.ndarray, root_travel:float,
+                  ground_travel:float, root_displacement, up:int=1, bounds=None,
+                  unit_scale:float=1.0 ):
+        self.frame_bounds = frame_bounds
+        '''(frames, 2, 3) minimum and maximum joint world positions of each
+           frame.  None when only the summary was loaded.'''
+        self.reach = np.asarray( reach, dtype=float )
+        '''(joints,) furthest each joint gets from the root over the clip'''
+        self.root_travel = float( root_travel )
+        '''Length of the root's path'''
+        self.ground_travel = float( ground_travel )
+        '''Length of the root's path projected onto the ground plane'''
+        self.root_displacement = np.asarray( root_displacement, dtype=float )
+        '''(3,) root position of the last frame less the first'''
+        self.up = up
+        '''Vertical axis the ground plane is normal to'''
+        self.unit_scale = float( unit_scale )
+        '''Motion.unit_scale of the rig, the skeleton size in its units'''
+        if bounds is None:
+            bounds = np.zeros( ( 2, 3 ) ) if len(frame_bounds) == 0 else \
+                     np.stack( ( frame_bounds[:,0].min( axis=0 ), frame_bounds[:,1].max( axis=0 ) ) )
+        self.bounds = np.asarray( bounds, dtype=float )
+        '''(2, 3) minimum and maximum over the whole clip, zeros for no frames'''
+
+    @property
+    def size( self ) -> np.ndarray:
+        '''(3,) width, height and depth of the clip's bounds'''
+        return self.bounds[1] - self.bounds[0]
+
+    @property
+    def unit_root_travel( self ) -> float:
+        '''root_travel in skeleton sizes, comparable across rigs in different
+           units'''
+        return self.root_travel / self.unit_scale
+
+    @property
+    def unit_ground_travel( self ) -> float:
+        '''ground_travel in skeleton sizes'''
+        return self.ground_travel / self.unit_scale
+
+    @property
+    def fit_scale( self ) -> float:
+        '''Radius around the root that every joint stays within.  Dividing
+           root relative positions by it keeps the whole clip inside the
+           unit sphere, which is how the viewer and raster frame a pose.'''
+        return float( self.reach.max() ) if len(self.reach) and self.reach.max() > 0.0 else 1.0
+
+    def to_dict( self ) -> dict:
+        '''Everything but the frame bounds, as JSON friendly lists'''
+        return { 'bounds' : self.bounds.tolist(), 'reach' : self.reach.tolist(),
+                 'root_travel' : self.root_travel, 'ground_travel' : self.ground_travel,
+                 'root_displacement' : self.root_displacement.tolist(), 'up' : self.up,
+                 'unit_scale' : self.unit_scale }
+
+    @classmethod
+    def from_dict( cls, values:dict, frame_bounds:np.ndarray=None ):
+        '''Extents from to_dict's result and optionally the frame bounds'''
+        return cls( frame_bounds, values['reach'], values['root_travel'], values['ground_travel'],
+                    values['root_displacement'], values['up'], values['bounds'],
+                    values['unit_scale'] )
+
+def compute_extents( motion:Motion, up:int=1, chunk:int=8192 ) -> Extents:
+    '''The Extents of a motion from world_positions, chunk frames at a time
+       so long takes don't need every position in memory at once.'''
+
+    num_frames = motion.num_frames
+    frame_bounds = np.empty( ( num_frames, 2, 3 ) )
+    roots = np.empty( ( num_frames, 3 ) )
+    reach = np.zeros( motion.num_joints )
+    for start in range( 0, num_frames, chunk ):
+        positions = motion.world_positions( start, start + chunk )
+        stop = start + len(positions)
+        frame_bounds[start:stop,0] = positions.min( axis=1 )
+        frame_bounds[start:stop,1] = positions.max( axis=1 )
+        roots[start:stop] = positions[:,0]
+        distances = np.linalg.norm( positions - positions[:,:1], axis=-1 )
+        np.maximum( reach, distances.max( axis=0 ), out=reach )
+
+    steps = np.diff( roots, axis=0 )
+    root_travel = np.linalg.norm( steps, axis=-1 ).sum()
+    steps[:,up] = 0.0
+    ground_travel = np.linalg.norm( steps, axis=-1 ).sum()
+    displacement = roots[-1] - roots[0] if num_frames else np.zeros( 3 )
+    return Extents( frame_bounds, reach, root_travel, ground_travel, displacement, up,
+                    unit_scale=motion.unit_scale )
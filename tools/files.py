@@ -0,0 +1,31 @@
+'''Finding BVH files for the batch tools.'''
+
+import os
+from typing import List
+
+def find_bvh_files( paths:List[str] ) -> List[str]:
+    '''Expands directories into the .bvh files they contain.'''
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, names in os.walk(path):
+                found.extend( os.path.join(folder, name) for name in sorted(names)
+                              if name.lower().endswith('.bvh') )
+        else:
+            found.append(path)
+    return found
+
+def output_paths( filenames:List[str], out_dir:str, ending:str ) -> List[str]:
+    '''Where each file of a batch is written in out_dir: its path relative to
+       the folder all of them share, with the extension replaced by ending,
+       so files with the same name in different folders don't overwrite each
+       other.  The folders needed are created.'''
+
+    if len(filenames) == 0:
+        return []
+    stems = [ os.path.splitext( os.path.abspath(name) )[0] for name in filenames ]
+    root = os.path.commonpath( [ os.path.dirname(stem) for stem in stems ] )
+    outputs = [ os.path.join( out_dir, os.path.relpath( stem, root ) + ending ) for stem in stems ]
+    for folder in sorted( set( os.path.dirname(output) for output in outputs ) ):
+        os.makedirs( folder, exist_ok=True )
+    return outputs
@@ -0,0 +1,211 @@
+'''Following a BVH file while it is still being written.
+
+A capture stage appends motion lines as it records, so the Frames: count in
+the header is stale and the last line may be half written.  MotionFollower
+parses the hierarchy as soon as the header is complete, then each poll
+reads only the bytes appended since the last one, parses the complete lines
+with NumPy and keeps any partial line for next time.  New frames are handed
+to subscribers as (first frame, values) blocks, either from explicit polls
+or from a background thread.'''
+
+import os
+import threading
+import time
+from typing import Callable
+import numpy as np
+from tools.bvh import BVH
+from tools.motion import Motion
+
+class MotionFollower:
+    '''Tails a BVH file, accumulating its motion lines as a (lines, channels)
+       array.  Blank lines are skipped rather than ending the motion, since
+       a writer may flush one before the next frame arrives.'''
+
+    def __init__( self, filename:str, interval:float=0.01 ):
+        self.filename = filename
+        self.interval = interval
+        '''Seconds between polls when following in the background'''
+        self.bvh = None
+        '''The header-only BVH once the header has been written'''
+        self.width = 0
+        '''Values per motion line'''
+        self._values = np.empty( ( 0, 0 ) )
+        self._count = 0
+        self._offset = 0
+        self._tail = b''
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def ready( self ) -> bool:
+        '''True once the header has been parsed'''
+        return self.bvh is not None
+
+    @property
+    def skeleton( self ):
+        '''The header's skeleton, with num_frames kept at the lines read so
+           far.  None until ready.'''
+        return None if self.bvh is None else self.bvh.skeleton
+
+    @property
+    def num_frames( self ) -> int:
+        '''Motion lines read so far'''
+        return self._count
+
+    @property
+    def values( self ) -> np.ndarray:
+        '''(lines, channels) motion values read so far.  A view that later
+           polls may replace but never change.'''
+        return self._values[:self._count]
+
+    def subscribe( self, callback:Callable ):
+        '''callback( first_frame, values ) is called with each block of new
+           lines, from whichever thread polls.'''
+        self._subscribers.append( callback )
+
+    def _read_header( self ) -> bool:
+        '''Parses the header once the Frame Time: line is complete'''
+
+        with open( self.filename, 'rb' ) as fptr:
+            header = BVH.read_header_bytes( fptr )
+            offset = fptr.tell()
+        if not header.endswith( b'\n' ) or b'MOTION' not in header.upper() or \
+           len(header.splitlines()) < 3:
+            return False
+        lines = header.splitlines()
+        if not lines[-1].strip().upper().startswith( b'FRAME TIME' ):
+            return False
+
+        bvh = BVH()
+        bvh.read_header( self.filename )
+        bvh.skeleton.fix_end_positions()
+        bvh.skeleton.init_world_positions()
+        self.width = sum( len(chan.rotation) + len(chan.position) + len(chan.scale)
+                          for chan in bvh.channels )
+        self._values = np.empty( ( 1024, self.width ) )
+        self._offset = offset
+        self.bvh = bvh
+        return True
+
+    def _append( self, block:np.ndarray ):
+        '''Adds lines to the values, doubling the storage as needed'''
+        needed = self._count + len(block)
+        if needed > len(self._values):
+            grown = np.empty( ( max( needed, 2 * len(self._values) ), self.width ) )
+            grown[:self._count] = self._values[:self._count]
+            self._values = grown
+        self._values[self._count:needed] = block
+        self._count = needed
+
+    def _parse( self, text:bytes, start:int ) -> np.ndarray:
+        '''(lines, channels) values of the non-blank lines in text, which
+           begins at byte start of the file.  Raises naming the byte and
+           frame of the first line without exactly width numbers.'''
+
+        rows = []
+        starts = []
+        position = start
+        for line in text.splitlines( keepends=True ):
+            fields = line.split()
+            if fields:
+                if len(fields) != self.width:
+                    raise Exception( f'{self.filename} byte {position} (frame {self._count + len(rows)}): '
+                                     f'{len(fields)} values on a {self.width} channel motion line' )
+                rows.append( fields )
+                starts.append( position )
+            position += len(line)
+        if not rows:
+            return np.empty( ( 0, self.width ) )
+        try:
+            return np.array( rows, dtype=float )
+        except ValueError:
+            for index, fields in enumerate( rows ):
+                try:
+                    np.array( fields, dtype=float )
+                except ValueError as error:
+                    raise Exception( f'{self.filename} byte {starts[index]} (frame {self._count + index}): '
+                                     f'{error}' ) from None
+            raise
+
+    def poll( self ) -> int:
+        '''Reads whatever complete lines have been appended since the last
+           poll and passes them to the subscribers.  Returns how many.'''
+
+        with self._lock:
+            if self.bvh is None and not self._read_header():
+                return 0
+            size = os.path.getsize( self.filename )
+            if size < self._offset:
+                raise Exception( f'{self.filename} was truncated while following it' )
+            if size == self._offset:
+                return 0
+
+            with open( self.filename, 'rb' ) as fptr:
+                fptr.seek( self._offset )
+                data = fptr.read( size - self._offset )
+            text = self._tail + data
+            cut = text.rfind( b'\n' ) + 1
+            # Only consume the bytes once every complete line has parsed, so
+            # a malformed line raises again on the next poll instead of
+            # being dropped.
+            block = self._parse( text[:cut], self._offset - len(self._tail) )
+            self._offset = size
+            self._tail = text[cut:]
+            if len(block) == 0:
+                return 0
+
+            first = self._count
+            self._append( block )
+            self.bvh.skeleton.num_frames = self._count
+
+        for callback in self._subscribers:
+            callback( first, block )
+        return len(block)
+
+    def wait_ready( self, timeout:float=None ) -> bool:
+        '''Polls until the header has been written.  Returns ready, which is
+           False if timeout seconds passed first.'''
+
+        began = time.monotonic()
+        while True:
+            if os.path.exists( self.filename ):
+                self.poll()
+            if self.ready:
+                return True
+            if timeout is not None and time.monotonic() - began > timeout:
+                return False
+            time.sleep( self.interval )
+
+    def motion( self, start:int=0, stop:int=None ) -> Motion:
+        '''A Motion of lines [start, stop) of those read so far.  Every line
+           is a frame: a resting pose can't be told apart until the take is
+           finished.'''
+        with self._lock:
+            return Motion.from_channels( self.bvh, self.values[start:stop], resting=False )
+
+    def follow( self, idle:float=None ):
+        '''Polls until stop is called or, if idle is given, until no new data
+           has arrived for that many seconds.'''
+
+        last = time.monotonic()
+        while not self._stop.is_set():
+            if self.poll() > 0:
+                last = time.monotonic()
+            elif idle is not None and time.monotonic() - last > idle:
+                return
+            self._stop.wait( self.interval )
+
+    def start( self, idle:float=None ):
+        '''Follows on a daemon thread'''
+        self._stop.clear()
+        self._thread = threading.Thread( target=self.follow, args=( idle, ), daemon=True )
+        self._thread.start()
+
+    def stop( self ):
+        '''Stops a background follow and waits for it'''
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
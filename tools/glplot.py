@@ -1,12 +1,17 @@
-'''An OpenGL plotting tool for a skeleton'''
+'''An OpenGL plotting tool for one or more skeletons'''
 import sys
 from platform import system as which_os
-import glm
+import numpy as np
 from OpenGL import GL
 from OpenGL.GLU import gluLookAt
 from OpenGL import GLUT
 
 from tools.skeleton import Skeleton
+from tools.bones import BoneBatch, BoneBuffer, gather_positions, grid_placements, rig_key
+from tools.camera import OrbitCamera
+from tools.follow import MotionFollower
+from tools.motion import Motion, Track
+from tools.playback import PlaybackClock
 
 class _Window():
     '''A trivial class to contain all the window creation stuff'''
@@ -38,28 +43,192 @@ class _Window():
         GL.glShadeModel(GL.GL_FLAT)
 
 
+class _BufferRenderer():
+    '''Draws every bone of a skeleton with a single glDrawElements call.
+       Indices and colors are uploaded once; only the vertex positions are
+       sent each frame.  Falls back to plain client-side vertex arrays when
+       buffer objects aren't available, eg: on a GL 1.1 software renderer.'''
+
+    def __init__( self, bones:BoneBatch ):
+        self.bones = bones
+        self._vertex_vbo = None
+        self._color_vbo = None
+        self._index_vbo = None
+
+    def initialize( self ):
+        '''Creates the buffer objects.  Requires a current GL context.'''
+
+        if not bool( GL.glGenBuffers ):
+            return
+
+        self._vertex_vbo, self._color_vbo, self._index_vbo = GL.glGenBuffers( 3 )
+
+        GL.glBindBuffer( GL.GL_ARRAY_BUFFER, self._vertex_vbo )
+        GL.glBufferData( GL.GL_ARRAY_BUFFER, self.bones.vertices.nbytes, None, GL.GL_STREAM_DRAW )
+        GL.glBindBuffer( GL.GL_ARRAY_BUFFER, self._color_vbo )
+        GL.glBufferData( GL.GL_ARRAY_BUFFER, self.bones.colors, GL.GL_STATIC_DRAW )
+        GL.glBindBuffer( GL.GL_ARRAY_BUFFER, 0 )
+
+        GL.glBindBuffer( GL.GL_ELEMENT_ARRAY_BUFFER, self._index_vbo )
+        GL.glBufferData( GL.GL_ELEMENT_ARRAY_BUFFER, self.bones.indices, GL.GL_STATIC_DRAW )
+        GL.glBindBuffer( GL.GL_ELEMENT_ARRAY_BUFFER, 0 )
+
+    def draw( self ):
+        '''Uploads the current vertices and draws all the bones.'''
+
+        GL.glEnableClientState( GL.GL_VERTEX_ARRAY )
+        GL.glEnableClientState( GL.GL_COLOR_ARRAY )
+
+        if self._vertex_vbo is None:
+            GL.glVertexPointer( 3, GL.GL_FLOAT, 0, self.bones.vertices )
+            GL.glColorPointer( 3, GL.GL_FLOAT, 0, self.bones.colors )
+            GL.glDrawElements( GL.GL_LINES, len(self.bones.indices),
+                               GL.GL_UNSIGNED_INT, self.bones.indices )
+        else:
+            GL.glBindBuffer( GL.GL_ARRAY_BUFFER, self._vertex_vbo )
+            GL.glBufferSubData( GL.GL_ARRAY_BUFFER, 0, self.bones.vertices.nbytes,
+                                self.bones.vertices )
+            GL.glVertexPointer( 3, GL.GL_FLOAT, 0, None )
+            GL.glBindBuffer( GL.GL_ARRAY_BUFFER, self._color_vbo )
+            GL.glColorPointer( 3, GL.GL_FLOAT, 0, None )
+            GL.glBindBuffer( GL.GL_ELEMENT_ARRAY_BUFFER, self._index_vbo )
+            GL.glDrawElements( GL.GL_LINES, len(self.bones.indices),
+                               GL.GL_UNSIGNED_INT, None )
+            GL.glBindBuffer( GL.GL_ELEMENT_ARRAY_BUFFER, 0 )
+            GL.glBindBuffer( GL.GL_ARRAY_BUFFER, 0 )
+
+        GL.glDisableClientState( GL.GL_COLOR_ARRAY )
+        GL.glDisableClientState( GL.GL_VERTEX_ARRAY )
+
+
+class _Clip():
+    '''Playback state for one of the skeletons shown by a Plot'''
+
+    def __init__( self, skeleton:Skeleton ):
+        self.skeleton = skeleton
+        self.track = Track( Motion.from_skeleton( skeleton ) )
+        self.bind_pose = gather_positions( skeleton.ordered_joints() )
+
+    @property
+    def duration( self ) -> float:
+        '''Length of the clip in seconds'''
+        return len(self.track) * self.skeleton.frame_time
+
+    def positions( self, clip_time:float, interpolate:bool ):
+        '''World positions at clip_time seconds, looping the clip.
+           Returns the positions and the frame index.'''
+
+        count = len(self.track)
+        if count == 0:
+            return self.bind_pose, 0
+
+        current = ( clip_time / self.skeleton.frame_time ) % count
+        index = min( int(current), count - 1 )
+        blend = current - index
+        positions = self.track[index]
+        if interpolate and blend > 0.0:
+            positions = positions + ( self.track[ (index + 1) % count ] - positions ) * blend
+        return positions, index
+
+
+class _LiveClip():
+    '''Shows the newest frame of a file that is still being written'''
+
+    def __init__( self, follower:MotionFollower ):
+        self.follower = follower
+        self.skeleton = follower.skeleton
+        self.bind_pose = gather_positions( self.skeleton.ordered_joints() )
+        self.error = None
+        '''The last poll's error, reported once while it persists'''
+
+    @property
+    def duration( self ) -> float:
+        '''A single frame, live clips don't loop'''
+        return self.skeleton.frame_time
+
+    def positions( self, clip_time:float, interpolate:bool ):
+        '''World positions of the newest frame, ignoring the clock.  Returns
+           the positions and the frame index.  A malformed line is reported
+           and the last good frame kept until it is rewritten.'''
+
+        try:
+            self.follower.poll()
+            self.error = None
+        except Exception as error:
+            if str(error) != self.error:
+                print( error )
+            self.error = str(error)
+        count = self.follower.num_frames
+        if count == 0:
+            return self.bind_pose, 0
+        return self.follower.motion( count - 1 ).world_positions()[0], count - 1
+
+
 class Plot():
-    '''Passed a  fully populated skeleton, window name, postion, and size,
-        initializes an OpenGL window to plot the skeleton.  Use arrow keys
+    '''Passed one or more fully populated skeletons, window name, postion, and size,
+        initializes an OpenGL window to plot the skeletons.  Use arrow keys
          to orbit around the skeleton and  <SPACE> to toggle between the
-        pose an the animation.'''
-
-    def __init__( self, skeleton:Skeleton, name:str, window_pos=[100,100], window_size=[800,800] ):
-        if not isinstance( skeleton, Skeleton ):
+        pose an the animation.  World positions for the animation are computed
+        into a track ahead of drawing so playback only indexes into it.  The
+        displayed frame follows a wall clock, skipping or interpolating frames
+        to stay in sync.  P pauses, comma and period step, plus and minus
+        change speed, I toggles interpolation and S prints playback stats.
+        Set use_buffers to draw all the bones
+        from vertex arrays in one call instead of one glBegin/glEnd per bone.
+        Several skeletons share one clock and are laid out on a grid, or on
+        top of each other with layout='overlay'.  Skeletons with the same rig
+        share their bone indices and colors.  A MotionFollower can be passed
+        in place of a skeleton to show the newest frame of a file that is
+        still being recorded.'''
+
+    def __init__( self, skeleton, name:str, window_pos=[100,100], window_size=[800,800],
+                  use_buffers:bool=False, layout:str='grid' ):
+        skeletons = skeleton if isinstance( skeleton, (list, tuple) ) else [ skeleton ]
+        followers = [ skel if isinstance( skel, MotionFollower ) else None for skel in skeletons ]
+        skeletons = [ skel.skeleton if isinstance( skel, MotionFollower ) else skel
+                      for skel in skeletons ]
+        if len(skeletons) == 0 or not all( isinstance( skel, Skeleton ) for skel in skeletons ):
             raise Exception('Skeleton is required and must be of type skeleton')
-        self.skeleton = skeleton
+        if layout not in ( 'grid', 'overlay' ):
+            raise Exception( f'Unknown layout {layout}' )
+        self.skeleton = skeletons[0]
         '''A valid and populated skeleton to display'''
+        self.skeletons = skeletons
+        '''Every skeleton displayed'''
         self._window = _Window( name, window_pos, window_size )
-        self._rotate_y = 180.0
-        self._rotate_x = 0.0
-        self._scale = 1.0
+        self.camera = OrbitCamera()
+        '''The orbit parameters.  Shared with the headless renderer.'''
         self.animating = False
         '''Set true if animating instead of displaying bind pose'''
         self.frame = 0
-        '''Current frame number when animating'''
-
-    @staticmethod
-    def _reshape(width:int, height:int):
+        '''Current frame number of the first skeleton when animating'''
+        self.interpolate = True
+        '''Blend between neighboring frames when the clock falls between them'''
+
+        rigs = {}
+        for skel in skeletons:
+            key = rig_key( skel )
+            if key not in rigs:
+                rigs[key] = BoneBuffer( skel )
+        placements = None
+        if layout == 'grid' and len(skeletons) > 1:
+            placements = grid_placements( len(skeletons) )
+            self.camera.scale = 1.0 / np.ceil( np.sqrt( len(skeletons) ) )
+        self._bones = BoneBatch( [ rigs[rig_key( skel )] for skel in skeletons ], placements )
+        self._clips = [ _Clip( skel ) if follower is None else _LiveClip( follower )
+                        for skel, follower in zip( skeletons, followers ) ]
+        if any( follower is not None for follower in followers ):
+            self.animating = True
+
+        frame_time = min( skel.frame_time for skel in skeletons )
+        duration = max( clip.duration for clip in self._clips )
+        self.clock = PlaybackClock( int( np.ceil( duration / frame_time - 1e-6 ) ), frame_time )
+        '''Decides which frame to show.  Also holds the playback stats.'''
+        self._renderer = None
+        if use_buffers:
+            self._renderer = _BufferRenderer( self._bones )
+
+    def _reshape(self, width:int, height:int):
         '''Callback function for handling reshape from glut'''
 
         GL.glViewport(0, 0, GL.GLsizei(width), GL.GLsizei(height))
@@ -71,8 +240,9 @@ class Plot():
 #        GL.glFrustum(-1.0, 1.0, -1.0, 1.0, 2.0, 5.0) #Boutique config. :(
 #        GL.glMatrixMode(GL.GL_MODELVIEW)
 #
-        GL.glScalef(2.0, 2.0, 2.0)  #Deals with near clipping plane weirdness.
-        GL.glFrustum(-1.0, 1.0, -1.0, 1.0, 2.0, 5.0) #Boutique config. :(
+        zoom = self.camera.zoom
+        GL.glScalef(zoom, zoom, zoom)  #Deals with near clipping plane weirdness.
+        GL.glFrustum(*self.camera.frustum) #Boutique config. :(
         GL.glMatrixMode(GL.GL_MODELVIEW)
 
     def _keypress(self, key, x, y):
@@ -84,16 +254,21 @@ class Plot():
         #           RIGHT - rotate right
 
         if key == GLUT.GLUT_KEY_RIGHT:
-            self._rotate_y += 5
+            self.camera.rotate_y += 5
         if key == GLUT.GLUT_KEY_LEFT:
-            self._rotate_y -= 5
+            self.camera.rotate_y -= 5
         if key == GLUT.GLUT_KEY_UP:
-            self._rotate_x += 5
+            self.camera.rotate_x += 5
         if key == GLUT.GLUT_KEY_DOWN:
-            self._rotate_x -= 5
+            self.camera.rotate_x -= 5
         if key == 32:  #Pressed the space bar, start animating!
             self.animating = not self.animating
             self.frame = 0
+            self.clock.seek( 0 )
+            if self.animating:
+                self.clock.play()
+            else:
+                self.clock.pause()
 
         if key in [3, 27]:  #Escape key or ^C terminate
             #Apparently not implemented on mac.  You must apple-quit
@@ -106,6 +281,30 @@ class Plot():
 
         GLUT.glutPostRedisplay()
 
+    def _keyboard(self, key, x, y):
+        '''Callback function for glut ascii keyboard input handling.'''
+
+        key = key.lower()
+        if key == b'p':
+            self.animating = True
+            self.clock.toggle()
+        elif key in ( b',', b'.' ):
+            self.animating = True
+            self.clock.pause()
+            self.clock.step( 1 if key == b'.' else -1 )
+        elif key in ( b'+', b'=' ):
+            self.clock.set_speed( self.clock.speed * 2.0 )
+        elif key == b'-':
+            self.clock.set_speed( self.clock.speed / 2.0 )
+        elif key == b'i':
+            self.interpolate = not self.interpolate
+        elif key == b's':
+            print( self.clock.stats )
+        else:
+            self._keypress( ord(key), x, y )
+
+        GLUT.glutPostRedisplay()
+
     def _display(self):
         '''Callback to actually render the skeleton'''
 
@@ -118,22 +317,32 @@ class Plot():
         GL.glLoadIdentity()
 
         # Set the camera
-        gluLookAt(0.0, 0.0, -3.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+        gluLookAt(*self.camera.eye, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0)
 
-        GL.glScalef(self._scale, self._scale, self._scale)
-        GL.glRotatef(self._rotate_y, 0.0, 1.0, 0.0)
+        scale = self.camera.scale
+        GL.glScalef(scale, scale, scale)
+        GL.glRotatef(self.camera.rotate_y, 0.0, 1.0, 0.0)
 
-        GL.glRotatef(self._rotate_x, 1.0, 0.0, 0.0)
+        GL.glRotatef(self.camera.rotate_x, 1.0, 0.0, 0.0)
 
-        self._draw_bone( self.skeleton.get_root() )
+        self.clock.begin_render()
+        self._update_vertices()
+
+        if self._renderer is not None:
+            self._renderer.draw()
+        else:
+            self._draw_bones()
 
         GL.glFlush()
+        self.clock.end_render()
 
     def activate(self):
         '''This function is called once the skeleton is populated with
            data to activate the OpenGL view.'''
 
         self._window.initialize()
+        if self._renderer is not None:
+            self._renderer.initialize()
 
         # Callback for display
         GLUT.glutDisplayFunc( self._display )
@@ -141,91 +350,53 @@ class Plot():
         # Callback for reshape
         GLUT.glutReshapeFunc( self._reshape )
 
-        ## Update the frame number
-        GLUT.glutTimerFunc( self.skeleton.frame_rate,
-                             self._update_frame, 1 )
-
-        # Update the skeleton
-        GLUT.glutIdleFunc( self._update_bones )
+        ## Redraw while playing
+        GLUT.glutTimerFunc( self._redraw_interval(), self._update_frame, 1 )
 
         # Callback for keyboard
         GLUT.glutSpecialFunc( self._keypress )
+        GLUT.glutKeyboardFunc( self._keyboard )
 
         # Start the main loop
         GLUT.glutMainLoop()
 
-    def _add_vertex( self, vec:glm.vec3 ):
-        '''Creates a glVertex3f from a glm.vec3 scaled by the
-           skeleton's scale_factor for unitization.'''
-
-        scaled_vec = vec / self.skeleton.scale_factor
-        GL.glVertex3f( scaled_vec[0], scaled_vec[1], scaled_vec[2] )
+    def _redraw_interval( self ) -> int:
+        '''Milliseconds between redraws.  At most the clip's frame time,
+           and no slower than 60Hz so interpolation stays smooth.'''
+        return max( 1, int( min( self.skeleton.frame_time, 1.0/60.0 ) * 1000.0 ) )
 
     def _update_frame( self, _ ):
-        '''Trivial function to update the frame number'''
-
-        #TODO add lerping and fix frame rate.
-        self.frame += 1
-        GLUT.glutPostRedisplay()
-        GLUT.glutTimerFunc(self.skeleton.frame_rate, self._update_frame, 1)
-
-    def _update_bone( self, joint, rotation  ):
-        '''Updates the rotation/position/scale for an individual bone'''
+        '''Requests a redraw while playing.  The frame shown is decided by
+           the clock when drawing.'''
 
-        #TODO this aborts animating descendants.
-        if len(joint.frames) < self.frame:
-            return
-
-        child_rot = joint.frames[self.frame].rotation * rotation
-        if self.skeleton.has_resting:
-            child_rot = glm.conjugate(joint.frames[self.frame].rotation) * rotation
-
-        if joint.parent is not None:
-            joint.w_position = joint.parent.w_position + \
-                               joint.position * glm.conjugate(rotation)
-            if self.skeleton.has_resting:
-                joint.w_position = joint.parent.w_position + \
-                                   joint.position * rotation
-        else:
-            joint.w_position = joint.position
-
-        for child in joint.children:
-            self._update_bone( child, child_rot )
+        if self.animating and self.clock.playing:
+            GLUT.glutPostRedisplay()
+        GLUT.glutTimerFunc( self._redraw_interval(), self._update_frame, 1 )
 
-    def _update_bones( self ):
-        '''When in animating mode, uses the time delta from the last frame and
-           the framerate to determine which frame to display next, then
-           recursively updates the skeleton with the motion data.'''
+    def _update_vertices( self ):
+        '''Writes every skeleton's positions for the current clock time into
+           the shared vertex array.'''
 
         if self.animating:
-            #Loop the animation
-            if self.frame >= self.skeleton.num_frames:
-                self.frame = 0
-
-            rotation = glm.quat(glm.vec3(0,0,0))
-            self._update_bone( self.skeleton.get_root(), rotation )
-
-    def _draw_bone( self, joint ):
-        '''Recursive function to draw line strips from a joint to each of
-           if children.'''
+            self.clock.tick()
+            clip_time = self.clock.time()
+        for instance, clip in enumerate( self._clips ):
+            if self.animating:
+                positions, index = clip.positions( clip_time, self.interpolate )
+                if instance == 0:
+                    self.frame = index
+            else:
+                positions = clip.bind_pose
+            self._bones.update( instance, positions, clip.skeleton.scale_factor )
 
+    def _draw_bones( self ):
+        '''Draws each bone as its own 2-vertex line strip from the
+           current vertices.'''
 
-        #TODO assigning joints colors would be cool. Move joint color to skeleton.
-        GL.glColor3f(1.0, 1.0, 1.0)
-        jname = joint.alias.upper()
-        if 'RIGHT' in jname or jname[0]=='R':
-            GL.glColor3f(1.0, 0.0, 0.0)
-        elif 'LEFT' in jname or jname[0]=='L':
-            GL.glColor3f(0.0, 0.0, 1.0)
-
-        if joint.parent is not None:
-            #Make a 2-vertex line segment
+        colors = self._bones.colors
+        for parent, child in self._bones.indices.reshape( -1, 2 ):
+            GL.glColor3f( *colors[child] )
             GL.glBegin( GL.GL_LINE_STRIP )
-            #Keep the root at the center of the screen.
-            self._add_vertex( joint.parent.w_position - self.skeleton.get_root().w_position )
-            self._add_vertex( joint.w_position - self.skeleton.get_root().w_position )
+            GL.glVertex3f( *self._bones.vertices[parent] )
+            GL.glVertex3f( *self._bones.vertices[child] )
             GL.glEnd()
-
-        #Recurse the children
-        for child in joint.children:
-            self._draw_bone( child )
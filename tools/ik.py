@@ -0,0 +1,316 @@
+'''Inverse kinematics over every frame of a clip at once.
+
+Chains are solved on (frames, ...) arrays from Motion.world_transforms:
+analytic two-bone IK for limbs and cyclic coordinate descent for longer
+chains.  Both work on the world rotation of each bone, the rotation that
+carries a joint's children's offsets into world space, then turn them back
+into local rotations with the same conventions as the viewer, resting pose
+included.  The end joint keeps its world orientation by default so a
+planted foot stays flat.  Every solve reports the distance from the end
+joint to its target for each frame, before and after.'''
+
+import csv
+from typing import List
+import numpy as np
+from tools import nputils
+from tools.bvh_write import bvh_write
+from tools.kinematics import Kinematics, contact_joints
+from tools.motion import Motion
+
+class IKResult:
+    '''A solved motion and how close each frame got to its target'''
+
+    def __init__( self, motion:Motion, joint:str, before:np.ndarray, after:np.ndarray ):
+        self.motion = motion
+        '''The motion with the chain's local rotations corrected'''
+        self.joint = joint
+        '''Name of the end joint'''
+        self.before = before
+        '''(frames,) distance from the end joint to its target before solving.
+           NaN for frames without a target.'''
+        self.after = after
+        '''(frames,) the same distance after solving'''
+
+    @property
+    def max_error( self ) -> float:
+        '''Largest remaining distance, 0 if no frame has a target'''
+        return float( np.nanmax( self.after ) ) if np.isfinite( self.after ).any() else 0.0
+
+    def frames_over( self, tolerance:float ) -> np.ndarray:
+        '''Frames still further than tolerance from their target'''
+        with np.errstate( invalid='ignore' ):
+            return np.nonzero( self.after > tolerance )[0]
+
+    def summary( self, tolerance:float ) -> dict:
+        '''Frame counts and errors in a form ready for printing or JSON'''
+        targeted = np.isfinite( self.after )
+        return { 'joint' : self.joint, 'frames' : int( targeted.sum() ),
+                 'max_before' : float( np.nanmax( self.before ) ) if targeted.any() else 0.0,
+                 'max_after' : self.max_error,
+                 'mean_after' : float( np.nanmean( self.after ) ) if targeted.any() else 0.0,
+                 'over_tolerance' : int( len( self.frames_over( tolerance ) ) ) }
+
+def joint_chain( motion:Motion, end, bones:int=2 ) -> List[int]:
+    '''Indices of end and the `bones` joints above it, topmost first'''
+
+    joint = motion.names.index( end ) if isinstance( end, str ) else end
+    chain = [ joint ]
+    for _ in range( bones ):
+        joint = int( motion.parents[joint] )
+        if joint < 0:
+            raise Exception( f'{motion.names[chain[-1]]} has fewer than {bones} joints above it' )
+        chain.append( joint )
+    return chain[::-1]
+
+def _compose( motion:Motion, local:np.ndarray, parent:np.ndarray ) -> np.ndarray:
+    '''World bone rotation from a local rotation and the parent's world
+       rotation.  Without a resting pose each joint's rotation is applied
+       after what it receives, with one before.'''
+    if motion.has_resting:
+        return nputils.quat_multiply( parent, local )
+    return nputils.quat_multiply( local, parent )
+
+def _local( motion:Motion, world:np.ndarray, parent:np.ndarray ) -> np.ndarray:
+    '''The inverse of _compose'''
+    if motion.has_resting:
+        return nputils.quat_multiply( nputils.quat_conjugate( parent ), world )
+    return nputils.quat_multiply( world, nputils.quat_conjugate( parent ) )
+
+def _chain_positions( base:np.ndarray, worlds:np.ndarray, offsets:np.ndarray ) -> np.ndarray:
+    '''(frames, n, 3) positions of a chain of n joints from the first joint's
+       position and the world rotations of all but the last'''
+
+    positions = np.empty( ( len(base), len(offsets) + 1, 3 ) )
+    positions[:,0] = base
+    for bone, offset in enumerate( offsets ):
+        positions[:,bone+1] = positions[:,bone] + nputils.rotate_vectors( worlds[:,bone], offset )
+    return positions
+
+def _two_bone( base, worlds, offsets, targets, poles ) -> np.ndarray:
+    '''Analytic solve of a three joint chain.  The middle joint bends
+       toward its pole, its current position by default.'''
+
+    positions = _chain_positions( base, worlds, offsets )
+    start, middle, end = positions[:,0], positions[:,1], positions[:,2]
+    upper = np.linalg.norm( middle - start, axis=-1 )
+    lower = np.linalg.norm( end - middle, axis=-1 )
+
+    reach = targets - start
+    distance = np.linalg.norm( reach, axis=-1 )
+    current = end - start
+    #A target on the first joint keeps the current direction.
+    toward = np.where( ( distance > 1e-12 )[:,None], reach, current )
+    toward = toward / np.maximum( np.linalg.norm( toward, axis=-1 ), 1e-12 )[:,None]
+    distance = np.clip( distance, np.abs( upper - lower ), upper + lower )
+
+    pole = ( middle if poles is None else poles ) - start
+    bend = pole - ( pole * toward ).sum( axis=-1, keepdims=True ) * toward
+    #A straight limb with no pole bends about any perpendicular.
+    fallback = np.cross( toward, np.eye( 3 )[ np.argmin( np.abs( toward ), axis=-1 ) ] )
+    bend = np.where( ( np.linalg.norm( bend, axis=-1 ) > 1e-9 * np.maximum( upper, 1e-12 ) )[:,None],
+                     bend, fallback )
+    bend = bend / np.linalg.norm( bend, axis=-1, keepdims=True )
+
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        cos = np.clip( ( upper**2 + distance**2 - lower**2 ) / ( 2.0 * upper * distance ), -1.0, 1.0 )
+    cos = np.where( np.isfinite( cos ), cos, 1.0 )
+    new_middle = start + upper[:,None] * ( cos[:,None] * toward + np.sqrt( 1.0 - cos**2 )[:,None] * bend )
+    new_end = start + distance[:,None] * toward
+
+    solved = worlds.copy()
+    turn = nputils.shortest_arc( middle - start, new_middle - start )
+    solved[:,0] = nputils.quat_multiply( turn, worlds[:,0] )
+    lower_world = nputils.quat_multiply( turn, worlds[:,1] )
+    moved = nputils.rotate_vectors( turn, end - middle )
+    solved[:,1] = nputils.quat_multiply( nputils.shortest_arc( moved, new_end - new_middle ), lower_world )
+    return solved
+
+def _ccd( base, worlds, offsets, targets, iterations, tolerance ) -> np.ndarray:
+    '''Cyclic coordinate descent.  Each joint from the end up turns the rest
+       of the chain rigidly so the end points at the target.'''
+
+    solved = worlds.copy()
+    bones = len(offsets)
+    for _ in range( iterations ):
+        for bone in range( bones - 1, -1, -1 ):
+            positions = _chain_positions( base, solved, offsets )
+            turn = nputils.shortest_arc( positions[:,-1] - positions[:,bone], targets - positions[:,bone] )
+            solved[:,bone:bones] = nputils.quat_multiply( turn[:,None], solved[:,bone:bones] )
+        error = np.linalg.norm( _chain_positions( base, solved, offsets )[:,-1] - targets, axis=-1 )
+        if not ( error > tolerance ).any():
+            break
+    return solved
+
+def _solve( motion:Motion, chain:List[int], targets, solver, weights, keep_orientation:bool,
+            in_place:bool, chunk:int ) -> IKResult:
+    '''Runs solver( base, worlds, offsets, targets, start, stop ) over chunks
+       of frames and writes the blended local rotations of the chain back'''
+
+    for child, parent in zip( chain[1:], chain[:-1] ):
+        if motion.parents[child] != parent:
+            raise Exception( f'{motion.names[child]} is not a child of {motion.names[parent]}' )
+    targets = np.asarray( targets, dtype=float )
+    if targets.shape != ( motion.num_frames, 3 ):
+        raise Exception( f'Expected ({motion.num_frames}, 3) targets got {targets.shape}' )
+    active = np.isfinite( targets ).all( axis=-1 )
+    weights = np.ones( motion.num_frames ) if weights is None else \
+              np.broadcast_to( np.asarray( weights, dtype=float ), ( motion.num_frames, ) )
+    weights = np.where( active, weights, 0.0 )
+
+    rotations = motion.rotations if in_place else motion.rotations.copy()
+    offsets = motion.offsets[chain[1:]]
+    before = np.full( motion.num_frames, np.nan )
+    after = np.full( motion.num_frames, np.nan )
+    top = motion.parents[chain[0]]
+    for start in range( 0, motion.num_frames, chunk ):
+        stop = min( start + chunk, motion.num_frames )
+        positions, accumulated = motion.world_transforms( start, stop )
+        worlds = nputils.quat_conjugate( accumulated ) if motion.has_resting else accumulated
+        parent = worlds[:,top] if top >= 0 else nputils.identity_quats( stop - start )
+        base = positions[:,chain[0]]
+        goal = np.where( active[start:stop,None], targets[start:stop], positions[:,chain[-1]] )
+
+        chain_worlds = worlds[:,chain]
+        solved = solver( base, chain_worlds, offsets, goal, start, stop )
+        if keep_orientation:
+            solved[:,-1] = chain_worlds[:,-1]
+
+        locals_ = rotations[start:stop][:,chain]
+        uppers = np.concatenate( ( parent[:,None], solved[:,:-1] ), axis=1 )
+        fixed = _local( motion, solved, uppers )
+        if not keep_orientation:
+            fixed[:,-1] = locals_[:,-1]
+        blended = nputils.quat_slerp( locals_, fixed, weights[start:stop,None] )
+        rotations[start:stop,chain] = blended
+
+        #Pose the chain again from what was written to measure the result.
+        final = np.empty_like( blended )
+        upper = parent
+        for bone in range( len(chain) ):
+            final[:,bone] = upper = _compose( motion, blended[:,bone], upper )
+        end = _chain_positions( base, final, offsets )[:,-1]
+        before[start:stop] = np.linalg.norm( positions[:,chain[-1]] - goal, axis=-1 )
+        after[start:stop] = np.linalg.norm( end - goal, axis=-1 )
+
+    before[~active] = np.nan
+    after[~active] = np.nan
+    solved_motion = motion if in_place else \
+                    Motion( motion.names, motion.parents, motion.offsets, rotations,
+                            motion.root_positions, motion.has_resting )
+    return IKResult( solved_motion, motion.names[chain[-1]], before, after )
+
+def two_bone_ik( motion:Motion, end, targets, weights=None, poles=None, keep_orientation:bool=True,
+                 in_place:bool=False, chunk:int=8192 ) -> IKResult:
+    '''Moves the named end joint, and the two joints above it, so the end
+       reaches (frames, 3) world targets.  Frames whose target is NaN are
+       left alone.  weights (frames,) fade the correction in and out and
+       poles (frames, 3) are world positions the middle joint bends toward,
+       its current position if not given.  Targets out of reach are reached
+       toward as far as the limb allows.  The result's motion has corrected
+       rotations, written into motion's own array with in_place.'''
+
+    chain = joint_chain( motion, end, 2 )
+    poles = None if poles is None else np.broadcast_to( np.asarray( poles, dtype=float ),
+                                                        ( motion.num_frames, 3 ) )
+    def solver( base, worlds, offsets, goal, start, stop ):
+        return _two_bone( base, worlds, offsets, goal, None if poles is None else poles[start:stop] )
+    return _solve( motion, chain, targets, solver, weights, keep_orientation, in_place, chunk )
+
+def ccd_ik( motion:Motion, end, targets, bones:int=3, iterations:int=10, tolerance:float=1e-3,
+            weights=None, keep_orientation:bool=True, in_place:bool=False, chunk:int=8192 ) -> IKResult:
+    '''Like two_bone_ik for the end joint and any number of bones above it,
+       solved iteratively.  Stops early once every frame is within
+       tolerance.'''
+
+    chain = joint_chain( motion, end, bones )
+    def solver( base, worlds, offsets, goal, start, stop ):
+        return _ccd( base, worlds, offsets, goal, iterations, tolerance )
+    return _solve( motion, chain, targets, solver, weights, keep_orientation, in_place, chunk )
+
+def contact_targets( positions:np.ndarray, contacts:np.ndarray, fade:int=0 ) -> tuple:
+    '''Pins (frames, feet, 3) positions while (frames, feet) contacts hold:
+       every frame of a contact targets the contact's mean position.  Within
+       fade frames of a contact the nearest contact's target is used with a
+       weight that falls off linearly.  Returns (frames, feet, 3) targets,
+       NaN where there is none, and (frames, feet) weights.'''
+
+    positions = np.asarray( positions, dtype=float )
+    contacts = np.asarray( contacts, dtype=bool )
+    frames, feet = contacts.shape
+    starts = contacts & ~np.concatenate( ( np.zeros( ( 1, feet ), dtype=bool ), contacts[:-1] ) )
+    #Number the contacts across all feet so one bincount averages them.
+    runs = np.cumsum( starts.T.ravel() ).reshape( feet, frames ).T - 1
+    count = int( starts.sum() )
+    sums = np.stack( [ np.bincount( runs[contacts], positions[contacts][:,axis], minlength=count )
+                       for axis in range( 3 ) ], axis=-1 )
+    means = sums / np.maximum( np.bincount( runs[contacts], minlength=count ), 1 )[:,None]
+
+    index = np.arange( frames )[:,None]
+    last = np.maximum.accumulate( np.where( contacts, index, -1 ), axis=0 )
+    upcoming = np.minimum.accumulate( np.where( contacts, index, frames )[::-1], axis=0 )[::-1]
+    behind = np.where( last >= 0, index - last, frames + 1 )
+    ahead = np.where( upcoming < frames, upcoming - index, frames + 1 )
+    nearest = np.where( behind <= ahead, last, upcoming )
+    distance = np.minimum( behind, ahead )
+
+    weights = np.clip( 1.0 - distance / ( fade + 1.0 ), 0.0, 1.0 )
+    targets = np.full( ( frames, feet, 3 ), np.nan )
+    near = weights > 0.0
+    foot = np.broadcast_to( np.arange( feet ), ( frames, feet ) )
+    targets[near] = means[ runs[ nearest[near], foot[near] ] ]
+    return targets, weights
+
+def planted_joints( motion:Motion, keywords=( 'FOOT', 'ANKLE' ) ) -> List[int]:
+    '''The topmost joint of each foot: joints matching the keywords whose
+       parent doesn't, so toes under a foot aren't counted twice'''
+    matches = set( contact_joints( motion.names, keywords ) )
+    return [ joint for joint in sorted( matches ) if motion.parents[joint] not in matches ]
+
+def lock_feet( motion:Motion, frame_time:float, scale:float=None, feet=None, up:int=1, fade:int=0,
+               **kwargs ) -> List[IKResult]:
+    '''Removes foot sliding: contacts are found as in kinematics.Kinematics
+       and every planted foot is held at its contact's mean position with
+       two_bone_ik.  feet are joint names or indices, planted_joints by
+       default.  Extra keyword arguments go to Kinematics.  Returns one
+       IKResult per foot, the last one's motion has every foot locked.'''
+
+    if feet is None:
+        feet = planted_joints( motion )
+    feet = [ motion.names.index( foot ) if isinstance( foot, str ) else foot for foot in feet ]
+    kinematics = Kinematics( motion, frame_time, scale, feet, up, **kwargs )
+    targets, weights = contact_targets( kinematics.positions[:,feet], kinematics.contacts, fade )
+
+    results = []
+    for column, foot in enumerate( feet ):
+        result = two_bone_ik( motion, foot, targets[:,column], weights[:,column] )
+        motion = result.motion
+        results.append( result )
+    return results
+
+def write_errors( results:List[IKResult], output:str ):
+    '''A CSV of every frame's distance to target before and after each
+       solve, blank for frames without a target'''
+
+    with open( output, 'w', newline='', encoding='utf-8' ) as fptr:
+        writer = csv.writer( fptr )
+        writer.writerow( [ 'frame' ] + [ f'{result.joint}_{when}' for result in results
+                                         for when in ( 'before', 'after' ) ] )
+        columns = [ errors for result in results for errors in ( result.before, result.after ) ]
+        for frame in range( len(columns[0]) if columns else 0 ):
+            writer.writerow( [ frame ] + [ '' if np.isnan( errors[frame] ) else f'{errors[frame]:.6g}'
+                                           for errors in columns ] )
+
+def lock_feet_file( filename:str, output:str, feet=None, up:int=1, fade:int=0,
+                    errors:str=None ) -> List[IKResult]:
+    '''lock_feet on a BVH file, written with bvh_write.  Contact thresholds
+       are scaled by the skeleton's unit scale.  errors is an optional CSV
+       for write_errors.'''
+
+    motion, bvh = Motion.read( filename )
+    bvh.skeleton.set_unit_scale_factor()
+    results = lock_feet( motion, bvh.skeleton.frame_time, bvh.skeleton.scale_factor, feet, up, fade )
+    solved = results[-1].motion if results else motion
+    bvh_write( solved.to_skeleton( bvh.skeleton ), output )
+    if errors is not None:
+        write_errors( results, errors )
+    return results
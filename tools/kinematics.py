@@ -0,0 +1,121 @@
+'''Derivative tracks and foot contacts from batched FK output.
+
+Everything here works on whole (frames, joints, ...) arrays such as those
+returned by Motion.world_transforms, so a long clip is a handful of NumPy
+passes rather than a per-frame recursion.'''
+
+import numpy as np
+from tools.motion import Motion
+
+FOOT_KEYWORDS = ( 'FOOT', 'TOE', 'ANKLE', 'HEEL' )
+'''Alias fragments that mark a joint as touching the ground.  Matched case
+   insensitively, the same way bones.joint_color picks sides.'''
+
+def contact_joints( names:list, keywords=FOOT_KEYWORDS ) -> list:
+    '''Indices of the joints whose alias contains any of the keywords'''
+    return [ i for i, name in enumerate( names )
+             if any( keyword in name.upper() for keyword in keywords ) ]
+
+def velocities( positions:np.ndarray, frame_time:float ) -> np.ndarray:
+    '''Per frame velocity of (frames, ...) positions in units per second.
+       Central differences inside the clip, one sided at the ends.'''
+    if len(positions) < 2:
+        return np.zeros_like( positions, dtype=float )
+    return np.gradient( positions, frame_time, axis=0 )
+
+def accelerations( positions:np.ndarray, frame_time:float ) -> np.ndarray:
+    '''Second derivative of (frames, ...) positions in units per second squared'''
+    return velocities( velocities( positions, frame_time ), frame_time )
+
+def angular_velocities( rotations:np.ndarray, frame_time:float ) -> np.ndarray:
+    '''(frames, ..., 3) axis times radians per second taking each (w, x, y, z)
+       rotation to the next, the short way round.  The last frame repeats the
+       one before it.'''
+
+    result = np.zeros( rotations.shape[:-1] + (3,) )
+    if len(rotations) < 2:
+        return result
+    w_0, x_0, y_0, z_0 = np.moveaxis( np.asarray( rotations[:-1], dtype=float ), -1, 0 )
+    w_1, x_1, y_1, z_1 = np.moveaxis( np.asarray( rotations[1:], dtype=float ), -1, 0 )
+
+    #rotations[1:] * conjugate( rotations[:-1] ) written out
+    d_w = w_1 * w_0 + x_1 * x_0 + y_1 * y_0 + z_1 * z_0
+    d_x = x_1 * w_0 - w_1 * x_0 - y_1 * z_0 + z_1 * y_0
+    d_y = y_1 * w_0 - w_1 * y_0 + x_1 * z_0 - z_1 * x_0
+    d_z = z_1 * w_0 - w_1 * z_0 - x_1 * y_0 + y_1 * x_0
+
+    sin_half = np.sqrt( d_x * d_x + d_y * d_y + d_z * d_z )
+    #Negative w is the long way round, flipping the axis takes the short one.
+    angle = 2.0 * np.arctan2( sin_half, np.abs( d_w ) )
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        scale = np.where( sin_half > 1e-12, angle / sin_half, 2.0 )
+    scale *= np.copysign( 1.0 / frame_time, d_w )
+    result[:-1,...,0] = d_x * scale
+    result[:-1,...,1] = d_y * scale
+    result[:-1,...,2] = d_z * scale
+    result[-1] = result[-2]
+    return result
+
+def _hysteresis( on:np.ndarray, off:np.ndarray ) -> np.ndarray:
+    '''(frames, n) state that turns on where `on` holds and stays on until
+       `off` holds.  Starts off.  Vectorized by comparing the most recent
+       on and off frames.'''
+
+    frames = np.arange( len(on) )[:,None]
+    last_on = np.maximum.accumulate( np.where( on, frames, -1 ), axis=0 )
+    last_off = np.maximum.accumulate( np.where( off, frames, -1 ), axis=0 )
+    return last_on > last_off
+
+def foot_contacts( positions:np.ndarray, speeds:np.ndarray, up:int=1, ground=None,
+                   height_on:float=0.02, height_off:float=0.04,
+                   speed_on:float=0.5, speed_off:float=1.0 ) -> np.ndarray:
+    '''(frames, feet) contact flags from (frames, feet, 3) positions and
+       (frames, feet) speeds.  A foot makes contact once it is within
+       height_on of the ground and slower than speed_on, and keeps it until
+       it rises past height_off or speeds up past speed_off.  ground defaults
+       to each foot's lowest point in the clip.  up is the vertical axis.'''
+
+    heights = positions[...,up]
+    if ground is None:
+        ground = heights.min( axis=0 )
+    heights = heights - ground
+    on = ( heights < height_on ) & ( speeds < speed_on )
+    off = ( heights > height_off ) | ( speeds > speed_off )
+    return _hysteresis( on, off )
+
+class Kinematics:
+    '''Derivative tracks of a whole clip.  Thresholds for contacts are given
+       in unit skeleton sizes (see Skeleton.set_unit_scale_factor) and are
+       multiplied by scale, the motion's unit_scale unless given, so the
+       defaults suit any rig.  Pass scale=1.0 for thresholds in file units.'''
+
+    def __init__( self, motion:Motion, frame_time:float, scale:float=None, feet=None, up:int=1,
+                  height_on:float=0.02, height_off:float=0.04,
+                  speed_on:float=0.5, speed_off:float=1.0 ):
+        self.names = motion.names
+        self.frame_time = frame_time
+        self.positions, self.world_rotations = motion.world_transforms()
+        '''(frames, joints, 3) and (frames, joints, 4) FK output'''
+        self.velocities = velocities( self.positions, frame_time )
+        '''(frames, joints, 3) units per second'''
+        self.accelerations = velocities( self.velocities, frame_time )
+        '''(frames, joints, 3) units per second squared'''
+        self.angular_velocities = angular_velocities( motion.rotations, frame_time )
+        '''(frames, joints, 3) local angular velocity as axis * radians per second'''
+
+        if scale is None:
+            scale = motion.unit_scale
+        if feet is None:
+            feet = contact_joints( self.names )
+        self.feet = [ self.names.index( foot ) if isinstance( foot, str ) else foot for foot in feet ]
+        '''Indices of the joints tested for contact'''
+        speeds = np.linalg.norm( self.velocities[:,self.feet], axis=-1 )
+        self.contacts = foot_contacts( self.positions[:,self.feet], speeds, up, None,
+                                       height_on * scale, height_off * scale,
+                                       speed_on * scale, speed_off * scale )
+        '''(frames, feet) True while a foot is planted'''
+
+    @property
+    def speeds( self ) -> np.ndarray:
+        '''(frames, joints) magnitude of the velocities'''
+        return np.linalg.norm( self.velocities, axis=-1 )
@@ -0,0 +1,332 @@
+'''Structural validation of BVH files.
+
+Unlike BVH.read_file, which raises on the first problem, the checks here
+keep going and collect every diagnostic with its line number so a whole
+library can be triaged in one run.  Nothing is converted to keyframes: the
+hierarchy is scanned line by line and the motion is checked a block at a
+time with NumPy, so a file costs little more than reading it.'''
+
+import csv
+import json
+import math
+import os
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List
+import numpy as np
+
+_BLOCK_LINES = 65536    #Motion lines checked at a time.
+_CHANNEL_AXES = ( 'X', 'Y', 'Z' )
+_CHANNEL_KINDS = ( 'POSITION', 'ROTATION', 'SCALE' )
+
+ERROR = 'error'
+WARNING = 'warning'
+
+CODES = {
+    'E100' : 'file could not be read',
+    'E101' : 'missing HIERARCHY',
+    'E102' : 'no ROOT joint',
+    'E103' : 'unbalanced braces',
+    'E104' : 'malformed OFFSET',
+    'E105' : 'malformed CHANNELS',
+    'E106' : 'unknown channel',
+    'E107' : 'missing MOTION',
+    'E108' : 'malformed Frames: line',
+    'E109' : 'malformed Frame Time: line',
+    'E110' : 'wrong number of values on a motion line',
+    'E111' : 'value is not a number',
+    'E112' : 'value is NaN or infinite',
+    'E113' : 'declared and actual frame counts differ',
+    'W201' : 'duplicate joint name',
+    'W202' : 'joint has no CHANNELS',
+    'W203' : 'more than one ROOT',
+    'W204' : 'unrecognized hierarchy line',
+    'W205' : 'motion continues after a blank line and will be ignored',
+    'W206' : 'one more motion line than declared, read as a resting pose',
+    'W207' : 'frame time is not positive',
+}
+'''Every diagnostic code and what it means.  E codes are errors that stop
+   BVH from loading the file, W codes are warnings.'''
+
+class _Report:
+    '''Collects diagnostics for one file, keeping at most `limit` per code'''
+
+    def __init__( self, filename:str, limit:int ):
+        self.filename = filename
+        self.limit = limit
+        self.diagnostics = []
+        self.counts = {}
+
+    def add( self, code:str, line:int, message:str=None ):
+        count = self.counts.get( code, 0 ) + 1
+        self.counts[code] = count
+        if count <= self.limit:
+            self.diagnostics.append( { 'line' : line, 'code' : code,
+                                       'severity' : ERROR if code[0] == 'E' else WARNING,
+                                       'message' : message or CODES[code] } )
+
+    def result( self, **extra ) -> dict:
+        errors = sum( count for code, count in self.counts.items() if code[0] == 'E' )
+        warnings = sum( count for code, count in self.counts.items() if code[0] == 'W' )
+        return { 'file' : self.filename, 'ok' : errors == 0, 'errors' : errors,
+                 'warnings' : warnings, 'counts' : self.counts,
+                 'diagnostics' : self.diagnostics, **extra }
+
+def _is_number( text ) -> bool:
+    try:
+        float( text )
+        return True
+    except ValueError:
+        return False
+
+def _check_hierarchy( fptr, report:_Report ) -> tuple:
+    '''Scans up to and including the Frame Time: line.  Returns the total
+       channel count, declared frames (or None) and the line number of the
+       last header line, or None for the channel count if MOTION is missing.'''
+
+    depth = 0
+    roots = 0
+    names = set()
+    pending = []        #( name, line, has channels ) of each open joint
+    channels = 0
+    line_no = 0
+    seen_hierarchy = False
+
+    for raw in fptr:
+        line_no += 1
+        fields = raw.split()
+        if not fields:
+            continue
+        tag = fields[0].upper()
+
+        if tag == b'HIERARCHY':
+            seen_hierarchy = True
+        elif tag in ( b'ROOT', b'JOINT' ):
+            if not seen_hierarchy:
+                report.add( 'E101', line_no )
+                seen_hierarchy = True
+            if tag == b'ROOT':
+                roots += 1
+                if roots > 1:
+                    report.add( 'W203', line_no )
+            name = fields[1].decode( 'utf-8', 'replace' ) if len(fields) > 1 else ''
+            if name in names:
+                report.add( 'W201', line_no, f'duplicate joint name {name}' )
+            names.add( name )
+            pending.append( [ name, line_no, False ] )
+        elif tag == b'END':
+            pending.append( [ None, line_no, True ] )
+        elif tag == b'{':
+            depth += 1
+        elif tag == b'}':
+            depth -= 1
+            if depth < 0:
+                report.add( 'E103', line_no, 'closing brace without an opening one' )
+                depth = 0
+            elif pending:
+                name, start, has_channels = pending.pop()
+                if not has_channels:
+                    report.add( 'W202', start, f'joint {name} has no CHANNELS' )
+        elif tag == b'OFFSET':
+            if len(fields) != 4 or not all( _is_number( value ) for value in fields[1:] ):
+                report.add( 'E104', line_no, 'OFFSET needs three numbers' )
+            elif not all( math.isfinite( float( value ) ) for value in fields[1:] ):
+                report.add( 'E112', line_no, 'OFFSET is NaN or infinite' )
+        elif tag == b'CHANNELS':
+            if pending:
+                pending[-1][2] = True
+            if len(fields) < 2 or not fields[1].isdigit():
+                report.add( 'E105', line_no, 'CHANNELS needs a count' )
+                continue
+            count = int( fields[1] )
+            listed = fields[2:]
+            if len(listed) != count:
+                report.add( 'E105', line_no, f'CHANNELS declares {count} but lists {len(listed)}' )
+            for field in listed:
+                text = field.decode( 'utf-8', 'replace' ).upper()
+                if text[:1] not in _CHANNEL_AXES or text[1:] not in _CHANNEL_KINDS:
+                    report.add( 'E106', line_no, f'unknown channel {field.decode( "utf-8", "replace" )}' )
+            channels += count     #BVH steps its column offset by the declared count.
+        elif tag == b'MOTION':
+            if not seen_hierarchy:
+                report.add( 'E101', 1 )
+            if roots == 0:
+                report.add( 'E102', line_no )
+            if depth != 0:
+                report.add( 'E103', line_no, f'{depth} joints still open at MOTION' )
+            return _check_preamble( fptr, report, channels, line_no )
+        else:
+            report.add( 'W204', line_no, f'unrecognized hierarchy line {fields[0].decode( "utf-8", "replace" )}' )
+
+    if not seen_hierarchy:
+        report.add( 'E101', 1 )
+    if roots == 0:
+        report.add( 'E102', line_no )
+    report.add( 'E107', line_no )
+    return None, None, line_no
+
+def _check_preamble( fptr, report:_Report, channels:int, line_no:int ) -> tuple:
+    '''The Frames: and Frame Time: lines that follow MOTION'''
+
+    frames = None
+    line_no += 1
+    fields = fptr.readline().split()
+    if len(fields) == 2 and fields[0].upper() == b'FRAMES:' and fields[1].isdigit():
+        frames = int( fields[1] )
+    else:
+        report.add( 'E108', line_no )
+
+    line_no += 1
+    fields = fptr.readline().split()
+    if len(fields) == 3 and fields[0].upper() == b'FRAME' and _is_number( fields[2] ):
+        if not float( fields[2] ) > 0.0:
+            report.add( 'W207', line_no )
+    else:
+        report.add( 'E109', line_no )
+    return channels, frames, line_no
+
+def _check_block( lines:list, first_line:int, width:int, report:_Report ):
+    '''Column counts, numbers and finiteness of a list of motion lines.
+       first_line is the file line number of lines[0].'''
+
+    counts = np.array( [ len( line.split() ) for line in lines ] )
+    good = counts == width
+    for index in np.nonzero( ~good )[0]:
+        report.add( 'E110', first_line + int(index),
+                    f'expected {width} values, found {counts[index]}' )
+    if not good.any() or width == 0:
+        return
+
+    rows = [ line for line, keep in zip( lines, good ) if keep ]
+    text = b' '.join( rows ).decode( 'ascii', 'replace' )
+    with warnings.catch_warnings():
+        warnings.simplefilter( 'ignore', DeprecationWarning )
+        try:
+            values = np.fromstring( text, sep=' ' )
+        except ValueError:
+            values = np.empty( 0 )
+    good_lines = np.nonzero( good )[0]
+    if len(values) != len(rows) * width:
+        #Something isn't a number.  Only now pay for a per-value look.
+        for index, line in zip( good_lines, rows ):
+            for column, token in enumerate( line.split() ):
+                if not _is_number( token ):
+                    report.add( 'E111', first_line + int(index),
+                                f'column {column + 1} is {token.decode( "utf-8", "replace" )!r}' )
+                elif not math.isfinite( float( token ) ):
+                    report.add( 'E112', first_line + int(index), f'column {column + 1} is {token.decode()}' )
+        return
+
+    bad = ~np.isfinite( values.reshape( len(rows), width ) )
+    for row, column in zip( *np.nonzero( bad ) ):
+        report.add( 'E112', first_line + int( good_lines[row] ), f'column {column + 1} is {values[row*width+column]}' )
+
+def lint_file( filename:str, limit:int=20 ) -> dict:
+    '''Checks one file.  Returns a dict with the file, ok, error and warning
+       totals, counts per code and up to `limit` diagnostics per code, each
+       { line, code, severity, message }.  Also the declared and actual
+       frame counts when the file gets that far.'''
+
+    report = _Report( filename, limit )
+    try:
+        with open( filename, 'rb' ) as fptr:
+            width, declared, line_no = _check_hierarchy( fptr, report )
+            if width is None:
+                return report.result()
+
+            frames_line = line_no - 1
+            frames = 0
+            ended = None
+            block = []
+            first = line_no + 1
+            for raw in fptr:
+                line_no += 1
+                if ended is not None:
+                    if raw.strip():
+                        report.add( 'W205', line_no )
+                        break
+                    continue
+                if not raw.strip():
+                    ended = line_no
+                    continue
+                block.append( raw )
+                if len(block) == _BLOCK_LINES:
+                    _check_block( block, first, width, report )
+                    frames += len(block)
+                    first += len(block)
+                    block = []
+            _check_block( block, first, width, report )
+            frames += len(block)
+    except OSError as err:
+        report.add( 'E100', 0, str(err) )
+        return report.result()
+
+    if declared is not None and frames != declared:
+        if frames == declared + 1:
+            report.add( 'W206', frames_line )
+        else:
+            report.add( 'E113', frames_line, f'Frames: says {declared}, found {frames}' )
+    return report.result( declared_frames=declared, frames=frames, channels=width )
+
+def _lint_job( filename:str, limit:int ) -> dict:
+    '''Pool worker.  Anything unexpected is a diagnostic, not a crash.'''
+    try:
+        return lint_file( filename, limit )
+    except Exception as err:
+        report = _Report( filename, limit )
+        report.add( 'E100', 0, f'{type(err).__name__}: {err}' )
+        return report.result()
+
+def lint_library( filenames:List[str], workers:int=None, limit:int=20 ) -> List[dict]:
+    '''lint_file for every file across a process pool, in order'''
+    with ProcessPoolExecutor( max_workers=workers ) as pool:
+        return list( pool.map( partial( _lint_job, limit=limit ), filenames, chunksize=16 ) )
+
+def summarize( results:List[dict] ) -> dict:
+    '''Totals over a library'''
+    counts = {}
+    for result in results:
+        for code, count in result['counts'].items():
+            counts[code] = counts.get( code, 0 ) + count
+    return { 'files' : len(results),
+             'ok' : sum( result['ok'] for result in results ),
+             'with_errors' : sum( result['errors'] > 0 for result in results ),
+             'with_warnings' : sum( result['warnings'] > 0 for result in results ),
+             'counts' : dict( sorted( counts.items() ) ) }
+
+DIAGNOSTIC_FIELDS = [ 'file', 'line', 'severity', 'code', 'message' ]
+'''Columns of a CSV diagnostic row'''
+
+def write_diagnostics( results:List[dict], output:str=None ):
+    '''Writes { summary, files } as JSON if output ends in .json, one CSV row
+       per diagnostic if it ends in .csv, and otherwise file:line: lines in
+       the style of a compiler followed by the summary.  output of None or -
+       is stdout.'''
+
+    to_stdout = output in ( None, '-' )
+    kind = '' if to_stdout else os.path.splitext( output )[1].lower()
+    fptr = sys.stdout if to_stdout else open( output, 'w', encoding='utf-8', newline='' )
+    try:
+        if kind == '.json':
+            json.dump( { 'summary' : summarize( results ), 'files' : results }, fptr, indent=1 )
+        elif kind == '.csv':
+            writer = csv.DictWriter( fptr, fieldnames=DIAGNOSTIC_FIELDS, extrasaction='ignore' )
+            writer.writeheader()
+            writer.writerows( { 'file' : result['file'], **diagnostic }
+                              for result in results for diagnostic in result['diagnostics'] )
+        else:
+            for result in results:
+                for diagnostic in sorted( result['diagnostics'], key=lambda d: d['line'] ):
+                    fptr.write( f"{result['file']}:{diagnostic['line']}: {diagnostic['severity']} "
+                                f"{diagnostic['code']} {diagnostic['message']}\n" )
+                hidden = sum( result['counts'].values() ) - len(result['diagnostics'])
+                if hidden > 0:
+                    fptr.write( f"{result['file']}: {hidden} more not shown\n" )
+            summary = summarize( results )
+            fptr.write( f"{summary['files']} files, {summary['ok']} ok, "
+                        f"{summary['with_errors']} with errors, {summary['with_warnings']} with warnings\n" )
+    finally:
+        if not to_stdout:
+            fptr.close()
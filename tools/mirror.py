@@ -0,0 +1,128 @@
+'''Left/right mirroring of whole clips.
+
+Joints are paired once from their aliases by _swap_sides, which is case
+sensitive: LEFT/RIGHT, Left/Right or left/right swapped, or a leading L/R
+(l/r) or a trailing _L/.r style suffix swapped, and the partner must pair
+back.  This is a stricter test than the first letter one bones.joint_color
+colors by.  Then every frame is reflected in one pass: each paired joint
+takes its partner's track, rotations are reflected by negating two
+quaternion components and positions by negating one coordinate.  Offsets
+are swapped and reflected too, so the world positions of the result are the
+exact mirror image even when the skeleton isn't symmetric.'''
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List
+import glm
+import numpy as np
+from tools.bvh_write import bvh_write
+from tools.files import output_paths
+from tools.motion import Motion
+from tools.skeleton import Skeleton
+
+AXES = { 'x' : 0, 'y' : 1, 'z' : 2 }
+'''Axis index by name, for the mirror plane's normal or bvh_ik's vertical.
+   x mirrors across the YZ plane.'''
+
+_SIDES = ( ( 'LEFT', 'RIGHT' ), ( 'Left', 'Right' ), ( 'left', 'right' ) )
+
+def _swap_sides( name:str ) -> list:
+    '''Candidate partner names, most specific first'''
+
+    candidates = []
+    for left, right in _SIDES:
+        if left in name:
+            candidates.append( name.replace( left, right ) )
+        if right in name:
+            candidates.append( name.replace( right, left ) )
+    swap = { 'L' : 'R', 'R' : 'L', 'l' : 'r', 'r' : 'l' }
+    if name[:1] in swap:
+        candidates.append( swap[name[0]] + name[1:] )
+    if len(name) > 1 and name[-2] in '_.' and name[-1] in swap:
+        candidates.append( name[:-1] + swap[name[-1]] )
+    return candidates
+
+def mirror_pairs( names:List[str] ) -> np.ndarray:
+    '''(joints,) index of each joint's mirror partner, itself for joints
+       on the center line or without a partner.'''
+
+    index = { name : i for i, name in enumerate( names ) }
+    pairs = np.arange( len(names) )
+    for i, name in enumerate( names ):
+        for candidate in _swap_sides( name ):
+            partner = index.get( candidate )
+            if partner is not None and partner != i:
+                pairs[i] = partner
+                break
+    #Only keep partners that agree, so the table is its own inverse.
+    return np.where( pairs[pairs] == np.arange( len(names) ), pairs, np.arange( len(names) ) )
+
+def reflect_vectors( vecs:np.ndarray, axis:int=0 ) -> np.ndarray:
+    '''(..., 3) vectors reflected across the plane normal to axis'''
+    result = np.array( vecs, dtype=float )
+    result[...,axis] *= -1.0
+    return result
+
+def reflect_quats( quats:np.ndarray, axis:int=0 ) -> np.ndarray:
+    '''(..., 4) w, x, y, z rotations reflected across the plane normal to
+       axis: the rotation about the normal is kept and the other two
+       components flip, so reflect_quats( q ) rotates reflected vectors the
+       way q rotates the originals.'''
+    result = np.array( quats, dtype=float )
+    result[...,1:] *= -1.0
+    result[...,1 + axis] *= -1.0
+    return result
+
+def mirror_motion( motion:Motion, axis:int=0, pairs:np.ndarray=None ) -> Motion:
+    '''The mirror image of a motion.  pairs defaults to mirror_pairs of the
+       joint names.'''
+
+    if pairs is None:
+        pairs = mirror_pairs( motion.names )
+    return Motion( motion.names, motion.parents, reflect_vectors( motion.offsets[pairs], axis ),
+                   reflect_quats( motion.rotations[:,pairs], axis ),
+                   reflect_vectors( motion.root_positions, axis ), motion.has_resting )
+
+def mirror_end_positions( skeleton:Skeleton, pairs:np.ndarray, axis:int=0 ):
+    '''Swaps and reflects the End Site offsets of a skeleton's joints, in
+       place, to match mirror_motion.  Joints without one are left alone.'''
+
+    joints = skeleton.ordered_joints()
+    ends = [ joint.end_position for joint in joints ]
+    for joint, partner in zip( joints, pairs ):
+        end = ends[partner]
+        if end is not None and joint.end_position is not None:
+            joint.end_position = glm.vec3( *reflect_vectors( tuple(end), axis ) )
+
+def mirror_file( filename:str, output:str, axis:int=0 ) -> int:
+    '''Writes the mirror image of a BVH file with bvh_write.  Returns the
+       number of joints that were paired.'''
+
+    motion, bvh = Motion.read( filename )
+    pairs = mirror_pairs( motion.names )
+    mirrored = mirror_motion( motion, axis, pairs )
+    mirror_end_positions( bvh.skeleton, pairs, axis )
+    bvh_write( mirrored.to_skeleton( bvh.skeleton ), output )
+    return int( ( pairs != np.arange( len(pairs) ) ).sum() )
+
+def _mirror_job( job:tuple, axis:int ):
+    '''Pool worker.  Errors are reported rather than aborting the batch.'''
+    filename, output = job
+    try:
+        return mirror_file( filename, output, axis )
+    except Exception as err:
+        print( f'Failed to mirror {filename}: {err}' )
+        return None
+
+def mirror_library( filenames:List[str], output_dir:str, axis:int=0, suffix:str='_mirror',
+                    workers:int=None ) -> list:
+    '''mirror_file for every file across a process pool, writing name +
+       suffix + .bvh into output_dir and keeping the folders of a library,
+       see files.output_paths.  Returns the paired joint count of each file,
+       None for failures.'''
+
+    os.makedirs( output_dir, exist_ok=True )
+    jobs = list( zip( filenames, output_paths( filenames, output_dir, suffix + '.bvh' ) ) )
+    with ProcessPoolExecutor( max_workers=workers ) as pool:
+        return list( pool.map( partial( _mirror_job, axis=axis ), jobs, chunksize=4 ) )
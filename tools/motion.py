@@ -0,0 +1,323 @@
+'''Array based storage and forward kinematics for a skeleton's animation.'''
+
+import re
+import glm
+import numpy as np
+from tools import nputils
+from tools.bvh import BVH
+from tools.skeleton import KeyFrame, Skeleton
+
+_BLOCK = 1 << 22    #Bytes of motion text parsed at a time.
+_BLANK = re.compile( rb'\n[ \t\r]*\n' )
+_AXES = { 'X' : 1, 'Y' : 2, 'Z' : 3 }
+
+def motion_blocks( fptr, width:int ):
+    '''Yields (rows, width) arrays of motion values, stopping at the first
+       blank line like the parser does.'''
+
+    tail = b''
+    while True:
+        data = fptr.read( _BLOCK )
+        text = tail + data
+        if not data:
+            tail = b''
+        else:
+            cut = text.rfind( b'\n' ) + 1
+            text, tail = text[:cut], text[cut:]
+
+        #The leading newline catches a blank first line.  A literal first
+        #character lets re skip ahead instead of trying every position.
+        blank = _BLANK.search( b'\n' + text )
+        if blank is not None:
+            text = text[:blank.start()]
+        values = np.fromstring( text.decode( 'ascii' ), sep=' ' ) if text.strip() else np.empty( 0 )
+        if len(values) % width:
+            raise Exception( f'Motion data is not a whole number of {width} channel frames' )
+        yield values.reshape( -1, width )
+        if blank is not None or not data:
+            return
+
+def read_channels( filename:str ) -> tuple:
+    '''Parses the header of a BVH file and reads every motion line into one
+       (lines, channels) array, resting pose included.  Returns the header-only
+       BVH and the array.'''
+
+    bvh = BVH()
+    offset = bvh.read_header( filename )
+    width = sum( len(chan.rotation) + len(chan.position) + len(chan.scale)
+                 for chan in bvh.channels )
+    with open( filename, 'rb' ) as fptr:
+        fptr.seek( offset )
+        blocks = list( motion_blocks( fptr, width ) )
+    values = np.concatenate( blocks ) if blocks else np.zeros( ( 0, width ) )
+    return bvh, values
+
+def _euler_quats( block:np.ndarray, rotation:dict ) -> np.ndarray:
+    '''(rows, 4) quaternions from a joint's rotation channels.  Each axis is
+       composed in file order, the same as BVH._extract_rotation.'''
+
+    quats = None
+    for axis, index in rotation.items():
+        half = np.radians( block[:,index] ) * 0.5
+        turn = np.zeros( ( len(block), 4 ) )
+        turn[:,0] = np.cos( half )
+        turn[:,_AXES[axis]] = np.sin( half )
+        quats = turn if quats is None else nputils.quat_multiply( quats, turn )
+    return quats
+
+def channel_arrays( bvh:BVH, values:np.ndarray ) -> tuple:
+    '''(lines, joints, 4) rotations in Skeleton.ordered_joints() order and
+       (lines, 3) root positions from a parsed header's motion values'''
+
+    joints = bvh.skeleton.ordered_joints()
+    index = { id(joint) : i for i, joint in enumerate( joints ) }
+    rotations = np.zeros( ( len(values), len(joints), 4 ) )
+    rotations[...,0] = 1.0
+    root_positions = np.zeros( ( len(values), 3 ) )
+    #Like the parser, a joint without rotation channels repeats the
+    #rotation of the joint before it in the file.
+    carried = None
+    for chan in bvh.channels:
+        if len(chan.rotation) > 0:
+            carried = _euler_quats( values, chan.rotation )
+        if carried is not None:
+            rotations[:,index[id(chan.joint)]] = carried
+        if chan.joint is joints[0]:
+            for axis, column in chan.position.items():
+                root_positions[:,_AXES[axis]-1] = values[:,column]
+    return rotations, root_positions
+
+def split_resting( rotations:np.ndarray, root_positions:np.ndarray, num_frames:int,
+                   resting:bool=None ) -> tuple:
+    '''Drops a leading resting pose.  Unless resting says whether there is
+       one, a line more than the num_frames declared is taken as one.
+       Returns the rotations, root positions and whether one was dropped.'''
+
+    has_resting = bool( resting )
+    if resting is None and len(rotations) != num_frames:
+        if len(rotations) != num_frames + 1:
+            raise Exception( f'Expected {num_frames} got {len(rotations)}' )
+        has_resting = True
+    if has_resting:
+        rotations, root_positions = rotations[1:], root_positions[1:]
+    return rotations, root_positions, has_resting
+
+class Motion:
+    '''A skeleton's animation as frame-major NumPy arrays.  Joints are laid
+       out in Skeleton.ordered_joints() order so the root is index 0 and
+       parents always precede their children.'''
+
+    def __init__( self, names, parents, offsets, rotations, root_positions, has_resting=False ):
+        self.names = list(names)
+        '''Joint aliases in array order'''
+        self.parents = np.asarray( parents, dtype=np.int32 )
+        '''Index of each joint's parent.  -1 for the root.'''
+        self.offsets = np.asarray( offsets, dtype=float )
+        '''(joints, 3) parent relative rest positions'''
+        self.rotations = np.asarray( rotations, dtype=float )
+        '''(frames, joints, 4) local rotations as w, x, y, z'''
+        self.root_positions = np.asarray( root_positions, dtype=float )
+        '''(frames, 3) translation channel of the root'''
+        self.has_resting = has_resting
+        '''True if the rotations are relative to an extracted resting pose.'''
+
+    @classmethod
+    def from_skeleton( cls, skeleton:Skeleton ):
+        '''Gathers the keyframes of a populated skeleton into arrays.  Joints
+           without keyframes or rotations are given the identity.'''
+
+        joints = skeleton.ordered_joints()
+        index = { id(joint) : i for i, joint in enumerate( joints ) }
+        num_frames = len( joints[0].frames )
+
+        parents = [ index[id(joint.parent)] if joint.parent is not None else -1
+                    for joint in joints ]
+        offsets = [ tuple(joint.position) for joint in joints ]
+
+        rotations = np.zeros( ( num_frames, len(joints), 4 ) )
+        rotations[...,0] = 1.0
+        for i, joint in enumerate( joints ):
+            quats = [ ( key.rotation.w, key.rotation.x, key.rotation.y, key.rotation.z )
+                      for key in joint.frames[:num_frames] if key.rotation is not None ]
+            if len(quats) == num_frames and num_frames > 0:
+                rotations[:,i] = quats
+
+        root_positions = np.zeros( ( num_frames, 3 ) )
+        positions = [ key.position for key in joints[0].frames if key.position is not None ]
+        if len(positions) == num_frames and num_frames > 0:
+            root_positions[:] = positions
+
+        return cls( [ joint.alias for joint in joints ], parents, offsets,
+                    rotations, root_positions, skeleton.has_resting )
+
+    @classmethod
+    def from_channels( cls, bvh:BVH, values:np.ndarray, resting:bool=None ):
+        '''Motion from a parsed header and its (lines, channels) motion values,
+           as returned by read_channels.  Unless resting says whether the
+           first line is a resting pose, one line more than the header
+           declares is taken as one.'''
+
+        rotations, root_positions = channel_arrays( bvh, values )
+        rotations, root_positions, has_resting = split_resting( rotations, root_positions,
+                                                                bvh.skeleton.num_frames, resting )
+        bvh.skeleton.has_resting = has_resting
+
+        joints = bvh.skeleton.ordered_joints()
+        index = { id(joint) : i for i, joint in enumerate( joints ) }
+        parents = [ index[id(joint.parent)] if joint.parent is not None else -1 for joint in joints ]
+        return cls( [ joint.alias for joint in joints ], parents,
+                    [ tuple(joint.position) for joint in joints ],
+                    rotations, root_positions, has_resting )
+
+    @classmethod
+    def read( cls, filename:str ):
+        '''Loads a BVH file straight into arrays without building a Skeleton's
+           keyframes, which is many times faster for long takes.  Gives the same
+           Motion as from_skeleton( BVH( filename ).skeleton ) up to glm's
+           float32 rounding.  Returns the Motion and the header-only BVH.'''
+
+        bvh, values = read_channels( filename )
+        return cls.from_channels( bvh, values ), bvh
+
+    def to_skeleton( self, skeleton:Skeleton ) -> Skeleton:
+        '''Replaces the keyframes of a skeleton with the same joints, such as
+           the header-only skeleton from Motion.read, with this motion so it
+           can be passed to bvh_write.  Offsets are copied too.  A resting
+           pose is folded into the rotations first, see without_resting.
+           Returns the skeleton.'''
+
+        joints = skeleton.ordered_joints()
+        if [ joint.alias for joint in joints ] != self.names:
+            raise Exception( 'Skeleton joints do not match the motion' )
+        motion = self.without_resting() if self.has_resting else self
+
+        for i, joint in enumerate( joints ):
+            joint.position = glm.vec3( *motion.offsets[i] )
+            joint.resting = None
+            joint.frames = []
+            for rotation in motion.rotations[:,i].tolist():
+                key = KeyFrame()
+                key.rotation = glm.quat( *rotation )
+                joint.frames.append( key )
+        for key, position in zip( joints[0].frames, motion.root_positions.tolist() ):
+            key.position = glm.vec3( *position )
+
+        skeleton.num_frames = motion.num_frames
+        skeleton.has_resting = False
+        skeleton.fix_end_positions()
+        skeleton.init_world_positions()
+        return skeleton
+
+    def without_resting( self, chunk:int=4096 ):
+        '''The same motion without a resting pose, the way bvh_write folds one
+           into the rotations it writes.  A resting pose applies each joint's
+           rotation before the world rotation of its parent instead of after,
+           so each local rotation is conjugated by that parent rotation.  The
+           world positions are unchanged.  Returns self if there is no
+           resting pose.'''
+
+        if not self.has_resting:
+            return self
+
+        rotations = np.empty_like( self.rotations )
+        for start in range( 0, self.num_frames, chunk ):
+            _, accumulated = self.world_transforms( start, start + chunk )
+            worlds = nputils.quat_conjugate( accumulated )
+            local = self.rotations[start:start+chunk]
+            rotations[start:start+chunk,0] = local[:,0]
+            parents = worlds[:,self.parents[1:]]
+            rotations[start:start+chunk,1:] = nputils.quat_multiply(
+                nputils.quat_multiply( parents, local[:,1:] ), nputils.quat_conjugate( parents ) )
+        return Motion( self.names, self.parents, self.offsets, rotations, self.root_positions )
+
+    @property
+    def num_frames( self ) -> int:
+        '''The number of frames of animation'''
+        return self.rotations.shape[0]
+
+    @property
+    def num_joints( self ) -> int:
+        '''The number of joints per frame'''
+        return self.rotations.shape[1]
+
+    @property
+    def unit_scale( self ) -> float:
+        '''Skeleton.set_unit_scale_factor from the offsets: the longest sum of
+           offset lengths from the root down to any joint.  1.0 for a rig
+           without any length.'''
+
+        lengths = np.linalg.norm( self.offsets, axis=-1 )
+        chains = np.zeros( self.num_joints )
+        for joint, parent in enumerate( self.parents ):
+            chains[joint] = lengths[joint] + ( chains[parent] if parent >= 0 else 0.0 )
+        longest = float( chains.max() ) if self.num_joints else 0.0
+        return longest if longest > 0.0 else 1.0
+
+    def take( self, frames ):
+        '''Returns a new Motion holding only the given frame indices.'''
+        frames = np.asarray( frames, dtype=int )
+        return Motion( self.names, self.parents, self.offsets, self.rotations[frames],
+                       self.root_positions[frames], self.has_resting )
+
+    def world_positions( self, start:int=0, stop:int=None ) -> np.ndarray:
+        '''Forward kinematics for frames [start, stop) of every joint at once.
+           Follows the same conventions as the viewer: each joint hands its
+           children its own rotation composed with what it received, and a
+           resting pose reverses the composition.  The root is placed at its
+           offset plus its translation channel.  Returns (frames, joints, 3).'''
+        return self.world_transforms( start, stop )[0]
+
+    def world_transforms( self, start:int=0, stop:int=None ) -> tuple:
+        '''Like world_positions but also returns the (frames, joints, 4)
+           accumulated rotation each joint hands to its children.'''
+
+        rotations = self.rotations[start:stop]
+        num_frames = rotations.shape[0]
+        positions = np.empty( ( num_frames, self.num_joints, 3 ) )
+        accumulated = np.empty( ( num_frames, self.num_joints, 4 ) )
+
+        if self.has_resting:
+            rotations = nputils.quat_conjugate( rotations )
+
+        for joint, parent in enumerate( self.parents ):
+            if parent < 0:
+                incoming = nputils.identity_quats( num_frames )
+                positions[:,joint] = self.offsets[joint] + self.root_positions[start:stop]
+            else:
+                incoming = accumulated[:,parent]
+                turn = nputils.quat_conjugate( incoming ) if self.has_resting else incoming
+                positions[:,joint] = positions[:,parent] + \
+                                     nputils.rotate_vectors( turn, self.offsets[joint] )
+            accumulated[:,joint] = nputils.quat_multiply( rotations[:,joint], incoming )
+        return positions, accumulated
+
+class Track:
+    '''World positions for every frame of a motion, computed lazily a chunk of
+       frames at a time so playback only ever indexes into an array.'''
+
+    def __init__( self, motion:Motion, chunk_size:int=256 ):
+        self.motion = motion
+        self.chunk_size = chunk_size
+        '''Number of frames computed at once'''
+        self.positions = np.empty( ( motion.num_frames, motion.num_joints, 3 ), dtype=np.float32 )
+        '''(frames, joints, 3) world positions.  Only valid for computed chunks.'''
+        self._ready = np.zeros( ( motion.num_frames + chunk_size - 1 ) // chunk_size, dtype=bool )
+
+    def __len__( self ) -> int:
+        return self.motion.num_frames
+
+    def __getitem__( self, frame:int ) -> np.ndarray:
+        '''The (joints, 3) world positions of a frame'''
+
+        chunk = frame // self.chunk_size
+        if not self._ready[chunk]:
+            start = chunk * self.chunk_size
+            stop = start + self.chunk_size
+            self.positions[start:stop] = self.motion.world_positions( start, stop )
+            self._ready[chunk] = True
+        return self.positions[frame]
+
+    def fill( self ):
+        '''Computes every frame that hasn't been computed yet.'''
+        for chunk in np.nonzero( ~self._ready )[0]:
+            self[ chunk * self.chunk_size ]
@@ -0,0 +1,210 @@
+'''A searchable index of poses over a clip library.
+
+Every window of frames in every clip becomes a feature vector of root
+relative joint positions, scaled to unit skeleton size so performers of
+different heights compare.  The vectors are reduced with PCA and grouped
+with k-means into an inverted file: a query only visits the rows of the few
+clusters nearest to it, so it stays fast as the library grows into millions
+of windows.  The index is a single .npz file.'''
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List
+import numpy as np
+from tools.bvh import BVH
+from tools.motion import Motion
+
+def window_features( relative:np.ndarray, window:int=1, stride:int=1 ):
+    '''Feature vectors for every window of (frames, joints, 3) root relative
+       positions.  Returns the first frame of each window and a
+       (windows, window * joints * 3) float32 array, with no rows if the clip
+       is shorter than a window.'''
+
+    if len(relative) < window:
+        width = window * relative.shape[1] * relative.shape[2]
+        return np.empty( 0, dtype=np.int64 ), np.empty( ( 0, width ), dtype=np.float32 )
+    starts = np.arange( 0, len(relative) - window + 1, stride )
+    frames = relative[ starts[:,None] + np.arange( window ) ]
+    return starts, frames.reshape( len(starts), -1 ).astype( np.float32 )
+
+def clip_features( filename:str, joints:List[str]=None, window:int=1, stride:int=1 ):
+    '''Loads a clip and returns window_features of the named joints' positions
+       relative to the root and scaled to unit skeleton size.  joints defaults
+       to every non-root joint in Skeleton.ordered_joints() order.'''
+
+    skel = BVH( filename ).skeleton
+    skel.set_unit_scale_factor()
+    motion = Motion.from_skeleton( skel )
+    if joints is None:
+        joints = motion.names[1:]
+    missing = [ name for name in joints if name not in motion.names ]
+    if missing:
+        raise Exception( f'{filename} has no joints named {" ".join(missing)}' )
+
+    positions = motion.world_positions()
+    picks = [ motion.names.index( name ) for name in joints ]
+    relative = ( positions[:,picks] - positions[:,:1] ) / skel.scale_factor
+    return window_features( relative, window, stride )
+
+def _features_job( filename:str, **kwargs ):
+    '''Pool worker.  Errors are reported rather than aborting the build.'''
+    try:
+        return clip_features( filename, **kwargs )
+    except Exception as err:
+        print( f'Failed to index {filename}: {err}' )
+        return None
+
+def _nearest( points:np.ndarray, centroids:np.ndarray, chunk:int=65536 ) -> np.ndarray:
+    '''Index of the closest centroid to each point, a chunk at a time so the
+       distance matrix stays small.'''
+
+    labels = np.empty( len(points), dtype=np.int32 )
+    centroid_sqr = ( centroids * centroids ).sum( axis=1 )
+    for start in range( 0, len(points), chunk ):
+        block = points[start:start+chunk]
+        dist = centroid_sqr[None,:] - 2.0 * block @ centroids.T
+        labels[start:start+chunk] = dist.argmin( axis=1 )
+    return labels
+
+def _kmeans( points:np.ndarray, clusters:int, iterations:int=10, seed:int=0 ) -> np.ndarray:
+    '''Lloyd's k-means on a sample of the points.  Returns the centroids.'''
+
+    rng = np.random.default_rng( seed )
+    sample = points[ rng.choice( len(points), min( len(points), 64 * clusters ), replace=False ) ]
+    centroids = sample[ rng.choice( len(sample), clusters, replace=False ) ].copy()
+    for _ in range( iterations ):
+        labels = _nearest( sample, centroids )
+        counts = np.bincount( labels, minlength=clusters )
+        sums = np.zeros_like( centroids )
+        np.add.at( sums, labels, sample )
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled,None]
+    return centroids
+
+class MotionIndex:
+    '''Windows of pose features from many clips, searchable by nearest
+       neighbour.  Build with MotionIndex.build or MotionIndex.load.'''
+
+    def __init__( self, clips, joints, window, clip_ids, frames, mean, components,
+                  centroids, starts, features ):
+        self.clips = list(clips)
+        '''Filenames of the indexed clips'''
+        self.joints = list(joints)
+        '''Joint names making up each feature, excluding the root'''
+        self.window = int(window)
+        '''Frames per feature vector'''
+        self.clip_ids = clip_ids
+        '''(rows,) index into clips of each row'''
+        self.frames = frames
+        '''(rows,) first frame of each row's window'''
+        self.mean = mean
+        '''Mean raw feature, subtracted before projecting'''
+        self.components = components
+        '''(dims, raw dims) PCA projection'''
+        self.centroids = centroids
+        '''(clusters, dims) k-means centers'''
+        self.starts = starts
+        '''(clusters + 1,) rows of cluster i are starts[i]:starts[i+1]'''
+        self.features = features
+        '''(rows, dims) projected features, sorted by cluster'''
+
+    def __len__( self ) -> int:
+        return len(self.frames)
+
+    @classmethod
+    def build( cls, filenames:List[str], joints:List[str]=None, window:int=1, stride:int=1,
+               dims:int=32, clusters:int=None, workers:int=None, seed:int=0 ):
+        '''Indexes every clip.  joints defaults to every non-root joint of the
+           first clip; clips missing any of them are skipped.  dims is the
+           PCA size and clusters defaults to the square root of the rows.'''
+
+        if joints is None:
+            bvh = BVH()
+            bvh.read_header( filenames[0] )
+            joints = [ joint.alias for joint in bvh.skeleton.ordered_joints()[1:] ]
+
+        job = partial( _features_job, joints=joints, window=window, stride=stride )
+        with ProcessPoolExecutor( max_workers=workers ) as pool:
+            results = list( pool.map( job, filenames, chunksize=4 ) )
+
+        clips, clip_ids, frames, features = [], [], [], []
+        for filename, result in zip( filenames, results ):
+            if result is None or len(result[0]) == 0:
+                continue
+            clip_ids.append( np.full( len(result[0]), len(clips), dtype=np.int32 ) )
+            frames.append( result[0].astype( np.int32 ) )
+            features.append( result[1] )
+            clips.append( filename )
+        if not clips:
+            raise Exception( 'No clips could be indexed' )
+
+        raw = np.concatenate( features )
+        mean = raw.mean( axis=0 )
+        rng = np.random.default_rng( seed )
+        sample = raw[ rng.choice( len(raw), min( len(raw), 20000 ), replace=False ) ] - mean
+        components = np.linalg.svd( sample, full_matrices=False )[2][:dims].astype( np.float32 )
+        projected = ( raw - mean ) @ components.T
+
+        if clusters is None:
+            clusters = int( np.sqrt( len(projected) ) )
+        clusters = max( 1, min( clusters, len(projected) ) )
+        centroids = _kmeans( projected, clusters, seed=seed )
+        labels = _nearest( projected, centroids )
+        order = np.argsort( labels, kind='stable' )
+        starts = np.searchsorted( labels[order], np.arange( clusters + 1 ) )
+
+        return cls( clips, joints, window, np.concatenate( clip_ids )[order],
+                    np.concatenate( frames )[order], mean, components, centroids,
+                    starts, np.ascontiguousarray( projected[order] ) )
+
+    def save( self, filename:str ):
+        '''Writes the index as an uncompressed .npz'''
+        meta = json.dumps( { 'clips' : self.clips, 'joints' : self.joints, 'window' : self.window } )
+        np.savez( filename, meta=np.array( meta ), clip_ids=self.clip_ids, frames=self.frames,
+                  mean=self.mean, components=self.components, centroids=self.centroids,
+                  starts=self.starts, features=self.features )
+
+    @classmethod
+    def load( cls, filename:str ):
+        '''Reads an index written by save'''
+        with np.load( filename ) as data:
+            meta = json.loads( str( data['meta'] ) )
+            return cls( meta['clips'], meta['joints'], meta['window'], data['clip_ids'],
+                        data['frames'], data['mean'], data['components'], data['centroids'],
+                        data['starts'], data['features'] )
+
+    def query( self, feature:np.ndarray, k:int=10, probes:int=8 ) -> list:
+        '''The k nearest rows to one raw feature vector, closest first, as
+           (clip filename, frame, distance) tuples.  Only the rows of the
+           `probes` nearest clusters are searched; pass probes >= the number
+           of clusters for an exact search.  Distances are in PCA space.'''
+
+        point = ( np.asarray( feature, dtype=np.float32 ) - self.mean ) @ self.components.T
+        #k-means can leave clusters empty.  They are never probed so the
+        #probes all go to clusters with rows in them.
+        filled = np.flatnonzero( np.diff( self.starts ) > 0 )
+        probes = min( probes, len(filled) )
+        if probes < 1 or k < 1:
+            return []
+        near = filled[ np.argpartition( ( ( self.centroids[filled] - point ) ** 2 ).sum( axis=1 ),
+                                        probes - 1 )[:probes] ]
+        rows = np.concatenate( [ np.arange( self.starts[c], self.starts[c+1] ) for c in near ] )
+
+        dist = ( ( self.features[rows] - point ) ** 2 ).sum( axis=1 )
+        k = min( k, len(rows) )
+        best = np.argpartition( dist, k - 1 )[:k]
+        best = best[ np.argsort( dist[best] ) ]
+        return [ ( self.clips[ self.clip_ids[rows[i]] ], int( self.frames[rows[i]] ),
+                   float( np.sqrt( dist[i] ) ) ) for i in best ]
+
+    def query_clip( self, filename:str, frame:int, k:int=10, probes:int=8 ) -> list:
+        '''Like query, using the window starting at a frame of a clip'''
+
+        starts, features = clip_features( filename, self.joints, self.window )
+        if len(starts) == 0:
+            raise Exception( f'{filename} is shorter than the {self.window} frame window' )
+        row = np.searchsorted( starts, frame )
+        if row >= len(starts) or starts[row] != frame:
+            raise Exception( f'Frame {frame} has no full window in {filename}' )
+        return self.query( features[row], k, probes )
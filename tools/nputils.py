@@ -0,0 +1,212 @@
+"""
+NumPy counterparts of the putils functions that operate on whole arrays
+at once.  Quaternions are (..., 4) arrays in w, x, y, z order to match
+the glm.quat constructor and vectors are (..., 3) arrays.
+"""
+
+import numpy as np
+
+def identity_quats(count:int) -> np.ndarray:
+    '''Returns a (count, 4) array of identity quaternions'''
+    quats = np.zeros( ( count, 4 ) )
+    quats[:,0] = 1.0
+    return quats
+
+def quat_conjugate(quats:np.ndarray) -> np.ndarray:
+    '''Conjugate of each quaternion.  Matches glm.conjugate'''
+    result = np.array( quats, dtype=float )
+    result[...,1:] *= -1.0
+    return result
+
+def quat_multiply(quat_a:np.ndarray, quat_b:np.ndarray) -> np.ndarray:
+    '''The Hamilton product quat_a * quat_b, broadcasting over leading axes.
+       Matches glm's quat * quat.'''
+
+    aw, ax, ay, az = np.moveaxis( np.asarray( quat_a, dtype=float ), -1, 0 )
+    bw, bx, by, bz = np.moveaxis( np.asarray( quat_b, dtype=float ), -1, 0 )
+    return np.stack( ( aw*bw - ax*bx - ay*by - az*bz,
+                       aw*bx + ax*bw + ay*bz - az*by,
+                       aw*by - ax*bz + ay*bw + az*bx,
+                       aw*bz + ax*by - ay*bx + az*bw ), axis=-1 )
+
+def _interpolation_terms(quat_a, quat_b, weights) -> tuple:
+    '''Float copies of the quaternions with quat_b flipped into quat_a's
+       hemisphere, their (absolute) dot products and weights shaped (..., 1)'''
+
+    quat_a = np.asarray( quat_a, dtype=float )
+    quat_b = np.asarray( quat_b, dtype=float )
+    dot = ( quat_a * quat_b ).sum( axis=-1, keepdims=True )
+    quat_b = np.where( dot < 0.0, -quat_b, quat_b )
+    return quat_a, quat_b, np.abs( dot ), np.asarray( weights, dtype=float )[...,None]
+
+def quat_nlerp(quat_a:np.ndarray, quat_b:np.ndarray, weights) -> np.ndarray:
+    '''Normalized linear interpolation the short way round from quat_a
+       (weight 0) to quat_b (weight 1).  weights broadcast against the
+       leading axes.  Cheaper than quat_slerp and close for small angles.'''
+
+    quat_a, quat_b, _, weights = _interpolation_terms( quat_a, quat_b, weights )
+    result = quat_a + weights * ( quat_b - quat_a )
+    return result / np.linalg.norm( result, axis=-1, keepdims=True )
+
+def quat_slerp(quat_a:np.ndarray, quat_b:np.ndarray, weights) -> np.ndarray:
+    '''Spherical linear interpolation the short way round from quat_a
+       (weight 0) to quat_b (weight 1).  weights broadcast against the
+       leading axes.  Matches glm.slerp, falling back to nlerp for nearly
+       equal rotations.'''
+
+    quat_a, quat_b, dot, weights = _interpolation_terms( quat_a, quat_b, weights )
+    theta = np.arccos( np.minimum( dot, 1.0 ) )
+    sin_theta = np.sin( theta )
+    linear = sin_theta < 1e-6
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        scale_a = np.where( linear, 1.0 - weights, np.sin( ( 1.0 - weights ) * theta ) / sin_theta )
+        scale_b = np.where( linear, weights, np.sin( weights * theta ) / sin_theta )
+    result = scale_a * quat_a + scale_b * quat_b
+    if linear.any():
+        result = result / np.linalg.norm( result, axis=-1, keepdims=True )
+    return result
+
+def rotate_vectors(quats:np.ndarray, vecs:np.ndarray) -> np.ndarray:
+    '''Rotates each vector by its quaternion.  Matches glm's quat * vec3.
+       Note putils.rotate_vector (vec * quat) is the inverse rotation, use
+       quat_conjugate to get the same result.'''
+
+    quats = np.asarray( quats, dtype=float )
+    vecs = np.asarray( vecs, dtype=float )
+    q_w = quats[...,:1]
+    q_v = quats[...,1:]
+    uv = np.cross( q_v, vecs )
+    uuv = np.cross( q_v, uv )
+    return vecs + 2.0 * ( q_w * uv + uuv )
+
+def magnitude(vecs:np.ndarray) -> np.ndarray:
+    '''Returns the magnitude of each vector'''
+    return np.linalg.norm( np.asarray( vecs, dtype=float ), axis=-1 )
+
+def distance_3d(vecs1:np.ndarray, vecs2:np.ndarray) -> np.ndarray:
+    '''Distance between each pair of points.  Matches putils.distance_3d'''
+    return magnitude( np.asarray( vecs1, dtype=float ) - np.asarray( vecs2, dtype=float ) )
+
+def quat_to_euler(quats:np.ndarray) -> np.ndarray:
+    '''Converts quaternions to Eulers in XYZ order as radians.  Matches
+       putils.quat_to_euler, including glm's handling of the singularities.'''
+
+    quats = np.asarray( quats, dtype=float )
+    quats = quats / np.linalg.norm( quats, axis=-1, keepdims=True )
+    q_w, q_x, q_y, q_z = np.moveaxis( quats, -1, 0 )
+    eps = np.finfo( np.float32 ).eps
+
+    pitch_y = 2.0 * ( q_y * q_z + q_w * q_x )
+    pitch_x = q_w * q_w - q_x * q_x - q_y * q_y + q_z * q_z
+    pitch_singular = ( np.abs( pitch_x ) < eps ) & ( np.abs( pitch_y ) < eps )
+    pitch = np.where( pitch_singular, 2.0 * np.arctan2( q_x, q_w ), np.arctan2( pitch_y, pitch_x ) )
+
+    yaw = np.arcsin( np.clip( -2.0 * ( q_x * q_z - q_w * q_y ), -1.0, 1.0 ) )
+
+    roll_y = 2.0 * ( q_x * q_y + q_w * q_z )
+    roll_x = q_w * q_w + q_x * q_x - q_y * q_y - q_z * q_z
+    roll_singular = ( np.abs( roll_x ) < eps ) & ( np.abs( roll_y ) < eps )
+    roll = np.where( roll_singular, 0.0, np.arctan2( roll_y, roll_x ) )
+
+    return np.stack( ( pitch, yaw, roll ), axis=-1 )
+
+def _components(vecs) -> tuple:
+    '''Splits (..., n) into n contiguous float arrays of shape (...)'''
+    return tuple( np.moveaxis( np.asarray( vecs, dtype=float ), -1, 0 ).copy() )
+
+def shortest_arc(points_a:np.ndarray, points_b:np.ndarray) -> np.ndarray:
+    '''Quaternions representing the shortest arc between each pair of vectors.
+       Matches putils.shortest_arc with the (anti)parallel and zero magnitude
+       cases chosen by masks.'''
+
+    a_x, a_y, a_z = _components( points_a )
+    b_x, b_y, b_z = _components( points_b )
+
+    ab_dot = a_x * b_x + a_y * b_y + a_z * b_z
+    c_x = a_y * b_z - a_z * b_y
+    c_y = a_z * b_x - a_x * b_z
+    c_z = a_x * b_y - a_y * b_x
+    cross_sqr = c_x * c_x + c_y * c_y + c_z * c_z
+
+    #General case, the arguments have magnitude and aren't (anti)parallel
+    sqr = np.sqrt( ab_dot * ab_dot + cross_sqr ) + ab_dot
+    #Degenerate rows divide by zero here and are overwritten below.
+    result = np.empty( ab_dot.shape + (4,) )
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        mag = 1.0 / np.sqrt( cross_sqr + sqr * sqr )
+        np.multiply( sqr, mag, out=result[...,0] )
+        np.multiply( c_x, mag, out=result[...,1] )
+        np.multiply( c_y, mag, out=result[...,2] )
+        np.multiply( c_z, mag, out=result[...,3] )
+
+    special = cross_sqr <= 0.0
+    if special.any():
+        #Zero magnitude or parallel is the identity.
+        result[special] = ( 1.0, 0.0, 0.0, 0.0 )
+
+        #Anti-parallel, an axis has to be chosen from the XY projection
+        anti = special & ( ab_dot < 0.0 )
+        p_x = ( a_x - b_x )[anti]
+        p_y = ( a_y - b_y )[anti]
+        p_mag = np.sqrt( p_x * p_x + p_y * p_y )
+        projected = p_mag > 0.0000001
+        with np.errstate( divide='ignore', invalid='ignore' ):
+            axis = np.stack( ( np.zeros( p_mag.shape ),
+                               np.where( projected, -p_y / p_mag, 1.0 ),
+                               np.where( projected, p_x / p_mag, 0.0 ),
+                               np.zeros( p_mag.shape ) ), axis=-1 )
+        result[anti] = axis
+    return result
+
+def dir_to_quat(dir_vecs:np.ndarray, up_str) -> np.ndarray:
+    '''Quaternions facing each direction.  up_str is x, y or z for every
+       direction or an array of up vectors.  Matches putils.dir_to_quat,
+       including NaNs when a direction is parallel to up.'''
+
+    if isinstance( up_str, str ):
+        up_vec = np.zeros( 3 )
+        up_vec[ 'xyz'.index( up_str.lower() ) ] = 1.0
+    else:
+        up_vec = up_str
+    d_x, d_y, d_z = _components( dir_vecs )
+    u_x, u_y, u_z = _components( up_vec )
+
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        inv = 1.0 / np.sqrt( d_x * d_x + d_y * d_y + d_z * d_z )
+        f_x, f_y, f_z = d_x * inv, d_y * inv, d_z * inv
+        s_x = f_y * u_z - f_z * u_y
+        s_y = f_z * u_x - f_x * u_z
+        s_z = f_x * u_y - f_y * u_x
+        inv = 1.0 / np.sqrt( s_x * s_x + s_y * s_y + s_z * s_z )
+        s_x, s_y, s_z = s_x * inv, s_y * inv, s_z * inv
+    v_x = s_y * f_z - s_z * f_y
+    v_y = s_z * f_x - s_x * f_z
+    v_z = s_x * f_y - s_y * f_x
+
+    #glm.quat_cast of lookAt's rotation rows (side, up, -forward).  The
+    #largest component is picked with the same strict comparisons as glm.
+    m00, m11, m22 = s_x, v_y, -f_z
+    four = ( m00 + m11 + m22, m00 - m11 - m22, m11 - m00 - m22, m22 - m00 - m11 )
+    biggest = np.zeros( m00.shape, dtype=np.intp )
+    biggest_sqr = four[0]
+    for index in range( 1, 4 ):
+        greater = four[index] > biggest_sqr
+        biggest = np.where( greater, index, biggest )
+        biggest_sqr = np.where( greater, four[index], biggest_sqr )
+
+    biggest_val = np.sqrt( biggest_sqr + 1.0 ) * 0.5
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        mult = 0.25 / biggest_val
+    d_yz = ( -f_y - v_z ) * mult
+    d_zx = ( s_z + f_x ) * mult
+    d_xy = ( v_x - s_y ) * mult
+    s_xy = ( v_x + s_y ) * mult
+    s_zx = ( s_z - f_x ) * mult
+    s_yz = ( v_z - f_y ) * mult
+
+    result = np.empty( m00.shape + (4,) )
+    np.choose( biggest, ( biggest_val, d_yz, d_zx, d_xy ), out=result[...,0] )
+    np.choose( biggest, ( d_yz, biggest_val, s_xy, s_zx ), out=result[...,1] )
+    np.choose( biggest, ( d_zx, s_xy, biggest_val, s_yz ), out=result[...,2] )
+    np.choose( biggest, ( d_xy, s_zx, s_yz, biggest_val ), out=result[...,3] )
+    return result
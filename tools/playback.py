@@ -0,0 +1,161 @@
+'''Wall-clock driven playback timing for the viewer.'''
+
+import time
+
+class PlaybackStats:
+    '''Counters describing how well playback is keeping up'''
+
+    def __init__( self ):
+        self.presented = 0
+        '''Number of frames handed to the renderer'''
+        self.dropped = 0
+        '''Number of animation frames skipped over to stay in sync'''
+        self.render_count = 0
+        '''Number of timed renders'''
+        self.render_total = 0.0
+        '''Total seconds spent rendering'''
+        self.render_max = 0.0
+        '''Slowest render in seconds'''
+
+    @property
+    def render_mean( self ) -> float:
+        '''Average seconds per render'''
+        if self.render_count == 0:
+            return 0.0
+        return self.render_total / self.render_count
+
+    def __str__( self ):
+        return f'presented {self.presented} dropped {self.dropped} ' \
+               f'render mean {self.render_mean*1000.0:.2f}ms max {self.render_max*1000.0:.2f}ms'
+
+class PlaybackClock:
+    '''Derives the frame to display from a monotonic clock rather than
+       counting timer ticks, so playback stays in sync when rendering falls
+       behind.  Frames that can't be shown in time are skipped and the
+       fractional part of the frame can be used to interpolate.'''
+
+    def __init__( self, num_frames:int, frame_time:float, loop:bool=True, clock=time.monotonic ):
+        self.num_frames = num_frames
+        '''Number of frames in the clip'''
+        self.frame_time = frame_time
+        '''Seconds per frame'''
+        self.loop = loop
+        '''Wrap around at the end of the clip instead of stopping'''
+        self.speed = 1.0
+        '''Playback speed multiplier.  Negative plays backwards.'''
+        self.stats = PlaybackStats()
+        self._clock = clock
+        self._anchor = clock()  #Wall time at which _anchor_time was current
+        self._anchor_time = 0.0 #Clip time in seconds at _anchor
+        self._playing = False
+        self._last_index = None
+        self._render_start = None
+
+    @property
+    def playing( self ) -> bool:
+        '''True while the clock is advancing'''
+        return self._playing
+
+    @property
+    def duration( self ) -> float:
+        '''Length of the clip in seconds'''
+        return self.num_frames * self.frame_time
+
+    def _rebase( self ):
+        '''Folds elapsed time into the anchor before the speed or state changes.'''
+        self._anchor_time = self.time()
+        self._anchor = self._clock()
+
+    def time( self ) -> float:
+        '''Seconds into the clip'''
+
+        clip_time = self._anchor_time
+        if self._playing:
+            clip_time += ( self._clock() - self._anchor ) * self.speed
+
+        duration = self.duration
+        if duration <= 0.0:
+            return 0.0
+        if self.loop:
+            return clip_time % duration
+        return min( max( clip_time, 0.0 ), duration - self.frame_time )
+
+    def play( self ):
+        '''Starts advancing from the current time'''
+        if not self._playing:
+            self._anchor = self._clock()
+            self._playing = True
+
+    def pause( self ):
+        '''Stops advancing, holding the current time'''
+        if self._playing:
+            self._rebase()
+            self._playing = False
+
+    def toggle( self ):
+        '''Switches between play and pause'''
+        if self._playing:
+            self.pause()
+        else:
+            self.play()
+
+    def set_speed( self, speed:float ):
+        '''Changes the playback speed without jumping'''
+        self._rebase()
+        self.speed = speed
+
+    def seek( self, frame:float ):
+        '''Scrubs to a frame, which may be fractional'''
+        self._anchor_time = frame * self.frame_time
+        self._anchor = self._clock()
+        self._last_index = None
+
+    def step( self, frames:int ):
+        '''Scrubs forward or backward by a number of frames'''
+        self.seek( round( self.frame() ) + frames )
+
+    def frame( self ) -> float:
+        '''The current fractional frame'''
+        if self.frame_time <= 0.0:
+            return 0.0
+        return self.time() / self.frame_time
+
+    def tick( self ):
+        '''Called once per displayed frame.  Returns (index, next_index, blend)
+           where blend is how far to interpolate from index towards next_index.
+           Updates the presented and dropped frame counts.'''
+
+        if self.num_frames <= 0:
+            return 0, 0, 0.0
+
+        current = self.frame()
+        index = min( int(current), self.num_frames - 1 )
+        blend = current - index
+        next_index = index + 1
+        if next_index >= self.num_frames:
+            next_index = 0 if self.loop else index
+            if not self.loop:
+                blend = 0.0
+
+        if self._playing and self._last_index is not None and index != self._last_index:
+            step = ( index - self._last_index ) if self.speed >= 0 else ( self._last_index - index )
+            if self.loop:
+                step %= self.num_frames
+            self.stats.dropped += max( step - 1, 0 )
+        self._last_index = index
+        self.stats.presented += 1
+        return index, next_index, blend
+
+    def begin_render( self ):
+        '''Marks the start of a render for timing'''
+        self._render_start = time.perf_counter()
+
+    def end_render( self ):
+        '''Marks the end of a render and records how long it took'''
+        if self._render_start is None:
+            return
+        elapsed = time.perf_counter() - self._render_start
+        self._render_start = None
+        self.stats.render_count += 1
+        self.stats.render_total += elapsed
+        self.stats.render_max = max( self.stats.render_max, elapsed )
@@ -0,0 +1,168 @@
+'''Per-phase timing of BVH loads.  Pass a LoadProfile to BVH to find out
+whether a slow load is spent parsing, building quaternions or in one of the
+skeleton's post-load passes.'''
+
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, List
+
+class PhaseTiming:
+    '''The cost of one phase of a load'''
+
+    def __init__( self, name:str ):
+        self.name = name
+        self.seconds = 0.0
+        '''Wall time spent in the phase'''
+        self.frames = None
+        '''Frames handled by the phase, if it works on frames'''
+        self.bytes = None
+        '''Bytes of the file consumed by the phase, if it reads the file'''
+        self.allocated = None
+        '''Net bytes still allocated when the phase ended.  tracemalloc only.'''
+        self.peak = None
+        '''Highest traced allocation during the phase.  tracemalloc only.'''
+        self.blocks = None
+        '''Net number of memory blocks allocated.  tracemalloc only.'''
+
+    @property
+    def frames_per_second( self ) -> float:
+        if self.frames is None or self.seconds <= 0.0:
+            return None
+        return self.frames / self.seconds
+
+    @property
+    def bytes_per_second( self ) -> float:
+        if self.bytes is None or self.seconds <= 0.0:
+            return None
+        return self.bytes / self.seconds
+
+    def __str__( self ) -> str:
+        text = f'{self.name:22s} {self.seconds*1000.0:10.2f} ms'
+        if self.frames_per_second is not None:
+            text += f' {self.frames_per_second:12.0f} frames/s'
+        if self.bytes_per_second is not None:
+            text += f' {self.bytes_per_second/1e6:8.2f} MB/s'
+        if self.peak is not None:
+            text += f' {self.allocated/1e6:+8.2f} MB net {self.peak/1e6:8.2f} MB peak {self.blocks:+d} blocks'
+        return text
+
+class LoadProfile:
+    '''Collects a PhaseTiming for each phase of a load.  callback, if given,
+       is called with each PhaseTiming as it completes.  With trace_memory
+       tracemalloc is started for the phases, which slows them down noticeably.'''
+
+    def __init__( self, callback:Callable=None, trace_memory:bool=False ):
+        self.callback = callback
+        self.trace_memory = trace_memory
+        self.phases : List[PhaseTiming] = []
+        '''Completed phases in the order they ran'''
+
+    @contextmanager
+    def phase( self, name:str ):
+        '''Times the body of a with block.  The PhaseTiming is yielded so the
+           caller can fill in frames and bytes.'''
+
+        timing = PhaseTiming( name )
+        start = time.perf_counter()
+        with self._traced( timing ):
+            try:
+                yield timing
+            finally:
+                timing.seconds = time.perf_counter() - start
+        self._record( timing )
+
+    @contextmanager
+    def interleaved( self, *names:str ):
+        '''Like phase for phases whose work is interleaved, such as reading
+           and parsing a file a line at a time.  A PhaseTiming is yielded for
+           each name and the caller adds up the seconds spent in each.
+           Allocation figures cover the whole block and go on the last one.'''
+
+        timings = tuple( PhaseTiming( name ) for name in names )
+        with self._traced( timings[-1] ):
+            yield timings
+        for timing in timings:
+            self._record( timing )
+
+    @contextmanager
+    def _traced( self, timing:PhaseTiming ):
+        '''Fills in timing's allocation figures for the body when tracing'''
+
+        if not self.trace_memory:
+            yield
+            return
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            timing.allocated = current - base
+            timing.peak = peak - base
+            after = tracemalloc.take_snapshot()
+            timing.blocks = sum( stat.count_diff for stat in after.compare_to( before, 'filename' ) )
+            if started_tracing:
+                tracemalloc.stop()
+
+    def _record( self, timing:PhaseTiming ):
+        self.phases.append( timing )
+        if self.callback is not None:
+            self.callback( timing )
+
+    @property
+    def total_seconds( self ) -> float:
+        '''Wall time over all phases'''
+        return sum( timing.seconds for timing in self.phases )
+
+    def report( self ) -> str:
+        '''A table of the phases, one per line'''
+        lines = [ str(timing) for timing in self.phases ]
+        lines.append( f'{"total":22s} {self.total_seconds*1000.0:10.2f} ms' )
+        return '\n'.join( lines )
+
+class _Untimed:
+    '''Stand-in for LoadProfile.phase when profiling is off.  Hands out a
+       scratch PhaseTiming so callers don't need to check.'''
+
+    def __init__( self ):
+        self.timing = PhaseTiming( 'untimed' )
+
+    def __enter__( self ) -> PhaseTiming:
+        return self.timing
+
+    def __exit__( self, *exc ):
+        return False
+
+class NullProfile:
+    '''A LoadProfile that records nothing'''
+
+    _untimed = _Untimed()
+
+    def phase( self, name:str ):
+        return self._untimed
+
+    @contextmanager
+    def interleaved( self, *names:str ):
+        yield tuple( PhaseTiming( name ) for name in names )
+
+NULL_PROFILE = NullProfile()
+'''Shared do-nothing profile used when none is passed'''
+
+def add_profile_arguments( parser ):
+    '''Adds the --profile and --profile_memory flags to a CLI's parser'''
+    parser.add_argument( '--profile', action='store_true',
+                         help='Print how long each phase of loading took.' )
+    parser.add_argument( '--profile_memory', action='store_true',
+                         help='Like --profile but also trace allocations.  Slower.' )
+
+def profile_from_args( args ) -> LoadProfile:
+    '''A LoadProfile if either profile flag was given, otherwise None'''
+    if not ( args.profile or args.profile_memory ):
+        return None
+    return LoadProfile( trace_memory=args.profile_memory )
@@ -0,0 +1,180 @@
+'''A headless software renderer for skeletons.  Bones are projected with the
+viewer's orbit camera and drawn into NumPy image buffers, so previews can be
+made on machines without a display or GPU.'''
+
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List
+import numpy as np
+from tools.bvh import BVH
+from tools.bones import BoneBuffer
+from tools.camera import OrbitCamera
+from tools.extents import compute_extents
+from tools.files import output_paths
+from tools.motion import Motion
+
+def _clip_segments( starts, ends, width:int, height:int ):
+    '''Liang-Barsky clips (N, 2) segments to the image.  Returns the clipped
+       starts, ends and a mask of the segments that survived.'''
+
+    delta = ends - starts
+    t_in = np.zeros( len(starts) )
+    t_out = np.ones( len(starts) )
+    outside = np.zeros( len(starts), dtype=bool )
+    bounds = ( ( -delta[:,0], starts[:,0] ),
+               ( delta[:,0], width - 1 - starts[:,0] ),
+               ( -delta[:,1], starts[:,1] ),
+               ( delta[:,1], height - 1 - starts[:,1] ) )
+
+    for p_edge, q_edge in bounds:
+        parallel = p_edge == 0.0
+        outside |= parallel & ( q_edge < 0.0 )
+        ratio = q_edge / np.where( parallel, 1.0, p_edge )
+        t_in = np.where( ~parallel & ( p_edge < 0.0 ), np.maximum( t_in, ratio ), t_in )
+        t_out = np.where( ~parallel & ( p_edge > 0.0 ), np.minimum( t_out, ratio ), t_out )
+
+    keep = ~outside & ( t_in <= t_out )
+    return starts + delta * t_in[:,None], starts + delta * t_out[:,None], keep
+
+def draw_lines( image:np.ndarray, starts, ends, colors, line_width:int=1 ):
+    '''Draws (N, 2) pixel space segments into an (H, W, 3) image in one
+       vectorized pass.  colors is (N, 3) uint8.'''
+
+    height, width = image.shape[:2]
+    starts, ends, keep = _clip_segments( np.asarray( starts, dtype=float ),
+                                         np.asarray( ends, dtype=float ), width, height )
+    starts, ends, colors = starts[keep], ends[keep], np.asarray( colors )[keep]
+    if len(starts) == 0:
+        return image
+
+    #Sample every segment at one point per pixel along its longest axis.
+    delta = ends - starts
+    steps = np.ceil( np.abs( delta ).max( axis=1 ) ).astype( int ) + 1
+    segment = np.repeat( np.arange( len(steps) ), steps )
+    first = np.repeat( np.cumsum( steps ) - steps, steps )
+    fraction = ( np.arange( steps.sum() ) - first ) / np.maximum( steps[segment] - 1, 1 )
+    points = np.rint( starts[segment] + delta[segment] * fraction[:,None] ).astype( int )
+
+    half = ( line_width - 1 ) // 2
+    for off_y in range( -half, line_width - half ):
+        for off_x in range( -half, line_width - half ):
+            cols = points[:,0] + off_x
+            rows = points[:,1] + off_y
+            inside = ( cols >= 0 ) & ( cols < width ) & ( rows >= 0 ) & ( rows < height )
+            image[ rows[inside], cols[inside] ] = colors[ segment[inside] ]
+    return image
+
+def render_pose( bones:BoneBuffer, positions:np.ndarray, camera:OrbitCamera=None,
+                 width:int=256, height:int=256, line_width:int=1 ) -> np.ndarray:
+    '''Draws one frame of (joints, 3) world positions.  Like the viewer the
+       root is kept at the center.  Returns an (height, width, 3) uint8 image.'''
+
+    if camera is None:
+        camera = OrbitCamera()
+
+    image = np.zeros( ( height, width, 3 ), dtype=np.uint8 )
+    bones.update( positions )
+    pixels, visible = camera.project( bones.vertices, width, height )
+
+    pairs = bones.indices.reshape( -1, 2 )
+    drawn = visible[pairs[:,0]] & visible[pairs[:,1]]
+    pairs = pairs[drawn]
+    colors = ( bones.colors[pairs[:,1]] * 255.0 ).astype( np.uint8 )
+    return draw_lines( image, pixels[pairs[:,0]], pixels[pairs[:,1]], colors, line_width )
+
+def contact_sheet( images:List[np.ndarray], columns:int ) -> np.ndarray:
+    '''Tiles equally sized images into a grid, left to right, top to bottom.'''
+
+    height, width = images[0].shape[:2]
+    rows = ( len(images) + columns - 1 ) // columns
+    sheet = np.zeros( ( rows * height, columns * width, 3 ), dtype=np.uint8 )
+    for index, image in enumerate( images ):
+        row, col = divmod( index, columns )
+        sheet[ row*height:(row+1)*height, col*width:(col+1)*width ] = image
+    return sheet
+
+def write_ppm( filename:str, image:np.ndarray ):
+    '''Writes an (H, W, 3) uint8 image as a binary PPM'''
+
+    height, width = image.shape[:2]
+    with open( filename, 'wb' ) as fptr:
+        fptr.write( f'P6\n{width} {height}\n255\n'.encode() )
+        fptr.write( np.ascontiguousarray( image, dtype=np.uint8 ).tobytes() )
+
+def _png_chunk( tag:bytes, data:bytes ) -> bytes:
+    '''Length, tag, data and CRC of a PNG chunk'''
+    return struct.pack( '>I', len(data) ) + tag + data + \
+           struct.pack( '>I', zlib.crc32( tag + data ) & 0xffffffff )
+
+def write_png( filename:str, image:np.ndarray ):
+    '''Writes an (H, W, 3) uint8 image as an 8 bit RGB PNG'''
+
+    height, width = image.shape[:2]
+    rows = np.ascontiguousarray( image, dtype=np.uint8 ).reshape( height, width * 3 )
+    raw = np.concatenate( ( np.zeros( ( height, 1 ), dtype=np.uint8 ), rows ), axis=1 )
+
+    with open( filename, 'wb' ) as fptr:
+        fptr.write( b'\x89PNG\r\n\x1a\n' )
+        fptr.write( _png_chunk( b'IHDR', struct.pack( '>IIBBBBB', width, height, 8, 2, 0, 0, 0 ) ) )
+        fptr.write( _png_chunk( b'IDAT', zlib.compress( raw.tobytes(), 6 ) ) )
+        fptr.write( _png_chunk( b'IEND', b'' ) )
+
+def write_image( filename:str, image:np.ndarray ):
+    '''Writes a PNG or PPM depending on the file extension'''
+
+    if filename.lower().endswith( '.ppm' ):
+        write_ppm( filename, image )
+    else:
+        write_png( filename, image )
+
+def render_clip( filename:str, output:str, frames:int=1, columns:int=None, size:int=256,
+                 camera:OrbitCamera=None, line_width:int=1, fit:bool=False ) -> str:
+    '''Renders evenly spaced frames of a BVH file into a single image.  One
+       frame makes a thumbnail of the middle of the clip, more make a contact
+       sheet with `columns` tiles per row.  With fit the skeleton is scaled by
+       its animated reach rather than its rest pose, so no frame leaves the
+       tile.  Returns the output filename.'''
+
+    bvh = BVH( filename )
+    skel = bvh.skeleton
+    skel.set_unit_scale_factor()
+    bones = BoneBuffer( skel )
+    motion = Motion.from_skeleton( skel )
+    if fit and motion.num_frames > 0:
+        bones.scale_factor = compute_extents( motion ).fit_scale
+
+    if motion.num_frames == 0:
+        images = [ render_pose( bones, bones.gather(), camera, size, size, line_width ) ]
+    else:
+        picks = ( ( np.arange( frames ) + 0.5 ) * motion.num_frames / frames ).astype( int )
+        positions = motion.take( picks ).world_positions()
+        images = [ render_pose( bones, pose, camera, size, size, line_width ) for pose in positions ]
+
+    if columns is None:
+        columns = int( np.ceil( np.sqrt( len(images) ) ) )
+    write_image( output, contact_sheet( images, columns ) )
+    return output
+
+def render_library( filenames:List[str], out_dir:str, extension:str='png', workers:int=None,
+                    **kwargs ) -> List[str]:
+    '''Renders every file across a process pool to out_dir/<name>.<extension>,
+       keeping the folders of a library, see files.output_paths.  Extra
+       keyword arguments are passed to render_clip.'''
+
+    os.makedirs( out_dir, exist_ok=True )
+    outputs = output_paths( filenames, out_dir, '.' + extension )
+
+    render = partial( _render_job, **kwargs )
+    with ProcessPoolExecutor( max_workers=workers ) as pool:
+        return list( pool.map( render, filenames, outputs, chunksize=4 ) )
+
+def _render_job( filename:str, output:str, **kwargs ) -> str:
+    '''Pool worker.  Errors are reported rather than aborting the batch.'''
+    try:
+        return render_clip( filename, output, **kwargs )
+    except Exception as err:
+        print( f'Failed to render {filename}: {err}' )
+        return None
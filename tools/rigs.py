@@ -0,0 +1,222 @@
+'''Rig fingerprints and one shared topology per rig across a library.
+
+A library usually holds thousands of clips on a handful of rigs, yet each
+BVH load builds its own Joint tree, offsets and channel map.  A rig's
+fingerprint hashes the joint names, parent structure, channel layout and
+offsets quantized to a precision, so files that only differ in formatting or
+float noise still match.  RigRegistry interns one immutable Topology per
+fingerprint and clips read through it hold nothing but their motion arrays.
+Headers are keyed by their hierarchy text first, so after the first file of
+each rig only the header bytes are read and hashed, never parsed.'''
+
+import hashlib
+import json
+from typing import List
+import numpy as np
+from tools.bvh import BVH
+from tools.motion import Motion, channel_arrays, motion_blocks, split_resting
+
+def _frozen( values, dtype ) -> np.ndarray:
+    '''A read-only array copy'''
+    array = np.array( values, dtype=dtype )
+    array.flags.writeable = False
+    return array
+
+def channel_layout( bvh:BVH ) -> tuple:
+    '''( joint index, ( channel, ... ) ) for each CHANNELS line in file
+       order, the channels named like Zrotation in column order'''
+
+    index = { id(joint) : i for i, joint in enumerate( bvh.skeleton.ordered_joints() ) }
+    layout = []
+    for chan in bvh.channels:
+        columns = [ ( column, axis + kind ) for kind, channels in
+                    ( ( 'position', chan.position ), ( 'rotation', chan.rotation ), ( 'scale', chan.scale ) )
+                    for axis, column in channels.items() ]
+        layout.append( ( index[id(chan.joint)], tuple( name for _, name in sorted( columns ) ) ) )
+    return tuple( layout )
+
+def rig_structure( bvh:BVH ) -> str:
+    '''Hex digest of a parsed header's joint names, parents, End Sites and
+       channel layout, everything rig_fingerprint hashes but the offsets'''
+
+    joints = bvh.skeleton.ordered_joints()
+    index = { id(joint) : i for i, joint in enumerate( joints ) }
+    structure = [ [ joint.name, index[id(joint.parent)] if joint.parent is not None else -1,
+                    joint.end_position is not None ] for joint in joints ]
+    return hashlib.sha1( json.dumps( [ structure, channel_layout( bvh ) ] ).encode( 'utf-8' ) ).hexdigest()
+
+def _rig_offsets( joints ) -> np.ndarray:
+    '''Joint offsets followed by End Site offsets'''
+    return np.array( [ tuple(joint.position) for joint in joints ] +
+                     [ tuple(joint.end_position) for joint in joints if joint.end_position is not None ],
+                     dtype=float )
+
+def rig_fingerprint( bvh:BVH, precision:float=1e-4 ) -> str:
+    '''Hex digest of rig_structure and the offsets (End Sites included)
+       rounded to the nearest multiple of precision.  Unlike bones.rig_key it
+       tells apart rigs with different proportions.  Rounding puts offsets on
+       a grid, so two offsets a hair either side of a half step get
+       different fingerprints however close they are; RigRegistry checks
+       for those.'''
+
+    digest = hashlib.sha1( rig_structure( bvh ).encode( 'ascii' ) )
+    #+ 0 turns -0 into 0 so a sign on a zero offset doesn't split a rig.
+    offsets = _rig_offsets( bvh.skeleton.ordered_joints() )
+    digest.update( ( np.round( offsets / precision ) + 0 ).astype( np.int64 ).tobytes() )
+    return digest.hexdigest()
+
+class Topology:
+    '''The immutable part of a rig, shared by every clip on it.  The arrays
+       are read-only and the rest are tuples.'''
+
+    def __init__( self, bvh:BVH, precision:float=1e-4 ):
+        joints = bvh.skeleton.ordered_joints()
+        index = { id(joint) : i for i, joint in enumerate( joints ) }
+        self.fingerprint = rig_fingerprint( bvh, precision )
+        '''rig_fingerprint of the first header interned'''
+        self.structure = rig_structure( bvh )
+        '''rig_structure of the header'''
+        self.names = tuple( joint.alias for joint in joints )
+        '''Joint aliases in Motion array order'''
+        self.parents = _frozen( [ index[id(joint.parent)] if joint.parent is not None else -1
+                                  for joint in joints ], np.int32 )
+        '''Index of each joint's parent.  -1 for the root.'''
+        self.offsets = _frozen( [ tuple(joint.position) for joint in joints ], float )
+        '''(joints, 3) parent relative rest positions'''
+        self.end_positions = tuple( None if joint.end_position is None else tuple(joint.end_position)
+                                    for joint in joints )
+        '''End Site offset of each joint, None for joints without one'''
+        self.channels = channel_layout( bvh )
+        '''channel_layout of the header'''
+        self.width = sum( len(names) for _, names in self.channels )
+        '''Values per motion line'''
+        self._all_offsets = _frozen( _rig_offsets( joints ), float )
+        self._bvh = bvh
+
+    @property
+    def num_joints( self ) -> int:
+        '''Number of joints'''
+        return len(self.names)
+
+    def motion( self, values:np.ndarray, num_frames:int, resting:bool=None ) -> Motion:
+        '''A Motion of (lines, channels) motion values that shares this
+           topology's names, parents and offsets.  num_frames is the count
+           the clip's header declares, see split_resting.'''
+
+        rotations, root_positions = channel_arrays( self._bvh, values )
+        rotations, root_positions, has_resting = split_resting( rotations, root_positions,
+                                                                num_frames, resting )
+        return Motion( self.names, self.parents, self.offsets, rotations, root_positions, has_resting )
+
+class Clip:
+    '''A clip read through a RigRegistry: its own motion arrays plus the
+       shared topology'''
+
+    __slots__ = ( 'filename', 'topology', 'motion', 'frame_time' )
+
+    def __init__( self, filename:str, topology:Topology, motion:Motion, frame_time:float ):
+        self.filename = filename
+        self.topology = topology
+        self.motion = motion
+        self.frame_time = frame_time
+
+def split_header( header:bytes ) -> tuple:
+    '''Splits the bytes from BVH.read_header_bytes into the hierarchy text,
+       up to and including the MOTION line, the declared frame count and
+       the frame time.'''
+
+    lines = header.splitlines( keepends=True )
+    if len(lines) < 3 or lines[-3].strip().upper() != b'MOTION':
+        raise Exception( 'No MOTION section found' )
+    frames = lines[-2].split()
+    frame_time = lines[-1].split()
+    if len(frames) < 2 or frames[0].upper() != b'FRAMES:' or len(frame_time) < 3:
+        raise Exception( 'Malformed MOTION preamble' )
+    return b''.join( lines[:-2] ), int( frames[1] ), float( frame_time[2] )
+
+class RigRegistry:
+    '''Interns one Topology per rig.  Identical hierarchy text is recognised
+       by a hash of its bytes so only the first header of each layout is
+       parsed.  A header whose fingerprint is new but whose offsets are all
+       within precision of an interned rig of the same structure, such as
+       offsets either side of a rounding boundary, joins that rig.'''
+
+    def __init__( self, precision:float=1e-4 ):
+        self.precision = precision
+        '''Rigs whose offsets are all within this of each other are the same rig'''
+        self._rigs = {}
+        self._aliases = {}
+        self._structures = {}
+        self._texts = {}
+
+    def __len__( self ) -> int:
+        return len(self._rigs)
+
+    def __iter__( self ):
+        return iter( self._rigs.values() )
+
+    def __getitem__( self, fingerprint:str ) -> Topology:
+        if fingerprint in self._rigs:
+            return self._rigs[fingerprint]
+        return self._aliases[fingerprint]
+
+    def intern( self, bvh:BVH ) -> Topology:
+        '''The shared Topology of a parsed header, adding it if new'''
+
+        topology = Topology( bvh, self.precision )
+        known = self._rigs.get( topology.fingerprint ) or self._aliases.get( topology.fingerprint )
+        if known is not None:
+            return known
+        for other in self._structures.get( topology.structure, [] ):
+            if np.allclose( topology._all_offsets, other._all_offsets, rtol=0.0, atol=self.precision ):
+                self._aliases[topology.fingerprint] = other
+                return other
+        self._structures.setdefault( topology.structure, [] ).append( topology )
+        self._rigs[topology.fingerprint] = topology
+        return topology
+
+    def read_header( self, filename:str ) -> tuple:
+        '''The Topology of a file from its header alone.  Returns it, the
+           declared frame count, the frame time and the byte offset of the
+           first motion line.'''
+
+        with open( filename, 'rb' ) as fptr:
+            header = BVH.read_header_bytes( fptr )
+            offset = fptr.tell()
+        try:
+            hierarchy, frames, frame_time = split_header( header )
+        except Exception as err:
+            raise Exception( f'{err} in {filename}' ) from err
+
+        key = hashlib.sha1( hierarchy ).digest()
+        topology = self._texts.get( key )
+        if topology is None:
+            bvh = BVH()
+            bvh.read_header( filename )
+            topology = self._texts[key] = self.intern( bvh )
+        return topology, frames, frame_time, offset
+
+    def read( self, filename:str, resting:bool=None ) -> Clip:
+        '''Reads a file's motion lines into a Clip on the shared topology.
+           resting is as for Motion.from_channels.'''
+
+        topology, frames, frame_time, offset = self.read_header( filename )
+        with open( filename, 'rb' ) as fptr:
+            fptr.seek( offset )
+            blocks = list( motion_blocks( fptr, topology.width ) )
+        values = np.concatenate( blocks ) if blocks else np.zeros( ( 0, topology.width ) )
+        return Clip( filename, topology, topology.motion( values, frames, resting ), frame_time )
+
+    def group( self, filenames:List[str] ) -> dict:
+        '''Files by rig fingerprint, in the order first seen, from their
+           headers.  Files that can't be read are reported and left out.'''
+
+        groups = {}
+        for filename in filenames:
+            try:
+                topology = self.read_header( filename )[0]
+            except Exception as err:
+                print( f'Failed to read {filename}: {err}' )
+                continue
+            groups.setdefault( topology.fingerprint, [] ).append( filename )
+        return groups
@@ -128,6 +128,8 @@ class Skeleton:
         '''Number of frames in the animation'''
         self.frame_rate = 33
         '''Optimal minimum delay between displaying frames'''
+        self.frame_time = 0.033
+        '''The exact Frame Time from the file in seconds.  frame_rate is rounded to ms.'''
         self.scale_factor = 1.0
         '''Number used to convert avatar to Vetruvian Scale
         (The largest sum of joint lengths from root an an end effector)'''
@@ -140,6 +142,19 @@ class Skeleton:
             raise Exception( 'No root found' )
         return self.joints[ self.root_name ]
 
+    def ordered_joints( self ) -> list:
+        '''Returns the joints depth first from the root so that every
+           parent comes before its children.  Used to lay joints out in
+           flat arrays.'''
+
+        ordered = []
+        stack = [ self.get_root() ]
+        while stack:
+            joint = stack.pop()
+            ordered.append( joint )
+            stack.extend( reversed( joint.children ) )
+        return ordered
+
     def handle_resting_pose( self ):
         '''Sets the has resting flag and tells the joints to
            convert their 0th frame to a resting pose.'''
@@ -0,0 +1,85 @@
+'''Exporting joint trajectories for many joints and frames at once.
+
+Frames are pushed through Motion's batched FK a chunk at a time and written
+as they are computed, so memory stays flat however long the take is.'''
+
+import numpy as np
+from tools import nputils
+from tools.motion import Motion
+
+VALUES = { 'world' : ( 'wx', 'wy', 'wz' ),
+           'world_rotation' : ( 'wqw', 'wqx', 'wqy', 'wqz' ),
+           'local' : ( 'x', 'y', 'z' ),
+           'rotation' : ( 'qw', 'qx', 'qy', 'qz' ),
+           'euler' : ( 'rx', 'ry', 'rz' ) }
+'''The value groups that can be exported and their column suffixes.
+   world and world_rotation come from FK, local is the parent relative
+   offset (plus the translation channel for the root), rotation is the local
+   quaternion and euler the same rotation as XYZ degrees.'''
+
+def _values( motion:Motion, frames:np.ndarray, picks:list, values:list ) -> np.ndarray:
+    '''(frames, joints, columns) of the requested value groups'''
+
+    part = motion.take( frames )
+    groups = []
+    if 'world' in values or 'world_rotation' in values:
+        positions, accumulated = part.world_transforms()
+    for value in values:
+        if value == 'world':
+            groups.append( positions[:,picks] )
+        elif value == 'world_rotation':
+            groups.append( accumulated[:,picks] )
+        elif value == 'local':
+            local = np.broadcast_to( part.offsets[picks], ( len(frames), len(picks), 3 ) ).copy()
+            local[:, np.asarray( picks ) == 0 ] += part.root_positions[:,None]
+            groups.append( local )
+        elif value == 'rotation':
+            groups.append( part.rotations[:,picks] )
+        elif value == 'euler':
+            groups.append( np.degrees( nputils.quat_to_euler( part.rotations[:,picks] ) ) )
+        else:
+            raise Exception( f'Unknown trajectory value {value}' )
+    return np.concatenate( groups, axis=-1 )
+
+def trajectory_columns( joints:list, values:list ) -> list:
+    '''CSV column names after the frame number, joint major'''
+    return [ f'{joint}.{suffix}' for joint in joints for value in values for suffix in VALUES[value] ]
+
+def export_trajectories( motion:Motion, output:str, joints:list=None, start:int=0, stop:int=None,
+                         stride:int=1, values:list=( 'world', 'rotation' ), chunk:int=4096 ) -> int:
+    '''Writes the chosen value groups for frames range(start, stop, stride) of
+       the named joints (all of them if None).  A .npy output holds a
+       (frames, joints, columns) float array, anything else is CSV with a
+       frame column then trajectory_columns.  Returns the frames written.'''
+
+    if joints is None:
+        joints = motion.names
+    missing = [ name for name in joints if name not in motion.names ]
+    if missing:
+        raise Exception( f'No joints named {" ".join(missing)}' )
+    if not joints:
+        raise Exception( 'No joints to export' )
+    if stride < 1:
+        raise Exception( f'Stride must be at least 1, not {stride}' )
+    picks = [ motion.names.index( name ) for name in joints ]
+    values = list(values)
+    width = sum( len(VALUES[value]) for value in values )
+    frames = np.arange( motion.num_frames )[start:stop:stride]
+
+    if output.lower().endswith( '.npy' ):
+        out = np.lib.format.open_memmap( output, mode='w+', dtype=float,
+                                         shape=( len(frames), len(picks), width ) )
+        for first in range( 0, len(frames), chunk ):
+            out[first:first+chunk] = _values( motion, frames[first:first+chunk], picks, values )
+        out.flush()
+        del out
+        return len(frames)
+
+    fmt = ','.join( [ '%d' ] + [ '%.6f' ] * ( len(picks) * width ) )
+    with open( output, 'w', encoding='utf-8' ) as fptr:
+        fptr.write( ','.join( [ 'frame' ] + trajectory_columns( joints, values ) ) + '\n' )
+        for first in range( 0, len(frames), chunk ):
+            block = frames[first:first+chunk]
+            rows = _values( motion, block, picks, values ).reshape( len(block), -1 )
+            np.savetxt( fptr, np.column_stack( ( block, rows ) ), fmt=fmt )
+    return len(frames)